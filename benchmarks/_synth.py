@@ -0,0 +1,64 @@
+from __future__ import annotations
+import time, numpy as np, pandas as pd
+from src.utils import load_config
+from src.features import make_features
+
+def synthetic_prices(n_assets: int, n_days: int = 750, seed: int = 0, cash_sym: str = "CASH") -> pd.DataFrame:
+    """Passeio aleatório geométrico com ``n_assets`` ativos + CASH (offline, determinístico)."""
+    rng = np.random.default_rng(seed)
+    rets = rng.normal(0.0003, 0.012, size=(n_days, n_assets))
+    px = 100.0 * np.cumprod(1.0 + rets, axis=0)
+    idx = pd.bdate_range("2015-01-01", periods=n_days)
+    close = pd.DataFrame(px, index=idx, columns=[f"A{i:04d}" for i in range(n_assets)])
+    close[cash_sym] = 1.0
+    return close
+
+def synthetic_inputs(n_assets: int, n_days: int = 750, seed: int = 0):
+    cfg = load_config()
+    close = synthetic_prices(n_assets, n_days, seed, cfg["universe"].get("cash_symbol", "CASH"))
+    feats = make_features(close)
+    close = close.loc[feats.index]
+    return close, feats, cfg
+
+def timeit(fn, repeat: int = 3) -> float:
+    """Melhor tempo (s) entre ``repeat`` execuções."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def project_capped_simplex_bisect(v, l, u, s=1.0, iters=100):
+    """Projeção no simplex com limites por bisseção em ``tau`` — referência lenta para ``src.env.project_capped_simplex``."""
+    v = np.asarray(v, dtype=float)
+    n = v.size
+    lvec = np.full(n, l, dtype=float)
+    uvec = np.full(n, u, dtype=float)
+    low = np.min(v - uvec)
+    high = np.max(v - lvec)
+
+    def S(tau):
+        return float(np.minimum(np.maximum(v - tau, lvec), uvec).sum())
+
+    for _ in range(iters):
+        mid = 0.5 * (low + high)
+        if S(mid) > s:
+            low = mid
+        else:
+            high = mid
+    tau = 0.5 * (low + high)
+    w = np.minimum(np.maximum(v - tau, lvec), uvec)
+    # correção numérica final
+    if abs(w.sum() - s) > 1e-9:
+        free = (w > lvec + 1e-9) & (w < uvec - 1e-9)
+        if free.any():
+            w[free] += (s - w.sum()) / free.sum()
+            w = np.minimum(np.maximum(w, lvec), uvec)
+    # renormaliza se necessário
+    total = w.sum()
+    if total <= 0:
+        w = np.ones_like(w) / n
+    else:
+        w *= s / total
+    return w
@@ -0,0 +1,70 @@
+"""Steps/seg do PortfolioEnv: lookups pandas por passo (antes) vs tensores densos (depois).
+
+Uso: python -m benchmarks.bench_env [--sizes 10 100 500] [--steps 2000]
+"""
+from __future__ import annotations
+import argparse, numpy as np, pandas as pd
+from src.env import PortfolioEnv
+from ._synth import synthetic_inputs, timeit
+
+class _ILocRows:
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+
+    def __getitem__(self, t):
+        return self.df.iloc[t].values
+
+class LegacyPortfolioEnv(PortfolioEnv):
+    """Reproduz o caminho antigo: ``features.loc`` + loop por ativo e ``returns.iloc`` a cada passo."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ret_arr = _ILocRows(self.returns)
+        self._features_df = self.features
+
+    def _get_obs(self):
+        row = self._features_df.loc[self.idx[self.t-1]]
+        if isinstance(row.index, pd.MultiIndex):
+            arr = []
+            for a in self.assets:
+                arr.extend(row.loc[a].values.astype(np.float32))
+            feat_vec = np.array(arr, dtype=np.float32)
+        else:
+            feat_vec = row.values.astype(np.float32).ravel()
+        if self.include_weights:
+            return np.concatenate([feat_vec, self.w.astype(np.float32)], axis=0)
+        return feat_vec
+
+def run_steps(env: PortfolioEnv, n_steps: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    actions = rng.uniform(-1, 1, size=(n_steps, env.n)).astype(np.float32)
+    env.reset()
+    for a in actions:
+        _, _, terminated, truncated, _ = env.step(a)
+        if terminated or truncated:
+            env.reset()
+
+def bench(sizes=(10, 100, 500), n_steps: int = 2000, repeat: int = 3) -> list[dict]:
+    rows = []
+    for n in sizes:
+        close, feats, cfg = synthetic_inputs(n)
+        res = {"n_assets": n}
+        for label, cls in (("before", LegacyPortfolioEnv), ("after", PortfolioEnv)):
+            env = cls(prices=close, features=feats, cfg=cfg)
+            steps = n_steps if label == "after" else max(50, n_steps // 10)
+            res[f"{label}_steps_per_s"] = steps / timeit(lambda: run_steps(env, steps), repeat)
+        res["speedup"] = res["after_steps_per_s"] / res["before_steps_per_s"]
+        rows.append(res)
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    ap.add_argument("--steps", type=int, default=2000)
+    args = ap.parse_args()
+    df = pd.DataFrame(bench(args.sizes, args.steps)).set_index("n_assets")
+    print("[bench_env] PortfolioEnv.step (steps/s)")
+    print(df.to_string(float_format=lambda x: f"{x:,.1f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""make_features: loop por coluna + pd.concat (antes) vs matriz (T, N) vetorizada (depois).
+
+Uso: python -m benchmarks.bench_features [--sizes 50 200 500] [--days 2500]
+"""
+from __future__ import annotations
+import argparse, numpy as np, pandas as pd
+from src.features import make_features, rsi
+from ._synth import synthetic_prices, timeit
+
+def legacy_make_features(close: pd.DataFrame) -> pd.DataFrame:
+    feats = {}
+    for col in close.columns:
+        px = close[col].ffill().dropna()
+        ret = px.pct_change()
+        feats[(col, "ret_1")] = ret
+        feats[(col, "ret_5")] = px.pct_change(5)
+        feats[(col, "ret_20")] = px.pct_change(20)
+        feats[(col, "mom_20")] = px.pct_change(20)
+        feats[(col, "vol_20")] = ret.rolling(20).std()
+        feats[(col, "vol_60")] = ret.rolling(60).std()
+        feats[(col, "rsi_14")] = rsi(px, 14)
+    return pd.concat(feats, axis=1).dropna().astype(float)
+
+def bench(sizes=(50, 200, 500), n_days: int = 2500, repeat: int = 3) -> list[dict]:
+    rows = []
+    for n in sizes:
+        close = synthetic_prices(n, n_days)
+        t_old = timeit(lambda: legacy_make_features(close), repeat)
+        t_new = timeit(lambda: make_features(close), repeat)
+        diff = np.nanmax(np.abs(make_features(close).to_numpy() - legacy_make_features(close).to_numpy()))
+        rows.append({"n_assets": n, "days": n_days, "before_s": t_old, "after_s": t_new,
+                     "speedup": t_old / t_new, "max_abs_diff": diff})
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 500])
+    ap.add_argument("--days", type=int, default=2500)
+    args = ap.parse_args()
+    df = pd.DataFrame(bench(args.sizes, args.days)).set_index("n_assets")
+    print("[bench_features] make_features")
+    print(df.to_string(float_format=lambda x: f"{x:.3g}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Tempo de import dos módulos de estágio e dependências pesadas carregadas por eles.
+
+Cada módulo é importado num processo novo (melhor de ``--repeat``); o processo sai
+com código 1 se um módulo passar do orçamento em ``BUDGETS`` ou carregar alguma
+dependência de ``HEAVY`` (essas ficam dentro das funções que as usam).
+
+Uso: python -m benchmarks.bench_import [--modules src.benchmark src.evaluate] [--repeat 5] [--json]
+"""
+from __future__ import annotations
+import argparse, json, pathlib, subprocess, sys
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+HEAVY = ("torch", "stable_baselines3", "pypfopt", "cvxpy", "scipy", "yfinance", "matplotlib", "streamlit")
+# segundos de parede para ``python -c "import <módulo>"`` (inclui a partida do interpretador e do pandas)
+BUDGETS = {
+    "src": 0.1, "src.utils": 0.8, "src.data": 0.8, "src.features": 0.8, "src.mpt": 0.8, "src.benchmark": 0.8,
+    "src.evaluate": 0.8, "src.backtest": 0.9, "src.train_rl": 0.9, "src.walk_forward": 0.8,
+    "src.pipeline": 0.8, "src.serve": 0.9, "src.policy_export": 0.8, "src.dashboard_data": 0.8,
+    "src.sweep": 0.8,
+}
+
+_PROBE = ("import sys, time, json; t0 = time.perf_counter(); import {mod}; dt = time.perf_counter() - t0; "
+          "print(json.dumps({{'import_s': dt, 'heavy': sorted(m for m in {heavy!r} if m in sys.modules)}}))")
+
+def probe(module: str) -> dict:
+    """Import de ``module`` num interpretador novo: tempo do import em si, parede total e pesados carregados."""
+    import time
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", _PROBE.format(mod=module, heavy=HEAVY)], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - t0
+    return {**json.loads(out.stdout.strip().splitlines()[-1]), "wall_s": wall}
+
+def bench(modules=None, repeat: int = 3) -> pd.DataFrame:
+    rows = []
+    for mod in modules or BUDGETS:
+        runs = [probe(mod) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["wall_s"])
+        bad = best["heavy"]
+        budget = BUDGETS.get(mod)
+        rows.append({"module": mod, "import_s": min(r["import_s"] for r in runs), "wall_s": best["wall_s"],
+                     "budget_s": budget, "heavy": ",".join(bad) or "-",
+                     "ok": not bad and (budget is None or best["wall_s"] <= budget)})
+    return pd.DataFrame(rows).set_index("module")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modules", nargs="+", default=None)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", action="store_true", help="saída em JSON")
+    args = ap.parse_args(argv)
+    df = bench(args.modules, args.repeat)
+    if args.json:
+        print(json.dumps(df.reset_index().to_dict("records"), indent=2))
+    else:
+        print(df.to_string(float_format=lambda x: f"{x:.3f}"))
+    bad = df[~df["ok"]]
+    if len(bad):
+        print(f"[bench_import] FALHA: {', '.join(bad.index)} acima do orçamento ou com imports pesados",
+              file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
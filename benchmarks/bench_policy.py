@@ -0,0 +1,80 @@
+"""Inferência da política: partida a frio (import + carga) e latência por chamada, SB3 vs export NumPy.
+
+Cada runtime é medido num processo novo (``python -c``) para que a partida inclua
+os imports; a latência usa ``model.predict``, ``sb3_act_fn`` e ``NumpyPolicy``.
+
+Uso: python -m benchmarks.bench_policy [--assets 145] [--batch 1 256] [--calls 2000]
+"""
+from __future__ import annotations
+import argparse, json, pathlib, subprocess, sys, tempfile, time, numpy as np, pandas as pd
+from ._synth import synthetic_inputs
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+_STARTUP = {
+    "sb3": "from src.policy_export import load_policy; load_policy({{}}, {zip!r}, runtime='sb3')",
+    "numpy": "from src.policy_export import load_policy; load_policy({{}}, {zip!r}, {npz!r}, runtime='numpy')",
+}
+
+def _startup(runtime: str, zip_path, npz_path, repeat: int = 3) -> float:
+    code = ("import time; t0 = time.perf_counter(); " + _STARTUP[runtime].format(zip=str(zip_path), npz=str(npz_path))
+            + "; print(time.perf_counter() - t0)")
+    best = float("inf")
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        best = min(best, float(out.stdout.strip().splitlines()[-1]))
+    return best
+
+def _latency(fn, obs: np.ndarray, calls: int) -> np.ndarray:
+    for _ in range(20):
+        fn(obs)
+    lat = np.empty(calls)
+    for i in range(calls):
+        t0 = time.perf_counter()
+        fn(obs)
+        lat[i] = time.perf_counter() - t0
+    return lat * 1e3
+
+def bench(n_assets=145, batches=(1, 256), calls=2000) -> tuple[dict, pd.DataFrame]:
+    import torch
+    from stable_baselines3 import PPO
+    from src.env import PortfolioEnv
+    from src.rollout import sb3_act_fn
+    from src.policy_export import NumpyPolicy, export_policy
+    torch.set_num_threads(1)
+    close, feats, cfg = synthetic_inputs(n_assets, 400)
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=np.ones(close.shape[1]))
+    model = PPO("MlpPolicy", env, seed=0, device="cpu")
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    model.save(tmp / "m.zip")
+    policy = NumpyPolicy.load(export_policy(model, tmp / "m.npz"))
+    startup = {rt: _startup(rt, tmp / "m.zip", tmp / "m.npz") for rt in _STARTUP}
+    fns = {"predict": lambda o: model.predict(o, deterministic=True), "sb3_act_fn": sb3_act_fn(model),
+           "numpy": policy}
+    rng = np.random.default_rng(0)
+    rows = []
+    for b in batches:
+        obs = np.stack([env.reset(seed=int(s))[0] for s in rng.integers(0, 1 << 30, b)])
+        for name, fn in fns.items():
+            ms = _latency(fn, obs, max(50, calls // max(1, b // 16)))
+            rows.append({"batch": b, "runtime": name, "p50_ms": np.percentile(ms, 50),
+                         "p99_ms": np.percentile(ms, 99), "obs_per_s": b / (np.median(ms) / 1e3)})
+    return startup, pd.DataFrame(rows)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--assets", type=int, default=145)
+    ap.add_argument("--batch", type=int, nargs="+", default=[1, 256])
+    ap.add_argument("--calls", type=int, default=2000)
+    ap.add_argument("--json", action="store_true", help="saída em JSON")
+    args = ap.parse_args()
+    startup, df = bench(args.assets, args.batch, args.calls)
+    if args.json:
+        print(json.dumps({"startup_s": startup, "latency": df.to_dict("records")}, indent=2))
+        return
+    print(f"[bench_policy] {args.assets} ativos + CASH — partida a frio (import + carga): "
+          + ", ".join(f"{k} {v:.2f}s" for k, v in startup.items()))
+    print(df.set_index(["batch", "runtime"]).to_string(float_format=lambda x: f"{x:,.3f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Tempo por chamada de project_capped_simplex: bisseção (100 iterações) vs ordenação exata.
+
+Uso: python -m benchmarks.bench_projection [--sizes 10 100 1000] [--batch 256]
+"""
+from __future__ import annotations
+import argparse, numpy as np, pandas as pd
+from src.env import project_capped_simplex, project_capped_simplex_batch
+from ._synth import project_capped_simplex_bisect, timeit
+
+def bench(sizes=(10, 100, 1000), calls: int = 200, batch: int = 256) -> list[dict]:
+    rows = []
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        V = rng.normal(1.0 / n, 0.05, size=(max(calls, batch), n))
+        u = max(0.15, 2.0 / n)
+        t_bis = timeit(lambda: [project_capped_simplex_bisect(v, 0.0, u) for v in V[:calls]]) / calls
+        t_sort = timeit(lambda: [project_capped_simplex(v, 0.0, u) for v in V[:calls]]) / calls
+        t_batch = timeit(lambda: project_capped_simplex_batch(V[:batch], 0.0, u)) / batch
+        rows.append({"n": n, "bisect_us": 1e6 * t_bis, "sort_us": 1e6 * t_sort,
+                     "batch_us_per_row": 1e6 * t_batch, "speedup": t_bis / t_sort})
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--batch", type=int, default=256)
+    args = ap.parse_args()
+    df = pd.DataFrame(bench(args.sizes, batch=args.batch)).set_index("n")
+    print("[bench_projection] µs por projeção")
+    print(df.to_string(float_format=lambda x: f"{x:,.1f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Teste de carga do src.serve contra um stand-in local: latência p50/p99 e throughput por concorrência.
+
+O stand-in roda num processo separado: PolicyService sobre preços sintéticos com uma
+política PPO recém-inicializada (mesma rede/custo de inferência do modelo treinado).
+
+Uso: python -m benchmarks.bench_serve [--assets 145] [--clients 1 8 32] [--accounts 1 100] [--requests 200] [--unix]
+"""
+from __future__ import annotations
+import argparse, asyncio, multiprocessing, os, tempfile, time, numpy as np, pandas as pd
+from ._synth import synthetic_inputs
+
+def _stand_in(n_assets: int, unix: str | None, ready, window_ms: float):
+    import torch
+    from stable_baselines3 import PPO
+    from src.env import PortfolioEnv
+    from src.rollout import sb3_act_fn
+    from src.serve import PolicyService, PolicyServer
+    torch.set_num_threads(1)
+    close, feats, cfg = synthetic_inputs(n_assets, 400)
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, train=False, w_mpt=np.ones(close.shape[1]))
+    model = PPO("MlpPolicy", env, seed=0, device="cpu")
+    server = PolicyServer(PolicyService(sb3_act_fn(model), env), window_ms=window_ms)
+
+    async def run():
+        srv = await server.start("127.0.0.1", 0, unix)
+        ready.put(unix or server.port)
+        await srv.serve_forever()
+    asyncio.run(run())
+
+async def _client(addr, n_requests: int, payload: dict, lat: list):
+    from src.serve import http_json
+    reader, writer = await (asyncio.open_unix_connection(addr) if isinstance(addr, str)
+                            else asyncio.open_connection("127.0.0.1", addr))
+    for _ in range(n_requests):
+        t0 = time.perf_counter()
+        status, _ = await http_json(reader, writer, "POST", "/weights", payload)
+        lat.append(time.perf_counter() - t0)
+        if status != 200:
+            raise RuntimeError(f"status {status}")
+    writer.close()
+
+async def _load(addr, clients: int, n_requests: int, accounts: int, n_assets: int) -> dict:
+    rng = np.random.default_rng(0)
+    payload = {"accounts": [{"holdings": rng.dirichlet(np.ones(n_assets + 1)).round(6).tolist(),
+                             "nav": float(rng.uniform(0.7, 1.1)), "max_nav": 1.1} for _ in range(accounts)]}
+    await _client(addr, 5, payload, [])                      # aquecimento
+    lat = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client(addr, n_requests, payload, lat) for _ in range(clients)))
+    wall = time.perf_counter() - t0
+    ms = np.array(lat) * 1e3
+    return {"clients": clients, "accounts": accounts, "p50_ms": np.percentile(ms, 50), "p90_ms": np.percentile(ms, 90),
+            "p99_ms": np.percentile(ms, 99), "req_per_s": len(lat) / wall, "accounts_per_s": len(lat) * accounts / wall}
+
+def bench(n_assets=145, clients=(1, 8, 32), accounts=(1, 100), n_requests=200, unix=False, window_ms=0.0):
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Queue()
+    sock = os.path.join(tempfile.mkdtemp(), "serve.sock") if unix else None
+    proc = ctx.Process(target=_stand_in, args=(n_assets, sock, ready, window_ms), daemon=True)
+    proc.start()
+    try:
+        addr = ready.get(timeout=300)
+        return [asyncio.run(_load(addr, c, n_requests, a, n_assets)) for a in accounts for c in clients]
+    finally:
+        proc.terminate()
+        proc.join()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--assets", type=int, default=145)
+    ap.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--accounts", type=int, nargs="+", default=[1, 100])
+    ap.add_argument("--requests", type=int, default=200, help="pedidos por cliente")
+    ap.add_argument("--window-ms", type=float, default=0.0, help="janela de micro-lote do servidor")
+    ap.add_argument("--unix", action="store_true", help="Unix socket em vez de TCP")
+    args = ap.parse_args()
+    df = pd.DataFrame(bench(args.assets, args.clients, args.accounts, args.requests, args.unix, args.window_ms))
+    print(f"[bench_serve] POST /weights — {args.assets} ativos + CASH, {'unix socket' if args.unix else 'TCP'}")
+    print(df.set_index(["accounts", "clients"]).to_string(float_format=lambda x: f"{x:,.2f}"))
+
+if __name__ == "__main__":
+    main()
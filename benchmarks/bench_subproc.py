@@ -0,0 +1,62 @@
+"""SubprocVecEnv: memória privada por worker (DataFrames copiados vs memmap) e steps/s por nº de workers.
+
+Uso: python -m benchmarks.bench_subproc [--assets 500] [--days 2500] [--workers 1 2 4] [--steps 500]
+"""
+from __future__ import annotations
+import argparse, functools, tempfile, time, numpy as np, pandas as pd
+from stable_baselines3.common.vec_env import SubprocVecEnv
+from src.env import PortfolioEnv
+from src.market import MarketData, make_market_env
+from ._synth import synthetic_inputs
+
+def _frames_env(close, feats, cfg):
+    return PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=np.ones(close.shape[1]))
+
+def _private_mb(pid: int) -> float:
+    """Memória anônima (privada) do processo, em MB (Linux)."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+def _worker_mb(vec: SubprocVecEnv) -> float:
+    return float(np.mean([_private_mb(p.pid) for p in vec.processes]))
+
+def _steps_per_s(vec: SubprocVecEnv, n_assets: int, steps: int) -> float:
+    rng = np.random.default_rng(0)
+    vec.reset()
+    t0 = time.perf_counter()
+    for _ in range(steps):
+        vec.step(rng.uniform(-1, 1, (vec.num_envs, n_assets)))
+    return steps * vec.num_envs / (time.perf_counter() - t0)
+
+def bench(n_assets=500, n_days=2500, workers=(1, 2, 4), steps=500) -> list[dict]:
+    close, feats, cfg = synthetic_inputs(n_assets, n_days)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = MarketData.from_frames(close, feats).save(tmp)
+        for k in workers:
+            res = {"workers": k}
+            for label, make in (("frames", functools.partial(_frames_env, close, feats, cfg)),
+                                ("memmap", functools.partial(make_market_env, path, cfg, w_mpt=np.ones(close.shape[1])))):
+                vec = SubprocVecEnv([make] * k, start_method="spawn")
+                res[f"{label}_steps_per_s"] = _steps_per_s(vec, close.shape[1], steps)
+                res[f"{label}_worker_mb"] = _worker_mb(vec)
+                vec.close()
+            rows.append(res)
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--assets", type=int, default=500)
+    ap.add_argument("--days", type=int, default=2500)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--steps", type=int, default=500)
+    args = ap.parse_args()
+    df = pd.DataFrame(bench(args.assets, args.days, args.workers, args.steps)).set_index("workers")
+    print("[bench_subproc] SubprocVecEnv (env-steps/s agregados; MB privados por worker)")
+    print(df.to_string(float_format=lambda x: f"{x:,.1f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Suíte de benchmarks com rastreamento de regressão.
+
+Roda cada caso sobre preços sintéticos (offline) numa grade de universo × histórico,
+grava os tempos em JSON e compara com o baseline salvo: qualquer caso mais lento que
+``baseline * (1 + tolerância)`` é listado e o processo sai com código 1.
+
+Uso:
+    python -m benchmarks.suite                       # grade padrão, compara com baseline.json
+    python -m benchmarks.suite --quick               # grade reduzida (CI / smoke)
+    python -m benchmarks.suite --cases env_step projection --sizes 100
+    python -m benchmarks.suite --save-baseline       # regrava benchmarks/baseline.json
+"""
+from __future__ import annotations
+import argparse, datetime, json, os, pathlib, platform, subprocess, sys
+import numpy as np, pandas as pd
+from src.env import PortfolioEnv, project_capped_simplex
+from src.features import make_features
+from src.benchmark import _portfolio_nav
+from src.evaluate import max_drawdown, calmar_ratio, sharpe_ratio, sortino_ratio, alpha_beta
+from src.rolling import rolling_metrics
+from src.mpt import mpt_initial_weights
+from ._synth import synthetic_prices, timeit
+
+BENCH_DIR = pathlib.Path(__file__).resolve().parent
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+RESULTS_DIR = BENCH_DIR / "results"
+
+SIZES, DAYS = (10, 100, 500), (750, 2500)
+QUICK_SIZES, QUICK_DAYS = (10, 50), (500,)
+
+class Inputs:
+    """Preços, features e config sintéticos de um ponto da grade (features calculadas sob demanda)."""
+
+    def __init__(self, n_assets: int, n_days: int, cfg: dict):
+        self.n_assets, self.n_days, self.cfg = n_assets, n_days, cfg
+        self.close = synthetic_prices(n_assets, n_days, cash_sym=cfg["universe"].get("cash_symbol", "CASH"))
+        self._feats = None
+
+    @property
+    def feats(self) -> pd.DataFrame:
+        if self._feats is None:
+            self._feats = make_features(self.close)
+        return self._feats
+
+    def env(self) -> PortfolioEnv:
+        return PortfolioEnv(prices=self.close.loc[self.feats.index], features=self.feats, cfg=self.cfg,
+                            w_mpt=np.ones(self.close.shape[1]))
+
+# ---- casos ------------------------------------------------------------------
+# cada caso recebe Inputs e devolve (função a cronometrar, nº de operações por chamada, unidade)
+
+def _env_step(inp: Inputs, n_steps: int = 1000):
+    env = inp.env()
+    actions = np.random.default_rng(0).uniform(-1, 1, size=(n_steps, env.n)).astype(np.float32)
+    def run():
+        env.reset(seed=0)
+        for a in actions:
+            _, _, terminated, truncated, _ = env.step(a)
+            if terminated or truncated:
+                env.reset()
+    return run, n_steps, "step"
+
+def _env_reset(inp: Inputs, n: int = 200):
+    env = inp.env()
+    def run():
+        for _ in range(n):
+            env.reset()
+    return run, n, "reset"
+
+def _projection(inp: Inputs, n: int = 500):
+    k = inp.n_assets + 1
+    V = np.random.default_rng(0).normal(1.0 / k, 0.05, size=(n, k))
+    u = max(0.15, 2.0 / k)
+    return (lambda: [project_capped_simplex(v, 0.0, u) for v in V]), n, "call"
+
+def _make_features(inp: Inputs):
+    return (lambda: make_features(inp.close)), 1, "call"
+
+def _portfolio_nav_case(inp: Inputs):
+    w = pd.Series(1.0 / inp.close.shape[1], index=inp.close.columns)
+    return (lambda: _portfolio_nav(inp.close, w, rebalance="M", cost_bps=5.0)), 1, "call"
+
+def _evaluate_metrics(inp: Inputs):
+    nav = inp.close.iloc[:, :-1].mean(axis=1)
+    nav = nav / nav.iloc[0]
+    ret = nav.pct_change().fillna(0.0)
+    bench = inp.close.iloc[:, 0].pct_change().fillna(0.0)
+    def run():
+        sharpe_ratio(ret), sortino_ratio(ret), max_drawdown(nav), calmar_ratio(nav), alpha_beta(ret, bench)
+    return run, 1, "call"
+
+def _rolling_metrics(inp: Inputs):
+    rets = inp.close.iloc[:, :-1].pct_change().fillna(0.0)
+    bench = rets.iloc[:, 0]
+    return (lambda: rolling_metrics(rets, bench, windows=[21, 63, 252])), 1, "call"
+
+def _mpt_initial_weights(inp: Inputs):
+    close = inp.close.iloc[:, :-1]
+    return (lambda: mpt_initial_weights(close, inp.cfg)), 1, "call"
+
+# nome -> (fábrica, tamanho máximo de universo; o otimizador não escala para centenas de ativos no CI)
+CASES = {
+    "env_step": (_env_step, None),
+    "env_reset": (_env_reset, None),
+    "projection": (_projection, None),
+    "make_features": (_make_features, None),
+    "portfolio_nav": (_portfolio_nav_case, None),
+    "evaluate_metrics": (_evaluate_metrics, None),
+    "rolling_metrics": (_rolling_metrics, None),
+    "mpt_initial_weights": (_mpt_initial_weights, 100),
+}
+
+def measure(fn, ops: int, repeat: int = 3, min_time: float = 0.2) -> float:
+    """
+    Segundos por operação: ``fn`` repetida até somar ``min_time`` por amostra (casos de
+    µs ficam estáveis), melhor de ``repeat`` amostras.
+    """
+    t = max(timeit(fn, 1), 1e-9)
+    loops = max(1, int(np.ceil(min_time / t)))
+    return timeit(lambda: [fn() for _ in range(loops)], repeat) / (loops * ops)
+
+def case_key(name: str, n_assets: int, n_days: int) -> str:
+    return f"{name}/n={n_assets}/T={n_days}"
+
+def run_suite(cases=None, sizes=SIZES, days=DAYS, repeat: int = 3, verbose: bool = True) -> dict:
+    """Tempo por operação (ver ``measure``) de cada caso × ponto da grade."""
+    from src.utils import load_config
+    cfg = load_config()
+    names = list(CASES) if cases is None else list(cases)
+    unknown = set(names) - set(CASES)
+    if unknown:
+        raise ValueError(f"Casos desconhecidos: {sorted(unknown)} (disponíveis: {list(CASES)})")
+    results = {}
+    for T in days:
+        for n in sizes:
+            inp = Inputs(n, T, cfg)
+            for name in names:
+                factory, max_n = CASES[name]
+                if max_n is not None and n > max_n:
+                    continue
+                fn, ops, unit = factory(inp)
+                fn()  # aquecimento (imports, caches, alocação)
+                sec = measure(fn, ops, repeat)
+                key = case_key(name, n, T)
+                results[key] = {"case": name, "n_assets": n, "days": T, "sec_per_op": sec, "unit": unit}
+                if verbose:
+                    print(f"  {key:<40s} {_fmt(sec)}/{unit}", flush=True)
+    return results
+
+def _fmt(sec: float) -> str:
+    if sec < 1e-3:
+        return f"{sec * 1e6:8.1f} µs"
+    return f"{sec * 1e3:8.2f} ms" if sec < 1 else f"{sec:8.2f} s "
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def machine_info() -> dict:
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu = next((l.split(":", 1)[1].strip() for l in f if l.startswith("model name")), cpu)
+    except OSError:
+        pass
+    return {"cpu": cpu, "cores": os.cpu_count(), "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "platform": platform.platform()}
+
+def compare(results: dict, baseline: dict, tolerance: float) -> pd.DataFrame:
+    """Razão atual/baseline por caso comum aos dois; ``regression`` se > 1 + tolerância."""
+    rows = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        ratio = r["sec_per_op"] / base["sec_per_op"]
+        rows.append({"key": key, "baseline": base["sec_per_op"], "current": r["sec_per_op"],
+                     "ratio": ratio, "regression": ratio > 1.0 + tolerance})
+    return pd.DataFrame(rows, columns=["key", "baseline", "current", "ratio", "regression"]).set_index("key")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--cases", nargs="+", choices=list(CASES), default=None)
+    ap.add_argument("--sizes", type=int, nargs="+", default=None)
+    ap.add_argument("--days", type=int, nargs="+", default=None)
+    ap.add_argument("--quick", action="store_true", help="grade reduzida")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--tolerance", type=float, default=0.5, help="lentidão tolerada (0.5 = +50%%)")
+    ap.add_argument("--baseline", type=pathlib.Path, default=BASELINE_PATH)
+    ap.add_argument("--save-baseline", action="store_true", help="grava os resultados como novo baseline")
+    ap.add_argument("--output", type=pathlib.Path, default=None, help="JSON de saída (default: results/<data>.json)")
+    args = ap.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    days = args.days or (QUICK_DAYS if args.quick else DAYS)
+    print(f"[bench] casos={args.cases or 'todos'} sizes={list(sizes)} days={list(days)}")
+    results = run_suite(args.cases, sizes, days, args.repeat)
+    payload = {"created_at": datetime.datetime.now().isoformat(timespec="seconds"), "git": _git_rev(),
+               "machine": machine_info(), "results": results}
+
+    out = args.output or RESULTS_DIR / f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"[bench] Resultados em {out}")
+
+    if args.save_baseline:
+        baseline = {}
+        if args.baseline.exists():
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        payload["results"] = {**baseline, **results}
+        with open(args.baseline, "w") as f:
+            json.dump(payload, f, indent=2)
+        print(f"[bench] Baseline atualizado em {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"[bench] Sem baseline em {args.baseline}; rode com --save-baseline para criar.")
+        return 0
+    with open(args.baseline) as f:
+        base = json.load(f)
+    if base.get("machine", {}).get("cpu") != payload["machine"]["cpu"]:
+        print(f"[bench] Aviso: baseline medido em outra CPU ({base.get('machine', {}).get('cpu')})")
+    cmp = compare(results, base["results"], args.tolerance)
+    if cmp.empty:
+        print("[bench] Nenhum caso em comum com o baseline.")
+        return 0
+    print(cmp.to_string(formatters={"baseline": _fmt, "current": _fmt, "ratio": "{:.2f}x".format}))
+    bad = cmp[cmp["regression"]]
+    if len(bad):
+        print(f"[bench] REGRESSÃO: {len(bad)} caso(s) mais lentos que {1 + args.tolerance:.2f}x o baseline:",
+              file=sys.stderr)
+        for key, r in bad.iterrows():
+            print(f"  {key}: {_fmt(r['baseline']).strip()} -> {_fmt(r['current']).strip()} ({r['ratio']:.2f}x)",
+                  file=sys.stderr)
+        return 1
+    print(f"[bench] OK: {len(cmp)} caso(s) dentro de {1 + args.tolerance:.2f}x o baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
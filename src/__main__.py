@@ -0,0 +1,70 @@
+"""
+CLI única do pipeline: vários estágios num só processo.
+
+Os estágios pedidos rodam na ordem de dependência do ``STAGES`` do runner, e as
+tabelas colunares (preços, features, prior MPT) ficam compartilhadas em memória
+entre eles (``utils.share_frames``): o estágio seguinte não relê do disco nem
+paga de novo a partida do interpretador. Dependências pesadas (torch/SB3,
+pypfopt/cvxpy, yfinance, matplotlib) só são importadas pelos estágios que as usam.
+Não consulta o cache de estágios — para isso, ``python -m src pipeline``.
+
+Uso:
+    python -m src                           # data features mpt train benchmark backtest report
+    python -m src benchmark report          # só os estágios pedidos (nomes do runner ou dos módulos)
+    python -m src --list
+    python -m src pipeline [args ...]       # runner com cache (src.pipeline)
+    python -m src serve [args ...]          # idem para src.serve; export -> src.policy_export
+"""
+from __future__ import annotations
+import argparse, importlib, sys, time
+from .pipeline import STAGES, DEFAULT_TARGETS
+
+# subcomandos repassados ao ``main(argv)`` do módulo
+COMMANDS = {"pipeline": "src.pipeline", "serve": "src.serve", "export": "src.policy_export"}
+# nomes de módulo / alvos do Makefile -> estágio
+ALIASES = {"train_rl": "train", "evaluate": "report", "bench": "benchmark", "walkforward": "walk_forward"}
+
+def resolve(names) -> list[str]:
+    """Estágios pedidos (aceita aliases), sem repetição e na ordem do DAG."""
+    wanted = {ALIASES.get(n, n) for n in names}
+    unknown = wanted - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Estágios desconhecidos: {sorted(unknown)} (disponíveis: {list(STAGES)})")
+    return [s for s in STAGES if s in wanted]
+
+def run_stages(stages, share: bool = True) -> dict[str, float]:
+    """Importa e roda o ``main`` de cada estágio no processo atual; devolve segundos por estágio."""
+    from .utils import share_frames
+    share_frames(share)
+    timings = {}
+    try:
+        for name in stages:
+            t0 = time.perf_counter()
+            print(f"[src] ▶ {name}", flush=True)
+            importlib.import_module(STAGES[name]["module"]).main()
+            timings[name] = time.perf_counter() - t0
+    finally:
+        share_frames(False)
+    return timings
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        return importlib.import_module(COMMANDS[argv[0]]).main(argv[1:]) or 0
+    ap = argparse.ArgumentParser(prog="python -m src", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("stages", nargs="*", default=list(DEFAULT_TARGETS))
+    ap.add_argument("--list", action="store_true", help="lista estágios e subcomandos")
+    ap.add_argument("--no-share", action="store_true", help="não compartilha tabelas em memória entre estágios")
+    args = ap.parse_args(argv)
+    if args.list:
+        for name, spec in STAGES.items():
+            print(f"{name:<14s} {spec['module']:<18s} deps: {', '.join(spec['deps']) or '-'}")
+        print("subcomandos:", ", ".join(COMMANDS))
+        return 0
+    timings = run_stages(resolve(args.stages), share=not args.no_share)
+    print("[src] " + " | ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
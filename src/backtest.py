@@ -1,37 +1,36 @@
 from __future__ import annotations
 import pandas as pd, numpy as np
-from stable_baselines3 import PPO
-from .utils import DATA_DIR, OUT_DIR, MODELS_DIR, load_config
-from .env import PortfolioEnv
+from .utils import OUT_DIR, load_config
+from .policy_export import load_policy
 from .train_rl import build_env
+from .rollout import evaluate_policy_batch, rollout_frames
+from .perf import stage
 
+@stage("backtest")
 def main():
     cfg = load_config()
     env = build_env(cfg, split="test")
 
-    model_path = MODELS_DIR / "ppo_synapse.zip"
-    if not model_path.exists():
-        raise FileNotFoundError("Modelo PPO não encontrado. Execute: python -m src.train_rl")
-    model = PPO.load(model_path)
+    act_fn = load_policy(cfg)
 
-    obs, info = env.reset()
-    navs, dates, rets, turns, weights = [], [], [], [], []
-    done = False
-    while not done:
-        action, _ = model.predict(obs, deterministic=True)
-        obs, reward, terminated, truncated, info = env.step(action)
-        done = terminated or truncated
-        dates.append(env.idx[env.t-1])
-        navs.append(info["nav"])
-        rets.append(info["return"])
-        turns.append(info["turnover"])
-        weights.append(info["weights"])
-
-    df = pd.DataFrame({"date": dates, "nav": navs, "ret": rets, "turnover": turns}).set_index("date")
+    bcfg = cfg.get("backtest", {})
+    n_scen = int(bcfg.get("n_scenarios", 0))
+    res = evaluate_policy_batch(None, env, n_scenarios=n_scen, noise=float(bcfg.get("noise", 0.5)), seed=cfg["seed"],
+                                act_fn=act_fn)
+    df, wdf = rollout_frames(res, env.idx, env.assets)
     df.to_csv(OUT_DIR / "backtest_equity_curve.csv")
-    wdf = pd.DataFrame(weights, index=df.index, columns=env.assets)
     wdf.to_csv(OUT_DIR / "backtest_weights.csv")
     print(f"[backtest] Salvos: {OUT_DIR / 'backtest_equity_curve.csv'}, {OUT_DIR / 'backtest_weights.csv'}")
+    if n_scen:
+        np.save(OUT_DIR / "backtest_scenarios.npy", res)
+        nav = np.where(res["t"] >= 0, res["nav"], np.nan)
+        nav = pd.DataFrame(nav.T).ffill().to_numpy().T
+        mdd = np.nanmin(nav / np.fmax.accumulate(nav, axis=1) - 1.0, axis=1)
+        summary = pd.DataFrame({"final_nav": nav[:, -1], "max_drawdown": mdd})
+        summary.index = pd.Index(["historical"] + [f"stress_{k}" for k in range(n_scen)], name="scenario")
+        summary.to_csv(OUT_DIR / "backtest_scenarios.csv")
+        print(f"[backtest] {n_scen} cenários de estresse: NAV final mediana "
+              f"{summary['final_nav'].iloc[1:].median():.3f} | Salvos: {OUT_DIR / 'backtest_scenarios.csv'}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+import numpy as np, pandas as pd
+from time import perf_counter_ns
+from .env import PortfolioEnv, project_capped_simplex_batch, drawdown_overlay_batch
+from .perf import new_env_timings
+
+class BatchedPortfolio:
+    """
+    N episódios independentes do PortfolioEnv mantidos como arrays empilhados.
+
+    Projeção, overlay de drawdown, custos e recompensa são calculados para os N
+    episódios de uma vez com NumPy (sem um ``PortfolioEnv.step`` Python por env).
+    Núcleo só NumPy (rollouts de avaliação, sem importar SB3); a interface VecEnv
+    com autoreset fica em ``vec_env.BatchedPortfolioEnv``.
+
+    Args:
+        prices, features, cfg: mesmos argumentos do PortfolioEnv
+        num_envs: número de episódios paralelos
+        random_start: sorteia ``t0`` em [window, T - min_episode_len]; senão ``t0 = window``
+        min_episode_len: tamanho mínimo de episódio ao sortear o início
+        seed: semente do gerador de offsets
+        autoreset: False mantém episódios terminados congelados (usado pela interface VecEnv)
+        base: PortfolioEnv já construído (ver ``from_env``)
+    """
+
+    _PER_ENV = ("t", "t0", "t_end", "steps", "nav", "max_nav", "w")
+
+    def __init__(self, prices: pd.DataFrame, features: pd.DataFrame, cfg: dict, num_envs: int = 64,
+                 random_start: bool = True, min_episode_len: int = 20, seed: int | None = None,
+                 train: bool = True, w_mpt=None, autoreset: bool = True, base: PortfolioEnv | None = None):
+        if base is None:
+            base = PortfolioEnv(prices=prices, features=features, cfg=cfg, train=train, w_mpt=w_mpt)
+        self.base = base
+        self.cfg = base.cfg
+        self.assets, self.n, self.idx = base.assets, base.n, base.idx
+        self.window, self.step_scale = base.window, base.step_scale
+        self.min_w, self.max_w = base.min_w, base.max_w
+        self.cost_rate = base.tx_bps + base.slp_bps
+        self.turnover_pen, self.dev_pen = base.turnover_pen, base.dev_pen
+        self.dd_trigger, self.dd_hard = base.dd_trigger, base.dd_hard
+        self.max_cash, self.smoothing = base.max_cash, base.smoothing
+        self.cash_idx, self.include_weights = base.cash_idx, base.include_weights
+        self._prior_arr = base._prior_arr
+        self.T = len(self.idx)
+
+        self.random_start = random_start
+        self.autoreset = autoreset
+        self.episode_len, self.bootstrap, self._p_jump = base.episode_len, base.bootstrap, base._p_jump
+        min_len = int(min_episode_len) if self.episode_len is None else max(int(min_episode_len), self.episode_len)
+        self.max_start = max(self.window, self.T - min_len)
+        self._rng = np.random.default_rng(seed)
+        self.timings = new_env_timings()
+
+        N = int(num_envs)
+        self._rows = np.arange(N)
+        self.set_scenarios()
+        self.t0 = np.full(N, self.window, dtype=np.int64)
+        self.t = self.t0.copy()
+        self.t_end = np.full(N, self.T, dtype=np.int64)
+        self.steps = np.zeros(N, dtype=np.int64)
+        self.max_steps = self.t_end - self.t0
+        self.nav = np.ones(N)
+        self.max_nav = np.ones(N)
+        self.w = self._prior_arr[self.t0].copy()
+        self.num_envs = N
+        self.observation_space, self.action_space = base.observation_space, base.action_space
+
+    @classmethod
+    def from_env(cls, env: PortfolioEnv, num_envs: int = 1, **kwargs) -> "BatchedPortfolio":
+        """Reaproveita os tensores já montados de um PortfolioEnv (sem reler/reprocessar dados)."""
+        return cls(None, None, env.cfg, num_envs=num_envs, base=env, **kwargs)
+
+    def set_scenarios(self, returns: np.ndarray | None = None, features: np.ndarray | None = None):
+        """
+        Retornos (N, T, n) e/ou features (N, T, n*fdim) próprios por episódio (ex.: cenários de estresse).
+        Sem argumentos, todos os episódios compartilham os arrays do env base (views sem cópia).
+        """
+        N = len(self._rows)
+        base_ret, base_feat = self.base._ret_arr, self.base._feat_arr
+        self._ret_arr = np.broadcast_to(base_ret, (N,) + base_ret.shape) if returns is None else np.asarray(returns, dtype=np.float64)
+        self._feat_arr = np.broadcast_to(base_feat, (N,) + base_feat.shape) if features is None else np.asarray(features, dtype=np.float32)
+
+    # ---- estado -------------------------------------------------------------
+    def _reset_rows(self, rows: np.ndarray, starts=None):
+        k = int(rows.size) if rows.dtype != bool else int(rows.sum())
+        if starts is not None:
+            self.t0[rows] = np.clip(starts, self.window, self.T - 1)
+        elif self.bootstrap:
+            self.t0[rows] = self._rng.integers(self.window, self.T, size=k)
+        elif self.random_start and self.max_start > self.window:
+            self.t0[rows] = self._rng.integers(self.window, self.max_start + 1, size=k)
+        else:
+            self.t0[rows] = self.window
+        self.t[rows] = self.t0[rows]
+        self.steps[rows] = 0
+        if self.bootstrap:
+            self.t_end[rows] = self.T
+            self.max_steps[rows] = self.episode_len or self.T - self.window
+        else:
+            self.t_end[rows] = self.T if self.episode_len is None else np.minimum(self.T, self.t0[rows] + self.episode_len)
+            self.max_steps[rows] = self.t_end[rows] - self.t0[rows]
+        self.nav[rows] = 1.0
+        self.max_nav[rows] = 1.0
+        self.w[rows] = self._prior_arr[self.t0[rows]]
+
+    def _get_obs(self) -> np.ndarray:
+        feat = self._feat_arr[self._rows, np.minimum(self.t, self.T) - 1]
+        if self.include_weights:
+            return np.concatenate([feat, self.w.astype(np.float32)], axis=1)
+        return feat
+
+    def _apply_overlay(self, W: np.ndarray) -> np.ndarray:
+        """Overlay de drawdown (mesma lógica de ``PortfolioEnv._apply_overlay``) aplicado por linha."""
+        return drawdown_overlay_batch(W, self.nav / (self.max_nav + 1e-12) - 1.0, self.cash_idx, self.dd_trigger,
+                                      self.dd_hard, self.max_cash, self.smoothing, self.min_w, self.max_w)
+
+    def advance(self, actions: np.ndarray):
+        """
+        Um passo para os N episódios, sem montar infos nem resetar.
+
+        Episódios já encerrados (fim dos dados ou de ``episode_len``) ficam congelados:
+        pesos, NAV e ``t`` não mudam e recompensa/retorno/turnover são zero.
+
+        Returns:
+            (reward, turnover, return, cost), arrays (N,)
+        """
+        c0 = perf_counter_ns()
+        live = self.live()
+        t_idx = np.minimum(self.t, self.T - 1)
+        proposal = self.w + self.step_scale * np.tanh(np.asarray(actions, dtype=float).reshape(-1, self.n))
+        w_target = project_capped_simplex_batch(proposal, self.min_w, self.max_w, s=1.0)
+        c1 = perf_counter_ns()
+        w_target = self._apply_overlay(w_target)
+        c2 = perf_counter_ns()
+        if not live.all():
+            w_target[~live] = self.w[~live]
+
+        turnover = np.abs(w_target - self.w).sum(axis=1)
+        cost = self.cost_rate * turnover
+        r_t = np.einsum("ij,ij->i", self._ret_arr[self._rows, t_idx], w_target) * live
+        net = (1.0 + r_t) * (1.0 - cost)
+        self.nav *= net
+        np.maximum(self.max_nav, self.nav, out=self.max_nav)
+        dev = np.linalg.norm(w_target - self._prior_arr[t_idx], axis=1)
+        reward = (np.log(np.maximum(1e-8, net)) - self.turnover_pen * turnover - self.dev_pen * dev) * live
+
+        self.w = w_target
+        self.steps += live
+        if self.bootstrap:
+            jump = live & ((self.t + 1 >= self.T) | (self._rng.random(self.num_envs) < self._p_jump))
+            self.t = np.where(jump, self._rng.integers(self.window, self.T, size=self.num_envs), self.t + live)
+        else:
+            self.t += live
+        tm = self.timings
+        tm["projection"] += c1 - c0
+        tm["overlay"] += c2 - c1
+        tm["reward"] += perf_counter_ns() - c2
+        tm["steps"] += int(live.sum())
+        return reward, turnover, r_t, cost
+
+    def live(self) -> np.ndarray:
+        """Máscara (N,) dos episódios ainda em andamento."""
+        return (self.t < self.t_end) & (self.steps < self.max_steps)
+
+    def reset_at(self, starts) -> np.ndarray:
+        """Reseta todos os episódios com ``t0`` explícito (escalar ou (N,) índices em ``self.idx``)."""
+        self._reset_rows(self._rows, starts=np.broadcast_to(np.asarray(starts, dtype=np.int64), self._rows.shape))
+        return self._get_obs()
@@ -1,21 +1,35 @@
 from __future__ import annotations
 import pandas as pd, numpy as np
-from .utils import DATA_DIR, OUT_DIR, load_config
+from .utils import OUT_DIR, MPT_PRIOR_STORE, load_config, load_prices, load_frame
+from .engine import run_backtest, schedule_weights, env_cost_bps, align_prior, equal_weight_ex_cash
+from .perf import stage
 
-def _portfolio_nav(close: pd.DataFrame, weights: pd.Series) -> pd.Series:
+def _portfolio_nav(close: pd.DataFrame, weights: pd.Series, rebalance="D", cost_bps: float = 0.0) -> pd.Series:
     rets = close.pct_change().fillna(0.0)
-    port_ret = rets.mul(weights, axis=1).sum(axis=1)
-    nav = (1.0 + port_ret).cumprod()
-    return nav
+    W, mask = schedule_weights(rets.index, weights.reindex(close.columns).fillna(0.0), freq=rebalance)
+    return run_backtest(rets, W, rebalance=mask, cost_bps=cost_bps)["nav"]
 
+def _prior_nav(close: pd.DataFrame, prior: pd.DataFrame, cost_bps: float = 0.0, cash_sym: str = "CASH") -> pd.Series:
+    """
+    Carteira que segue o prior MPT dinâmico: cada re-otimização vale a partir da barra seguinte;
+    antes da 1ª, pesos iguais fora do CASH (mesmo fallback do PortfolioEnv).
+    """
+    rets = close.pct_change().fillna(0.0)
+    W, rows = align_prior(prior, close.index, close.columns, equal_weight_ex_cash(close.columns, cash_sym))
+    mask = np.r_[True, rows[1:] != rows[:-1]]
+    return run_backtest(rets, W, rebalance=mask, cost_bps=cost_bps)["nav"]
+
+@stage("benchmark")
 def main():
     cfg = load_config()
-    close = pd.read_csv(DATA_DIR / "prices.csv", index_col=0, parse_dates=True)
     start, end = cfg["walk_forward"]["test_start"], cfg["walk_forward"]["test_end"]
-    close = close.loc[start:end]
+    close = load_prices(start=start, end=end)
     rets = close.pct_change().fillna(0.0)
     assets = list(close.columns)
     cash_sym = cfg["universe"].get("cash_symbol", "CASH")
+    bcfg = cfg.get("benchmark", {})
+    rebalance = bcfg.get("rebalance", "D")
+    cost_bps = env_cost_bps(cfg) if bcfg.get("apply_costs", False) else 0.0
 
     # Equal-weight (exceto CASH)
     cols_nc = [c for c in assets if c != cash_sym]
@@ -27,10 +41,12 @@ def main():
 
     # SPY buy&hold, se existir
     bench = {}
-    nav_ew = _portfolio_nav(close, ew)
-    nav_mpt = _portfolio_nav(close, w_mpt)
+    nav_ew = _portfolio_nav(close, ew, rebalance, cost_bps)
+    nav_mpt = _portfolio_nav(close, w_mpt, rebalance, cost_bps)
     bench["EW"] = nav_ew
     bench["MPT_only"] = nav_mpt
+    if cfg["mpt"].get("prior", {}).get("mode", "static") == "dynamic" and (MPT_PRIOR_STORE / "schema.json").exists():
+        bench["MPT_dynamic"] = _prior_nav(close, load_frame(MPT_PRIOR_STORE, mmap=False), cost_bps, cash_sym)
     if "SPY" in assets:
         spy_nav = (close["SPY"].pct_change().fillna(0.0) + 1.0).cumprod()
         bench["SPY"] = spy_nav
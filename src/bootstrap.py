@@ -0,0 +1,99 @@
+from __future__ import annotations
+import numpy as np, pandas as pd
+
+def stationary_indices(T: int, B: int, mean_block: float = 20.0, rng=None) -> np.ndarray:
+    """
+    Índices (B, T) do bootstrap estacionário (Politis & Romano).
+
+    Cada posição inicia um novo bloco com probabilidade ``1/mean_block`` (blocos de
+    tamanho geométrico); dentro do bloco o índice avança de 1 em 1, circular em ``T``.
+    """
+    rng = np.random.default_rng(rng)
+    t = np.arange(T)
+    new_block = rng.random((B, T)) < 1.0 / max(float(mean_block), 1.0)
+    new_block[:, 0] = True
+    block_pos = np.maximum.accumulate(np.where(new_block, t, 0), axis=1)
+    starts = rng.integers(0, T, size=(B, T))
+    return (np.take_along_axis(starts, block_pos, axis=1) + t - block_pos) % T
+
+def path_metrics(ret: np.ndarray, net: np.ndarray | None = None, bench: np.ndarray | None = None,
+                 rf: float = 0.0, period_per_year: int = 252) -> dict[str, np.ndarray]:
+    """
+    Métricas de ``evaluate`` calculadas de uma vez para cada linha de (B, T).
+
+    ``ret`` alimenta Sharpe/Sortino/Alpha/Beta (como ``evaluate.main`` usa a coluna ``ret``);
+    ``net`` (default = ``ret``) gera a NAV de CAGR/MaxDrawdown/Calmar; ``bench`` é o
+    retorno do benchmark na mesma reamostragem (Alpha/Beta CAPM por OLS).
+    """
+    ret = np.atleast_2d(np.asarray(ret, dtype=float))
+    net = ret if net is None else np.atleast_2d(np.asarray(net, dtype=float))
+    T = ret.shape[1]
+    excess = ret - rf / period_per_year
+    mu = excess.mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = excess.std(axis=1, ddof=1)
+        down = np.minimum(excess, 0.0).std(axis=1, ddof=1)
+        out = {
+            "Sharpe": np.where(sigma > 1e-12, mu * np.sqrt(period_per_year) / sigma, np.nan),
+            "Sortino": np.where(down > 1e-12, mu * np.sqrt(period_per_year) / down, np.nan),
+        }
+        nav = np.cumprod(1.0 + net, axis=1)
+        mdd = (nav / np.maximum.accumulate(nav, axis=1) - 1.0).min(axis=1)
+        ann_ret = (1.0 + net.mean(axis=1)) ** period_per_year - 1.0
+        out["CAGR"] = nav[:, -1] ** (period_per_year / T) - 1.0
+        out["MaxDrawdown"] = mdd
+        out["Calmar"] = np.where(np.abs(mdd) > 1e-12, ann_ret / np.abs(mdd), np.nan)
+        if bench is not None:
+            x = np.atleast_2d(np.asarray(bench, dtype=float)) - rf / period_per_year
+            xc = x - x.mean(axis=1, keepdims=True)
+            var = (xc * xc).sum(axis=1)
+            beta = np.where(var > 1e-18, (xc * (excess - mu[:, None])).sum(axis=1) / var, np.nan)
+            out["Alpha"] = (mu - beta * x.mean(axis=1)) * period_per_year
+            out["Beta"] = beta
+    return out
+
+def bootstrap_metrics(ret, net=None, bench=None, n_resamples: int = 2000, mean_block: float = 20.0,
+                      chunk_size: int | None = None, rf: float = 0.0, period_per_year: int = 252,
+                      seed: int | None = None) -> dict[str, np.ndarray]:
+    """
+    Distribuição bootstrap (B,) de cada métrica de ``path_metrics``.
+
+    As séries (``ret``, ``net``, ``bench``) são reamostradas com os mesmos índices,
+    preservando a correlação entre elas. ``chunk_size`` limita a memória: as
+    reamostragens são geradas e reduzidas em blocos de até ``chunk_size`` caminhos.
+    """
+    rng = np.random.default_rng(seed)
+    series = [None if s is None else np.asarray(s, dtype=float) for s in (ret, net, bench)]
+    T = len(series[0])
+    chunk = int(chunk_size or n_resamples)
+    parts: dict[str, list] = {}
+    for b0 in range(0, n_resamples, chunk):
+        idx = stationary_indices(T, min(chunk, n_resamples - b0), mean_block, rng)
+        r, n, b = (None if s is None else s[idx] for s in series)
+        for k, v in path_metrics(r, n, b, rf, period_per_year).items():
+            parts.setdefault(k, []).append(v)
+    return {k: np.concatenate(v) for k, v in parts.items()}
+
+def confidence_intervals(samples: dict[str, np.ndarray], ci: float = 0.95) -> dict[str, dict]:
+    """Intervalos percentis (ignorando NaN): ``{métrica: {low, median, high, std}}``."""
+    q = [(1.0 - ci) / 2.0, 0.5, (1.0 + ci) / 2.0]
+    out = {}
+    for k, v in samples.items():
+        v = v[np.isfinite(v)]
+        if v.size == 0:
+            continue
+        lo, med, hi = np.quantile(v, q)
+        out[k] = {"low": float(lo), "median": float(med), "high": float(hi), "std": float(v.std(ddof=1)) if v.size > 1 else 0.0}
+    return out
+
+def bootstrap_report(eq: pd.DataFrame, bench_ret: pd.Series | None, rf: float, bcfg: dict, seed: int | None = None) -> dict:
+    """Bloco ``bootstrap`` do metrics.json a partir da curva de teste (colunas ``nav`` e ``ret``)."""
+    nav = eq["nav"].to_numpy(dtype=float)
+    net = np.empty_like(nav)
+    net[0] = nav[0] - 1.0
+    net[1:] = nav[1:] / nav[:-1] - 1.0
+    bench = None if bench_ret is None else bench_ret.reindex(eq.index).fillna(0.0).to_numpy(dtype=float)
+    B, block, ci = int(bcfg.get("n_resamples", 2000)), float(bcfg.get("block_size", 20)), float(bcfg.get("ci", 0.95))
+    samples = bootstrap_metrics(eq["ret"].fillna(0.0).to_numpy(dtype=float), net, bench, n_resamples=B,
+                                mean_block=block, chunk_size=bcfg.get("chunk_size"), rf=rf, seed=seed)
+    return {"n_resamples": B, "mean_block": block, "ci": ci, "intervals": confidence_intervals(samples, ci)}
@@ -0,0 +1,256 @@
+from __future__ import annotations
+import pathlib
+import numpy as np, pandas as pd
+from .utils import OUT_DIR
+from .features import price_anchor as _hash_prices
+
+COV_STATE_PATH = OUT_DIR / "cov_state.npz"
+ANCHOR_ROWS = 5   # barras finais (até ``last_date``) na âncora de preços do estado
+
+# ---- Estimadores incrementais -----------------------------------------------
+class CovEstimator:
+    """
+    Interface de estimadores de covariância atualizáveis barra a barra.
+
+    ``update`` consome retornos simples (k, N) em O(k·N²), sem reler o histórico;
+    ``cov``/``mean`` devolvem estimativas anualizadas (como ``risk_models.sample_cov``
+    e ``expected_returns.mean_historical_return(compounding=True)`` do pypfopt).
+    O estado (``state``/``from_state``) é só de arrays e vai para um ``.npz``; ``anchor``
+    (ver ``estimate``) identifica os preços que geraram as somas.
+    Retornos NaN (ativo ainda sem preço) entram como zero.
+    """
+
+    name = ""
+    _ARRAYS: tuple[str, ...] = ()
+
+    def __init__(self, assets, period_per_year: int = 252, **params):
+        self.assets = list(assets)
+        self.ppy = int(period_per_year)
+        self.params = params
+        N = len(self.assets)
+        self.n = 0
+        self.log_sum = np.zeros(N)
+        self.first_date = self.last_date = None
+        self.anchor = None
+        self._init(N)
+
+    def _init(self, N: int):
+        raise NotImplementedError
+
+    def _update(self, X: np.ndarray):
+        raise NotImplementedError
+
+    def _cov(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def update(self, returns) -> "CovEstimator":
+        if isinstance(returns, pd.DataFrame):
+            if not returns.empty:
+                self.first_date = self.first_date if self.first_date is not None else returns.index[0]
+                self.last_date = returns.index[-1]
+            returns = returns[self.assets].to_numpy(dtype=float)
+        X = np.nan_to_num(np.atleast_2d(np.asarray(returns, dtype=float)))
+        if len(X):
+            self.n += len(X)
+            self.log_sum += np.log1p(X).sum(axis=0)
+            self._update(X)
+        return self
+
+    def update_prices(self, close: pd.DataFrame) -> "CovEstimator":
+        """Consome só as barras de ``close`` posteriores a ``last_date`` (ou todas, se vazio)."""
+        if self.last_date is not None:
+            i = int(close.index.searchsorted(self.last_date))
+            if i >= len(close) or close.index[i] != self.last_date:
+                raise ValueError(f"Estado de covariância termina em {self.last_date}, fora do índice de preços")
+            close = close.iloc[i:]
+        if self.first_date is None and len(close):
+            self.first_date = close.index[0]
+        return self.update(close[self.assets].pct_change().iloc[1:])
+
+    def mean(self) -> pd.Series:
+        return pd.Series(np.expm1(self.log_sum / max(self.n, 1) * self.ppy), index=self.assets)
+
+    def cov(self) -> pd.DataFrame:
+        return pd.DataFrame(self._cov() * self.ppy, index=self.assets, columns=self.assets)
+
+    # ---- persistência -------------------------------------------------------
+    def state(self) -> dict:
+        st = {k: getattr(self, k) for k in self._ARRAYS}
+        date = lambda d: np.datetime64("NaT") if d is None else pd.Timestamp(d).to_datetime64()
+        st.update(name=self.name, assets=np.array(self.assets), n=self.n, log_sum=self.log_sum, ppy=self.ppy,
+                  params=np.array(repr(sorted(self.params.items()))),
+                  first_date=date(self.first_date), last_date=date(self.last_date),
+                  anchor=np.array(self.anchor or ""))
+        return st
+
+    def save(self, path=COV_STATE_PATH):
+        np.savez(path, **self.state())
+
+    @classmethod
+    def from_state(cls, st, **params) -> "CovEstimator":
+        est = ESTIMATORS[str(st["name"])](list(st["assets"]), int(st["ppy"]), **params)
+        if str(st["params"]) != repr(sorted(est.params.items())):
+            raise ValueError("Parâmetros do estimador diferem do estado salvo")
+        est.n, est.log_sum = int(st["n"]), np.asarray(st["log_sum"])
+        date = lambda d: None if np.isnat(d) else pd.Timestamp(d[()])
+        est.first_date, est.last_date = date(st["first_date"]), date(st["last_date"])
+        est.anchor = (str(st["anchor"]) if "anchor" in st.files else "") or None
+        for k in est._ARRAYS:
+            setattr(est, k, np.array(st[k]))
+        return est
+
+class SampleCov(CovEstimator):
+    """Covariância amostral (ddof=1) a partir de Σx e Σxxᵀ."""
+
+    name = "sample"
+    _ARRAYS = ("s1", "m11")
+
+    def _init(self, N):
+        self.s1 = np.zeros(N)
+        self.m11 = np.zeros((N, N))
+
+    def _update(self, X):
+        self.s1 += X.sum(axis=0)
+        self.m11 += X.T @ X
+
+    def _centered(self) -> np.ndarray:
+        """Σ (x - m)(x - m)ᵀ."""
+        m = self.s1 / self.n
+        return self.m11 - self.n * np.outer(m, m)
+
+    def _cov(self):
+        return self._centered() / max(self.n - 1, 1)
+
+class LedoitWolfCov(SampleCov):
+    """
+    Ledoit-Wolf com alvo de variância constante (o mesmo de ``sklearn.covariance.ledoit_wolf``,
+    usado pelo ``CovarianceShrinkage.ledoit_wolf`` do pypfopt). A intensidade de
+    encolhimento vem de momentos cruzados de 3ª/4ª ordem (Σx²x²ᵀ, Σx²xᵀ) acumulados
+    em O(N²) por barra, então continua exata sob atualização incremental.
+    """
+
+    name = "ledoit_wolf"
+    _ARRAYS = ("s1", "m11", "s2", "m21", "m22")
+
+    def _init(self, N):
+        super()._init(N)
+        self.s2 = np.zeros(N)
+        self.m21 = np.zeros((N, N))     # Σ x_i² x_j
+        self.m22 = np.zeros((N, N))     # Σ x_i² x_j²
+
+    def _update(self, X):
+        super()._update(X)
+        X2 = X * X
+        self.s2 += X2.sum(axis=0)
+        self.m21 += X2.T @ X
+        self.m22 += X2.T @ X2
+
+    def shrinkage(self) -> tuple[np.ndarray, float]:
+        n, p = self.n, len(self.assets)
+        m = self.s1 / n
+        C = self._centered()
+        emp = C / n
+        # Σ_t (x_ti - m_i)² (x_tj - m_j)², expandido nos acumuladores brutos
+        mm = np.outer(m, m)
+        X4 = (self.m22 - 2 * self.m21 * m[None, :] - 2 * self.m21.T * m[:, None]
+              + np.outer(self.s2, m * m) + np.outer(m * m, self.s2) + 4 * mm * self.m11
+              - 2 * np.outer(m * self.s1, m * m) - 2 * np.outer(m * m, m * self.s1) + n * mm * mm)
+        trace = np.diag(emp)
+        mu = trace.sum() / p
+        delta_ = (emp * emp).sum()
+        beta = (X4.sum() / n - delta_) / (p * n)
+        delta = (delta_ - 2.0 * mu * trace.sum() + p * mu ** 2) / p
+        beta = min(beta, delta)
+        shrink = 0.0 if beta == 0 else float(beta / delta)
+        return (1.0 - shrink) * emp + shrink * mu * np.eye(p), shrink
+
+    def _cov(self):
+        return self.shrinkage()[0]
+
+class EWMACov(CovEstimator):
+    """
+    Covariância exponencial (``halflife`` em barras), igual a
+    ``DataFrame.ewm(halflife=..., adjust=True).cov(bias=True)``; atualização O(N²) por barra.
+    """
+
+    name = "ewma"
+    _ARRAYS = ("w", "sx", "sxx")
+
+    def _init(self, N):
+        self.decay = 0.5 ** (1.0 / float(self.params.get("halflife", 63)))
+        self.w = np.zeros(())
+        self.sx = np.zeros(N)
+        self.sxx = np.zeros((N, N))
+
+    def _update(self, X):
+        k = len(X)
+        wts = self.decay ** np.arange(k - 1, -1, -1.0)
+        carry = self.decay ** k
+        self.w = carry * self.w + wts.sum()
+        self.sx = carry * self.sx + wts @ X
+        self.sxx = carry * self.sxx + (X * wts[:, None]).T @ X
+
+    def _cov(self):
+        m = self.sx / self.w
+        return self.sxx / self.w - np.outer(m, m)
+
+class FactorCov(LedoitWolfCov):
+    """
+    Modelo de fatores estatístico: ``n_factors`` componentes principais da covariância
+    Ledoit-Wolf (B Bᵀ) + variâncias idiossincráticas diagonais, positiva definida mesmo com N ≫ T.
+    """
+
+    name = "factor"
+
+    def _cov(self):
+        S = super()._cov()
+        k = min(int(self.params.get("n_factors", 5)), len(S) - 1)
+        vals, vecs = np.linalg.eigh(S)
+        B = vecs[:, -k:] * np.sqrt(np.maximum(vals[-k:], 0.0)) if k > 0 else np.zeros((len(S), 0))
+        common = B @ B.T
+        resid = np.maximum(np.diag(S) - np.diag(common), 1e-4 * np.diag(S).mean())
+        return common + np.diag(resid)
+
+ESTIMATORS = {"sample": SampleCov, "ledoit_wolf": LedoitWolfCov, "ewma": EWMACov, "factor": FactorCov}
+
+def _params(ccfg: dict) -> dict:
+    method = ccfg.get("method", "sample")
+    if method == "ewma":
+        return {"halflife": float(ccfg.get("halflife", 63))}
+    if method == "factor":
+        return {"n_factors": int(ccfg.get("n_factors", 5))}
+    return {}
+
+def make_estimator(cfg: dict, assets) -> CovEstimator:
+    ccfg = cfg.get("mpt", {}).get("covariance", {})
+    return ESTIMATORS[ccfg.get("method", "sample")](assets, **_params(ccfg))
+
+def price_anchor(close: pd.DataFrame, last_date) -> str:
+    """Hash da 1ª linha e das ``ANCHOR_ROWS`` barras até ``last_date`` (muda se o histórico for reajustado)."""
+    seen = close.loc[:last_date]
+    return _hash_prices(close.index[0], pd.concat([seen.iloc[:1], seen.iloc[-ANCHOR_ROWS:]]))
+
+def estimate(close: pd.DataFrame, cfg: dict, path=None) -> CovEstimator:
+    """
+    Estimador do config alimentado com ``close``. Com ``path``, retoma o estado salvo
+    (mesmo método/parâmetros/ativos, data final dentro de ``close`` e mesmos preços nas
+    barras da âncora) e só processa as barras novas; senão recomeça do zero — ex.: preços
+    reajustados por provento/split depois de um novo download. O estado vai para ``path``.
+    """
+    est = make_estimator(cfg, close.columns)
+    if path is not None and pathlib.Path(path).exists():
+        try:
+            with np.load(path, allow_pickle=False) as st:
+                cached = CovEstimator.from_state(st, **est.params)
+            if (cached.name == est.name and cached.assets == est.assets and cached.first_date == close.index[0]
+                    and cached.anchor == price_anchor(close, cached.last_date)):
+                est = cached.update_prices(close)
+        except (ValueError, KeyError):
+            est = make_estimator(cfg, close.columns)
+    if est.n == 0:
+        est.update_prices(close)
+    if est.last_date is not None:
+        est.anchor = price_anchor(close, est.last_date)
+    if path is not None:
+        est.save(path)
+    return est
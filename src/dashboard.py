@@ -1,73 +1,70 @@
 import streamlit as st
-import pandas as pd, numpy as np, pathlib, os, matplotlib.pyplot as plt
+import pandas as pd, pathlib, sys
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
-OUT_DIR = ROOT / "outputs"
-DATA_DIR = ROOT / "data"
+sys.path.insert(0, str(ROOT))
+from src import dashboard_data as dd
+
+# Toda leitura passa por ``src.dashboard_data``: arquivos só são relidos quando mudam
+# (mtime/tamanho), as séries chegam já reduzidas por LTTB e só as execuções
+# selecionadas são carregadas.
 
 st.set_page_config(page_title="Synapse Portfolio (Advanced)", layout="wide")
 st.title("Synapse Portfolio — Dashboard (Advanced)")
 st.caption("MPT + DRL (PPO) com overlay de risco (drawdown) e benchmarks.")
 
-eq_path = OUT_DIR / "test_equity_curve.csv"
-w_path = OUT_DIR / "test_weights.csv"
-mpt_path = OUT_DIR / "mpt_weights.csv"
-bench_path = OUT_DIR / "benchmarks.csv"
-metrics_path = OUT_DIR / "metrics.json"
-
-if not eq_path.exists():
+runs = dd.discover_runs()
+if not runs:
     st.warning("Execute o pipeline: data → features → mpt → train_rl → benchmark → evaluate")
-else:
-    eq = pd.read_csv(eq_path, parse_dates=["date"]).set_index("date")
-    st.subheader("Equity Curve (Teste) — RL vs Benchmarks")
-    fig, ax = plt.subplots()
-    eq["nav"].plot(ax=ax, label="RL")
-    if bench_path.exists():
-        bench = pd.read_csv(bench_path, index_col=0, parse_dates=True)
-        for c in bench.columns:
-            bench[c].plot(ax=ax, label=c)
-    ax.set_xlabel("Data"); ax.set_ylabel("NAV"); ax.legend()
-    st.pyplot(fig)
+    st.stop()
+
+by_name = {r["name"]: r for r in runs}
+with st.sidebar:
+    st.header("Execução")
+    run = by_name[st.selectbox("Execução / fold", list(by_name))]
+    others = st.multiselect("Comparar com", [n for n in by_name if n != run["name"]])
+    n_points = st.slider("Pontos por série", 200, 5000, 1500, step=100,
+                         help="Downsampling LTTB (mínimos/máximos preservados) por série")
+
+nav_full = dd.nav_panel(run)
+first, last = nav_full.index[0].date(), nav_full.index[-1].date()
+start, end = (st.sidebar.slider("Período", min_value=first, max_value=last, value=(first, last))
+              if first < last else (first, last))
 
-    st.subheader("Drawdown (Teste)")
-    fig2, ax2 = plt.subplots()
-    nav = eq["nav"]
-    dd = nav / nav.cummax() - 1.0
-    dd.plot(ax=ax2, label="RL")
-    if bench_path.exists():
-        for c in bench.columns:
-            bdd = bench[c] / bench[c].cummax() - 1.0
-            bdd.plot(ax=ax2, label=f"{c}")
-    ax2.set_xlabel("Data"); ax2.set_ylabel("Drawdown"); ax2.legend()
-    st.pyplot(fig2)
+st.subheader(f"Equity Curve — {run['name']}")
+st.line_chart(dd.chart_data(run, "nav", n_points, start, end))
 
-    st.subheader("Retornos e Turnover (Teste)")
+st.subheader("Drawdown")
+st.line_chart(dd.chart_data(run, "drawdown", n_points, start, end))
+
+if others:
+    st.subheader("Comparação entre execuções (NAV do RL)")
+    st.line_chart(dd.compare_runs([run] + [by_name[n] for n in others], n_points, start, end))
+
+rolling = dd.read_table(run["rolling"]) if run["rolling"] is not None else None
+if rolling is not None:
+    st.subheader("Métricas Móveis")
     c1, c2 = st.columns(2)
-    with c1:
-        fig3, ax3 = plt.subplots()
-        eq["ret"].plot(ax=ax3)
-        ax3.set_xlabel("Data"); ax3.set_ylabel("Retorno")
-        st.pyplot(fig3)
-    with c2:
-        fig4, ax4 = plt.subplots()
-        eq["turnover"].plot(ax=ax4)
-        ax4.set_xlabel("Data"); ax4.set_ylabel("Turnover")
-        st.pyplot(fig4)
+    window = c1.selectbox("Janela (pregões)", sorted(rolling.columns.unique("window"), key=int))
+    metric = c2.selectbox("Métrica", list(rolling.columns.unique("metric")))
+    st.line_chart(dd.rolling_chart(run, window, metric, n_points, start, end))
+
+st.subheader("Retornos e Turnover")
+c1, c2 = st.columns(2)
+with c1:
+    st.line_chart(dd.series_chart(run, "ret", n_points, start, end))
+with c2:
+    st.line_chart(dd.series_chart(run, "turnover", n_points, start, end))
 
-    if w_path.exists():
-        w = pd.read_csv(w_path, parse_dates=["date"]).set_index("date")
-        st.subheader("Pesos (últimos 30 dias de teste)")
-        st.dataframe(w.tail(30))
+if run["weights"] is not None and st.checkbox("Mostrar pesos (últimos 30 dias)"):
+    st.dataframe(dd.read_table(run["weights"]).loc[:pd.Timestamp(end)].tail(30))
 
-    if mpt_path.exists():
-        mpt_w = pd.read_csv(mpt_path, index_col=0)
-        st.subheader("Pesos MPT iniciais")
-        st.bar_chart(mpt_w)
+if run["mpt_weights"] is not None:
+    st.subheader("Pesos MPT iniciais")
+    st.bar_chart(dd.read_table(run["mpt_weights"]))
 
-    if metrics_path.exists():
-        import json
-        metrics = json.load(open(metrics_path))
-        st.subheader("Métricas (Teste)")
-        st.json(metrics)
+if run["metrics"] is not None:
+    st.subheader("Métricas")
+    st.json(dd.read_json(run["metrics"]))
 
 st.info("Ajuste `config.yaml` para mudar o universo, datas, custos e hiperparâmetros.")
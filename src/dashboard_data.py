@@ -0,0 +1,197 @@
+"""
+Camada de dados do dashboard: descoberta de execuções/folds, leitores com cache
+invalidado por (mtime, tamanho) do arquivo, NAV/drawdown pré-calculados e
+downsampling LTTB que preserva mínimos/máximos.
+
+Os caches são ``lru_cache`` de tamanho limitado no processo do Streamlit: são
+compartilhados entre sessões e só as execuções efetivamente abertas ficam em
+memória. Os DataFrames devolvidos são compartilhados — não modificar.
+"""
+from __future__ import annotations
+import json, pathlib
+from functools import lru_cache
+import numpy as np, pandas as pd
+from .utils import OUT_DIR, load_frame
+
+RUNS_DIR = OUT_DIR / "runs"
+WF_CACHE_DIR = OUT_DIR / "walk_forward" / "cache"
+# arquivos de uma execução (mesmos nomes em outputs/ e em outputs/runs/<nome>/)
+RUN_FILES = {"equity": "test_equity_curve.csv", "weights": "test_weights.csv", "benchmarks": "benchmarks.csv",
+             "metrics": "metrics.json", "rolling": "rolling", "mpt_weights": "mpt_weights.csv"}
+
+# ---- assinaturas e leitores -------------------------------------------------
+def signature(path) -> tuple | None:
+    """(caminho, mtime_ns, tamanho) — para stores colunares, do ``values.npy``; None se não existir."""
+    if path is None:
+        return None
+    path = pathlib.Path(path)
+    probe = path / "values.npy" if path.is_dir() else path
+    if not probe.exists():
+        return None
+    st = probe.stat()
+    return str(path), st.st_mtime_ns, st.st_size
+
+def _read(path: pathlib.Path) -> pd.DataFrame:
+    if path.is_dir():
+        return load_frame(path, mmap=False)
+    df = pd.read_csv(path, index_col=0, parse_dates=True)
+    if isinstance(df, pd.DataFrame) and df.index.name in ("date", None) and isinstance(df.index, pd.DatetimeIndex):
+        df.index.name = "date"
+    return df
+
+@lru_cache(maxsize=32)
+def _table(sig: tuple) -> pd.DataFrame:
+    return _read(pathlib.Path(sig[0]))
+
+def read_table(path) -> pd.DataFrame | None:
+    """CSV indexado por data ou store colunar, relido só quando o arquivo muda."""
+    sig = signature(path)
+    return None if sig is None else _table(sig)
+
+@lru_cache(maxsize=64)
+def _json(sig: tuple) -> dict:
+    with open(sig[0]) as f:
+        return json.load(f)
+
+def read_json(path) -> dict | None:
+    sig = signature(path)
+    return None if sig is None else _json(sig)
+
+# ---- execuções ----------------------------------------------------------------
+def _run(name: str, kind: str, base: pathlib.Path, **paths) -> dict:
+    run = {"name": name, "kind": kind}
+    for key, fname in RUN_FILES.items():
+        p = paths.get(key, base / fname)
+        run[key] = p if p is not None and signature(p) is not None else None
+    return run
+
+def discover_runs(out_dir=None) -> list[dict]:
+    """
+    Execuções disponíveis, sem carregar séries: a atual (``outputs/``), as arquivadas
+    em ``outputs/runs/<nome>/`` (mesmo layout), a curva walk-forward costurada e cada
+    fold do cache walk-forward (stores ``equity``/``weights`` + ``fold.json``).
+    """
+    out_dir = OUT_DIR if out_dir is None else pathlib.Path(out_dir)
+    runs = []
+    if signature(out_dir / RUN_FILES["equity"]):
+        runs.append(_run("atual", "run", out_dir))
+    runs_dir = out_dir / RUNS_DIR.name
+    if runs_dir.is_dir():
+        for d in sorted(p for p in runs_dir.iterdir() if p.is_dir()):
+            if signature(d / RUN_FILES["equity"]):
+                runs.append(_run(d.name, "run", d))
+    no_extras = dict.fromkeys(("weights", "metrics", "rolling", "mpt_weights"))
+    if signature(out_dir / "walk_forward_equity.csv"):
+        runs.append(_run("walk-forward", "walk_forward", out_dir, equity=out_dir / "walk_forward_equity.csv",
+                         **no_extras))
+    wf_cache = out_dir / WF_CACHE_DIR.relative_to(OUT_DIR)
+    if wf_cache.is_dir():
+        folds = []
+        for d in wf_cache.iterdir():
+            fold = read_json(d / "fold.json")
+            if fold is not None and signature(d / "equity"):
+                folds.append((fold, d))
+        for fold, d in sorted(folds, key=lambda f: f[0]["test_start"]):
+            runs.append(_run(f"fold {fold['fold']} ({fold['test_start']} → {fold['test_end']}) [{d.name[:8]}]",
+                             "fold", d, equity=d / "equity", weights=d / "weights", benchmarks=out_dir / "benchmarks.csv",
+                             metrics=None, rolling=None))
+    return runs
+
+# ---- séries pré-calculadas ----------------------------------------------------
+@lru_cache(maxsize=16)
+def _panels(eq_sig: tuple, bench_sig: tuple | None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    nav = _table(eq_sig)["nav"].rename("RL")
+    navs = nav.to_frame()
+    if bench_sig is not None:
+        bench = _table(bench_sig)
+        bench = bench.reindex(nav.index).ffill()
+        # benchmarks rebaseados no início da curva do RL (folds começam no meio do teste)
+        navs = pd.concat([navs, bench / bench.bfill().iloc[0] * nav.iloc[0]], axis=1)
+    dd = navs / navs.cummax() - 1.0
+    return navs, dd
+
+def nav_panel(run: dict) -> pd.DataFrame:
+    """NAV do RL + benchmarks alinhados ao índice do RL."""
+    return _panels(signature(run["equity"]), signature(run.get("benchmarks")))[0]
+
+def drawdown_panel(run: dict) -> pd.DataFrame:
+    return _panels(signature(run["equity"]), signature(run.get("benchmarks")))[1]
+
+# ---- downsampling -------------------------------------------------------------
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Índices escolhidos pelo Largest-Triangle-Three-Buckets (Steinarsson, 2013):
+    mantém o primeiro e o último ponto e, em cada bucket, o ponto que forma o maior
+    triângulo com o escolhido antes e a média do bucket seguinte.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = (np.floor(np.arange(n_out - 1) * (n - 2) / (n_out - 2)) + 1).astype(np.int64)
+    edges = np.r_[edges, n - 1]
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, max(edges[i + 2], hi + 1)     # o último "bucket seguinte" é o ponto final
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def downsample(df: pd.DataFrame, n_out: int) -> pd.DataFrame:
+    """
+    Até ~``n_out`` pontos por coluna: união dos índices LTTB de cada coluna com o
+    mínimo e o máximo globais de cada uma (fundo do drawdown nunca some do gráfico).
+    """
+    if len(df) <= n_out:
+        return df
+    x = df.index.asi8.astype(float) if isinstance(df.index, pd.DatetimeIndex) else np.arange(len(df), dtype=float)
+    x = x - x[0]
+    keep = []
+    for c in df.columns:
+        y = df[c].to_numpy(dtype=float)
+        valid = ~np.isnan(y)
+        if not valid.any():
+            continue
+        y = np.where(valid, y, np.nanmean(y))
+        keep += [lttb(x, y, n_out), [int(np.argmin(np.where(valid, y, np.inf))),
+                                    int(np.argmax(np.where(valid, y, -np.inf)))]]
+    idx = np.unique(np.concatenate(keep)) if keep else np.arange(0)
+    return df.iloc[idx]
+
+def _window(df: pd.DataFrame, start, end) -> pd.DataFrame:
+    return df.loc[pd.Timestamp(start) if start else None:pd.Timestamp(end) if end else None]
+
+@lru_cache(maxsize=64)
+def _chart(eq_sig, bench_sig, kind: str, n_points: int, start, end) -> pd.DataFrame:
+    navs, dd = _panels(eq_sig, bench_sig)
+    return downsample(_window(navs if kind == "nav" else dd, start, end), n_points)
+
+def chart_data(run: dict, kind: str = "nav", n_points: int = 1500, start=None, end=None) -> pd.DataFrame:
+    """NAV (``kind="nav"``) ou drawdown da execução no intervalo, já reduzida a ~``n_points``."""
+    if kind not in ("nav", "drawdown"):
+        raise ValueError(f"kind inválido: {kind}")
+    return _chart(signature(run["equity"]), signature(run.get("benchmarks")), kind, int(n_points),
+                  None if start is None else str(start), None if end is None else str(end))
+
+def compare_runs(runs: list[dict], n_points: int = 1500, start=None, end=None) -> pd.DataFrame:
+    """NAV do RL de várias execuções lado a lado (cada uma carregada/cacheada individualmente)."""
+    cols = {r["name"]: chart_data(r, "nav", n_points, start, end)["RL"] for r in runs}
+    return pd.DataFrame(cols).sort_index().ffill() if cols else pd.DataFrame()
+
+def series_chart(run: dict, column: str, n_points: int = 1500, start=None, end=None) -> pd.DataFrame:
+    """Coluna da curva de equity (ex.: ``ret``, ``turnover``) recortada e reduzida."""
+    eq = read_table(run["equity"])
+    return downsample(_window(eq[[column]], start, end), n_points)
+
+def rolling_chart(run: dict, window, metric: str, n_points: int = 1500, start=None, end=None) -> pd.DataFrame | None:
+    rolling = read_table(run.get("rolling"))
+    if rolling is None:
+        return None
+    sel = rolling.xs((window, metric), axis=1, level=("window", "metric"))
+    return downsample(_window(sel, start, end), n_points)
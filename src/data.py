@@ -1,14 +1,242 @@
 from __future__ import annotations
-import pandas as pd
-import yfinance as yf
-from .utils import DATA_DIR, ensure_dirs, load_config
+import json, time, pathlib
+import numpy as np, pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from .utils import ROOT, DATA_DIR, ensure_dirs, load_config, save_prices, save_frame, load_frame
+from .perf import stage
 
-def fetch_prices(cfg) -> pd.DataFrame:
+CACHE_DIR = DATA_DIR / "cache"
+
+# ---- Provedores de preços ---------------------------------------------------
+class PriceProvider:
+    """
+    Interface: ``fetch`` devolve preços de fechamento (colunas = tickers) em [start, end).
+    ``thread_safe = False``: ``download_prices`` chama ``fetch`` de um lote por vez.
+    """
+
+    thread_safe = True
+
+    def fetch(self, tickers: list[str], start: str, end: str, interval: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+class YahooProvider(PriceProvider):
+    """
+    ``yf.download`` guarda resultados/erros em estado global do módulo, então não roda
+    em várias threads nossas ao mesmo tempo (e não dá para travar só um trecho dele):
+    os lotes vão um de cada vez, sem o pool de ``download_prices``, e o paralelismo
+    fica com o próprio yfinance (``threads=True``) dentro de cada lote.
+    """
+
+    thread_safe = False
+
+    def fetch(self, tickers, start, end, interval):
+        import yfinance as yf
+        df = yf.download(
+            tickers=tickers,
+            start=start,
+            end=end,
+            interval=interval,
+            auto_adjust=True,
+            progress=False,
+            group_by='ticker',
+            threads=True,
+        )
+        return _extract_close(df, tickers)
+
+class LocalFileProvider(PriceProvider):
+    """
+    Lê ``<root>/<ticker>.csv`` (colunas ``date`` e ``close``). Substitui o Yahoo em
+    testes e ambientes offline; tickers sem arquivo voltam vazios.
     """
-    Baixa dados históricos de preços do Yahoo Finance.
+
+    def __init__(self, root):
+        self.root = pathlib.Path(root)
+
+    def fetch(self, tickers, start, end, interval):
+        cols = {}
+        for t in tickers:
+            path = self.root / f"{t}.csv"
+            if not path.exists():
+                continue
+            s = pd.read_csv(path, index_col=0, parse_dates=True).iloc[:, 0]
+            cols[t] = s.loc[(s.index >= pd.Timestamp(start)) & (s.index < pd.Timestamp(end))]
+        return pd.DataFrame(cols)
+
+PROVIDERS = {"yahoo": YahooProvider, "local": LocalFileProvider}
+
+def make_provider(cfg) -> PriceProvider:
+    dcfg = cfg.get("data", {})
+    name = dcfg.get("provider", "yahoo")
+    if name == "local":
+        return LocalFileProvider(ROOT / dcfg["local_path"])
+    return PROVIDERS[name]()
+
+def _extract_close(df: pd.DataFrame, tickers: list[str]) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame()
+    if isinstance(df.columns, pd.MultiIndex):
+        close = df["Close"].copy() if "Close" in df.columns.get_level_values(0) else df.xs('Close', level=1, axis=1)
+    else:
+        # Apenas 1 ticker
+        close = df[["Close"]].copy() if "Close" in df.columns else df.to_frame(name=tickers[0])
+        close.columns = tickers
+    return close
+
+# ---- Cache local por ticker -------------------------------------------------
+def _cache_path(cache_dir, ticker: str) -> pathlib.Path:
+    return pathlib.Path(cache_dir) / ticker.replace("/", "_").replace("^", "_")
+
+def _read_cache(cache_dir, ticker: str):
+    """(série em cache, (início, fim) já cobertos) ou (None, None)."""
+    path = _cache_path(cache_dir, ticker)
+    if not (path / "coverage.json").exists():
+        return None, None
+    with open(path / "coverage.json") as f:
+        cov = json.load(f)
+    s = load_frame(path, mmap=False).iloc[:, 0] if (path / "schema.json").exists() else pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+    return s, (pd.Timestamp(cov["start"]), pd.Timestamp(cov["end"]))
+
+def _write_cache(cache_dir, ticker: str, s: pd.Series, start, end):
+    path = _cache_path(cache_dir, ticker)
+    path.mkdir(parents=True, exist_ok=True)
+    s = s.dropna()
+    if len(s):
+        save_frame(s.to_frame(ticker), path)
+    with open(path / "coverage.json", "w") as f:
+        json.dump({"start": str(pd.Timestamp(start).date()), "end": str(pd.Timestamp(end).date())}, f)
+
+def _missing_ranges(cov, start, end, cached=None) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    Intervalos [g0, g1) a baixar. Com série em cache, cada intervalo inclui o bar do
+    cache vizinho (âncora): comparar esse bar detecta ajuste retroativo (proventos,
+    splits) entre o que está em cache e o que o provedor devolve agora.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if cov is None:
+        return [(start, end)]
+    # estende a cobertura de forma contígua (sem buracos entre cache e pedido)
+    c0, c1 = cov
+    has = cached is not None and len(cached) > 0
+    gaps = []
+    if start < c0:
+        gaps.append((start, cached.index[0] + pd.Timedelta(days=1) if has else c0))
+    if end > c1:
+        gaps.append((cached.index[-1] if has else c1, end))
+    return gaps
+
+def _adjustment_changed(cached: pd.Series, new: pd.Series, rtol: float = 1e-6) -> bool:
+    """True se o trecho novo não reproduz o cache nos bars em comum (ou não tem nenhum)."""
+    common = cached.index.intersection(new.index)
+    if not len(common):
+        return True
+    return not np.allclose(new.loc[common].to_numpy(float), cached.loc[common].to_numpy(float), rtol=rtol)
+
+class EmptyDownload(RuntimeError):
+    """Provedor devolveu coluna vazia/toda NaN (o yfinance não levanta erro nesses casos)."""
+
+def _with_retry(fn, retries: int = 3, backoff: float = 1.0):
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+def download_prices(tickers: list[str], start: str, end: str, interval: str, provider: PriceProvider,
+                    cache_dir=CACHE_DIR, chunk_size: int = 20, max_workers: int = 4,
+                    retries: int = 3, backoff: float = 1.0, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Preços de fechamento para ``tickers`` em [start, end), baixando só o que falta no cache.
+
+    Tickers com o mesmo intervalo faltante são agrupados em lotes de ``chunk_size``
+    e baixados em paralelo (até ``max_workers`` threads; 1 se o provedor não for
+    ``thread_safe``), com retry e backoff exponencial. A cobertura gravada vai até o fim
+    pedido se ele já passou; se está no futuro, só até o último bar recebido.
+    Ticker sem dados após os retries fica de fora (sem registrar cobertura); ticker
+    cujo bar âncora mudou de valor (novo ajuste) tem o histórico inteiro baixado de novo.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    today = pd.Timestamp.today().normalize()
+    workers = max(1, max_workers) if provider.thread_safe else 1
+    cached, coverage, jobs = {}, {}, {}
+    for t in tickers:
+        s, cov = _read_cache(cache_dir, t) if use_cache else (None, None)
+        cached[t], coverage[t] = s, cov
+        for gap in _missing_ranges(cov, start, end, s):
+            jobs.setdefault(gap, []).append(t)
+    stale = {t for ts in jobs.values() for t in ts}
+
+    def batches(jobs):
+        return [(gap, ts[i:i + chunk_size]) for gap, ts in jobs.items() for i in range(0, len(ts), chunk_size)]
+
+    def run(task):
+        (g0, g1), chunk = task
+        got, todo = {}, list(chunk)
+        def fetch():
+            df = provider.fetch(list(todo), str(g0.date()), str(g1.date()), interval)
+            for t in list(todo):
+                col = df[t].dropna() if t in df.columns else None
+                if col is not None and len(col):
+                    got[t] = col
+                    todo.remove(t)
+            if todo:
+                raise EmptyDownload(f"sem dados para {todo} em [{g0.date()}, {g1.date()})")
+        try:
+            _with_retry(fetch, retries, backoff)
+        except EmptyDownload as e:
+            print(f"[data] ⚠ {e}")
+        return got, todo
+
+    failed = set()
+    def download(jobs):
+        tasks = batches(jobs)
+        if tasks:
+            print(f"[data] {sum(len(c) for _, c in tasks)} downloads pendentes em {len(tasks)} lotes")
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for got, todo in pool.map(run, tasks):
+                failed.update(todo)
+                for t, col in got.items():
+                    fetched.setdefault(t, []).append(col)
+        return fetched
+
+    fetched = download(jobs)
+    rebase = {}
+    for t in stale - failed:
+        if cached[t] is not None and len(cached[t]) and any(_adjustment_changed(cached[t], p) for p in fetched.get(t, [])):
+            c0, c1 = coverage[t]
+            rebase.setdefault((min(start, c0), max(end, c1)), []).append(t)
+    if rebase:
+        print(f"[data] ajuste mudou em {sum(map(len, rebase.values()))} tickers; baixando o histórico completo")
+        full = download(rebase)
+        for (g0, g1), ts in rebase.items():
+            for t in ts:
+                if t not in failed:   # falhou de novo: fica o cache antigo, sem misturar ajustes
+                    cached[t], coverage[t], fetched[t] = None, (g0, g1), full[t]
+
+    out = {}
+    for t in tickers:
+        parts = [p for p in [cached[t]] + ([] if t in failed else fetched.get(t, [])) if p is not None and len(p)]
+        s = pd.concat(parts).sort_index() if parts else pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+        s = s[~s.index.duplicated(keep="last")]
+        if use_cache and t in stale and t not in failed:
+            cov = coverage[t] or (start, end)
+            hi = max(end, cov[1])
+            if hi > today:          # barras futuras ainda não existem: cobre só o que veio
+                hi = s.index[-1] + pd.Timedelta(days=1)
+            _write_cache(cache_dir, t, s, min(start, cov[0]), hi)
+        out[t] = s.loc[(s.index >= start) & (s.index < end)]
+    return pd.DataFrame(out, columns=tickers)
+
+def fetch_prices(cfg, provider: PriceProvider | None = None, cache_dir=CACHE_DIR) -> pd.DataFrame:
+    """
+    Baixa dados históricos de preços (Yahoo Finance por padrão), usando o cache local.
     
     Args:
         cfg: Configuração do projeto
+        provider: fonte de preços (default: ``cfg["data"]["provider"]``)
+        cache_dir: diretório do cache por ticker
         
     Returns:
         DataFrame com preços de fechamento dos tickers
@@ -19,32 +247,25 @@ def fetch_prices(cfg) -> pd.DataFrame:
     freq = cfg["universe"]["frequency"]
     include_cash = cfg["universe"].get("include_cash", True)
     cash_sym = cfg["universe"].get("cash_symbol", "CASH")
+    dcfg = cfg.get("data", {})
+    provider = provider or make_provider(cfg)
 
-    # Remove CASH da lista de download (se existir)
-    dl_tickers = [t for t in tickers if t != cash_sym]
+    # Remove CASH da lista de download (se existir) e duplicatas do config
+    dl_tickers = list(dict.fromkeys(t for t in tickers if t != cash_sym))
     
-    print(f"[data] Baixando {len(dl_tickers)} tickers do Yahoo Finance...")
+    print(f"[data] {len(dl_tickers)} tickers via {type(provider).__name__}")
     print(f"[data] Período: {start} até {end}")
     
-    # Download do Yahoo Finance
-    df = yf.download(
-        tickers=dl_tickers,
-        start=start,
-        end=end,
-        interval=freq,
-        auto_adjust=True,
-        progress=True,
-        group_by='ticker'
+    close = download_prices(
+        dl_tickers, start, end, freq, provider,
+        cache_dir=cache_dir,
+        chunk_size=int(dcfg.get("chunk_size", 20)),
+        max_workers=int(dcfg.get("max_workers", 4)),
+        retries=int(dcfg.get("retries", 3)),
+        backoff=float(dcfg.get("backoff", 1.0)),
+        use_cache=bool(dcfg.get("cache", True)),
     )
     
-    # Extrai preços de fechamento
-    if isinstance(df.columns, pd.MultiIndex):
-        close = df["Close"].copy() if "Close" in df.columns.get_level_values(0) else df.xs('Close', level=1, axis=1)
-    else:
-        # Apenas 1 ticker
-        close = df[["Close"]].copy() if "Close" in df.columns else df.to_frame(name=dl_tickers[0])
-        close.columns = dl_tickers
-    
     # Remove linhas completamente vazias
     close = close.dropna(how="all")
     
@@ -56,7 +277,7 @@ def fetch_prices(cfg) -> pd.DataFrame:
     close = close.ffill().bfill()
     
     if close.empty:
-        raise RuntimeError("Yahoo Finance não retornou dados válidos. Verifique os tickers e conexão com internet.")
+        raise RuntimeError("Nenhum dado válido retornado. Verifique os tickers e conexão com internet.")
     
     print(f"[data] Download concluído: {close.shape[1]} ativos, {close.shape[0]} dias")
     
@@ -67,6 +288,7 @@ def fetch_prices(cfg) -> pd.DataFrame:
     
     return close
 
+@stage("data")
 def main():
     """
     Pipeline principal de download de dados.
@@ -76,8 +298,7 @@ def main():
     
     try:
         close = fetch_prices(cfg)
-        out_path = DATA_DIR / "prices.csv"
-        close.to_csv(out_path)
+        out_path = save_prices(close, csv=cfg.get("storage", {}).get("csv_export", False))
         print(f"[data] ✓ Salvo: {out_path}")
         print(f"[data] ✓ Shape final: {close.shape}")
         print(f"[data] ✓ Ativos: {list(close.columns)}")
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import numpy as np, pandas as pd
+
+def rebalance_mask(index: pd.DatetimeIndex, freq="D") -> np.ndarray:
+    """
+    Máscara (T,) com True no 1º pregão de cada período.
+
+    ``freq``: "D" (todo dia), "W", "M", "Q", "Y" ou um inteiro k (a cada k barras).
+    """
+    T = len(index)
+    if isinstance(freq, (int, np.integer)):
+        return np.arange(T) % int(freq) == 0
+    if freq == "D":
+        return np.ones(T, dtype=bool)
+    periods = {"W": "W", "M": "M", "Q": "Q", "Y": "Y"}[freq]
+    p = pd.DatetimeIndex(index).to_period(periods).asi8
+    mask = np.ones(T, dtype=bool)
+    mask[1:] = p[1:] != p[:-1]
+    return mask
+
+def schedule_weights(index: pd.DatetimeIndex, weights: pd.DataFrame | pd.Series, freq="M"):
+    """
+    Matriz alvo (T, N) a partir de pesos fixos (Series) ou por data de rebalanceamento (DataFrame) + máscara.
+    Datas fora de pregão (fim de semana, feriado) rebalanceiam no pregão seguinte; se várias caem no
+    mesmo pregão, vale a última.
+    """
+    if isinstance(weights, pd.Series):
+        mask = rebalance_mask(index, freq)
+        return np.tile(weights.to_numpy(dtype=float), (len(index), 1)), mask
+    weights = weights.sort_index()
+    pos = index.searchsorted(weights.index, side="left")
+    keep = pos < len(index)
+    w = weights[keep].set_axis(index[pos[keep]]).groupby(level=0).last()
+    mask = index.isin(w.index)
+    mask[0] = True
+    return w.reindex(index).ffill().to_numpy(dtype=float), mask
+
+def equal_weight_ex_cash(columns, cash_sym: str = "CASH") -> np.ndarray:
+    """Pesos iguais fora do CASH: prior antes da 1ª estimativa do MPT dinâmico (env e benchmark)."""
+    w = np.array([c != cash_sym for c in columns], dtype=float)
+    return w / w.sum() if w.sum() > 0 else np.full(len(columns), 1.0 / len(columns))
+
+def align_prior(prior: pd.DataFrame, index: pd.DatetimeIndex, columns, fallback: np.ndarray):
+    """
+    Prior por barra (T, N) a partir de estimativas datadas (``prior``: datas × ativos): a barra
+    ``t`` usa a última estimativa datada antes de ``index[t]``; antes da 1ª, ``fallback`` — nunca
+    uma estimativa posterior (ajustada em dados futuros). Devolve também a linha usada (-1 = fallback).
+    """
+    rows = prior.index.searchsorted(index, side="left") - 1
+    P = prior.reindex(columns=columns).fillna(0.0).to_numpy(dtype=float)
+    W = np.where((rows >= 0)[:, None], P[np.maximum(rows, 0)], np.asarray(fallback, dtype=float))
+    return W, rows
+
+def _take_rows(A: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """A[..., rows[..., t], :] para A (…, T, N) e rows (…, T)."""
+    return np.take_along_axis(A, rows[..., None], axis=-2)
+
+def run_backtest(returns, weights, rebalance=None, w0=None, cost_bps: float = 0.0, drift: bool = True):
+    """
+    Backtest vetorizado de uma (T, N) — ou lote (K, T, N) — de pesos-alvo.
+
+    Em cada barra t com ``rebalance[t]`` a carteira vai para ``weights[t]`` pagando
+    ``cost_bps`` sobre o turnover; entre rebalanceamentos os pesos derivam com os
+    retornos (``drift=True``) ou ficam fixos no alvo (``drift=False``, mesma dinâmica
+    do PortfolioEnv). ``w0`` é a carteira antes da 1ª barra (default: ``weights[0]``).
+
+    Args:
+        returns: (T, N) retornos simples por ativo; ``weights[t]`` ganha ``returns[t]``
+        weights: (T, N) ou (K, T, N)
+        rebalance: (T,) ou (K, T) bool; default = todas as barras
+        cost_bps: custo total (transação + slippage) em bps do valor negociado
+
+    Returns:
+        dict com arrays ``nav``, ``ret`` (bruto), ``net_ret``, ``turnover``, ``cost``
+        (shape (T,) ou (K, T)); DataFrame indexado por data se ``returns`` for DataFrame
+        e ``weights`` for 2-D.
+    """
+    index = returns.index if isinstance(returns, pd.DataFrame) else None
+    R = np.asarray(returns, dtype=float)
+    W = np.asarray(weights, dtype=float)
+    T = R.shape[0]
+    lead = W.shape[:-2]
+    reb = np.ones(lead + (T,), dtype=bool) if rebalance is None else np.broadcast_to(np.asarray(rebalance, dtype=bool), lead + (T,)).copy()
+    reb[..., 0] = True
+    w_init = W[..., 0, :] if w0 is None else np.broadcast_to(np.asarray(w0, dtype=float), W[..., 0, :].shape)
+
+    # início do segmento (último rebalanceamento <= t) e do segmento anterior
+    t_idx = np.arange(T)
+    seg = np.maximum.accumulate(np.where(reb, t_idx, 0), axis=-1)
+    prev_seg = np.concatenate([seg[..., :1], seg[..., :-1]], axis=-1)
+    W_seg = _take_rows(W, seg)
+
+    if drift:
+        # C[t] = prod_{k<t} (1 + R[k]); pesos derivados = W[s] * C[t] / C[s], normalizados
+        C = np.vstack([np.ones((1, R.shape[1])), np.cumprod(1.0 + R, axis=0)[:-1]])
+        Cb = np.broadcast_to(C, lead + C.shape)
+        h = W_seg * C / _take_rows(Cb, seg)
+        w_eff = h / h.sum(axis=-1, keepdims=True)
+        h_pre = _take_rows(W, prev_seg) * C / _take_rows(Cb, prev_seg)
+        w_pre = h_pre / h_pre.sum(axis=-1, keepdims=True)
+    else:
+        w_eff = W_seg
+        w_pre = _take_rows(W, prev_seg)
+    w_pre[..., 0, :] = w_init
+
+    gross = np.einsum("...tn,tn->...t", w_eff, R)
+    turnover = np.where(reb, np.abs(W_seg - w_pre).sum(axis=-1), 0.0)
+    cost = (cost_bps / 1e4) * turnover
+    net = (1.0 + gross) * (1.0 - cost)
+    out = {"nav": np.cumprod(net, axis=-1), "ret": gross, "net_ret": net - 1.0, "turnover": turnover, "cost": cost}
+    if index is not None and not lead:
+        df = pd.DataFrame(out, index=index)
+        df.index.name = "date"
+        return df
+    return out
+
+def env_cost_bps(cfg: dict) -> float:
+    """Custo total por unidade de turnover usado pelo PortfolioEnv (transação + slippage)."""
+    return float(cfg["risk"]["transaction_cost_bps"]) + float(cfg["risk"]["slippage_bps"])
@@ -1,49 +1,113 @@
 from __future__ import annotations
 import numpy as np, pandas as pd, gymnasium as gym
+from time import perf_counter_ns
 from gymnasium import spaces
-from .utils import OUT_DIR, load_config
+from .utils import OUT_DIR, MPT_PRIOR_STORE, load_config, load_frame
+from .market import MarketData
+from .engine import align_prior, equal_weight_ex_cash
+from .perf import new_env_timings
 
-def project_capped_simplex(v, l, u, s=1.0, iters=100):
+def project_capped_simplex(v, l, u, s=1.0):
+    """
+    Projeção euclidiana exata de ``v`` em {l <= w <= u, sum(w) = s}.
+
+    ``l`` e ``u`` podem ser escalares ou vetores por ativo. Usa ordenação dos
+    breakpoints de S(tau) = sum(clip(v - tau, l, u)) — O(n log n), sem iterações.
+    """
     v = np.asarray(v, dtype=float)
-    n = v.size
-    lvec = np.full(n, l, dtype=float)
-    uvec = np.full(n, u, dtype=float)
-    low = np.min(v - uvec)
-    high = np.max(v - lvec)
-
-    def S(tau):
-        return float(np.minimum(np.maximum(v - tau, lvec), uvec).sum())
-
-    for _ in range(iters):
-        mid = 0.5 * (low + high)
-        if S(mid) > s:
-            low = mid
-        else:
-            high = mid
-    tau = 0.5 * (low + high)
-    w = np.minimum(np.maximum(v - tau, lvec), uvec)
-    # correção numérica final
-    if abs(w.sum() - s) > 1e-9:
-        free = (w > l + 1e-9) & (w < u - 1e-9)
-        if free.any():
-            w[free] += (s - w.sum()) / free.sum()
-            w = np.minimum(np.maximum(w, l), u)
-    # renormaliza se necessário
-    total = w.sum()
-    if total <= 0:
-        w = np.ones_like(w) / n
-    else:
-        w *= s / total
-    return w
+    return project_capped_simplex_batch(v.reshape(1, -1), l, u, s)[0]
+
+def project_capped_simplex_batch(V, l, u, s=1.0):
+    """Versão 2-D de ``project_capped_simplex``: projeta cada linha de ``V`` (B, n) numa chamada."""
+    V = np.asarray(V, dtype=float)
+    B, n = V.shape
+    L = np.broadcast_to(np.asarray(l, dtype=float), (B, n))
+    U = np.broadcast_to(np.asarray(u, dtype=float), (B, n))
+    # S(tau) é linear por partes e não-crescente; breakpoints em v-u (sai do teto)
+    # e v-l (atinge o piso). Entre breakpoints a inclinação é -(nº de ativos livres).
+    bp = np.concatenate([V - U, V - L], axis=1)
+    order = np.argsort(bp, axis=1)
+    bps = np.take_along_axis(bp, order, axis=1)
+    delta = np.where(order < n, 1.0, -1.0)
+    n_free = np.cumsum(delta, axis=1)
+    S = U.sum(axis=1, keepdims=True) - np.concatenate(
+        [np.zeros((B, 1)), np.cumsum(n_free[:, :-1] * np.diff(bps, axis=1), axis=1)], axis=1)
+    # primeiro breakpoint com S <= s; tau interpolado no segmento anterior
+    k = (S > s).sum(axis=1)
+    rows = np.arange(B)
+    km1 = np.maximum(k - 1, 0)
+    slope = np.maximum(n_free[rows, km1], 1.0)
+    tau = np.where(k == 0, bps[:, 0], bps[rows, km1] + (S[rows, km1] - s) / slope)
+    W = np.clip(V - tau[:, None], L, U)
+    # renormaliza se necessário (limites inviáveis: sum(u) < s ou sum(l) > s)
+    total = W.sum(axis=1)
+    bad = total <= 0
+    W[bad] = 1.0 / n
+    total[bad] = s
+    W *= (s / total)[:, None]
+    return W
+
+def drawdown_overlay_batch(W, dd, cash_idx: int, dd_trigger, dd_hard, max_cash, smoothing,
+                           min_w: float, max_w: float) -> np.ndarray:
+    """
+    Overlay de drawdown de ``PortfolioEnv._apply_overlay`` por linha: ``W`` (B, n) e
+    drawdown atual ``dd`` (B,). Linhas abaixo de ``dd_trigger`` movem peso para CASH.
+    Os parâmetros do overlay podem ser escalares ou um valor por linha (B,).
+    """
+    if cash_idx < 0:
+        return W
+    dd = np.asarray(dd, dtype=float)
+    dd_trigger, dd_hard, max_cash, smoothing = (np.broadcast_to(np.asarray(p, dtype=float), dd.shape)
+                                                for p in (dd_trigger, dd_hard, max_cash, smoothing))
+    hit = dd < dd_trigger
+    if not hit.any():
+        return W
+    trig = np.abs(dd_trigger[hit])
+    span = np.maximum(1e-6, np.abs(dd_hard[hit]) - trig)
+    sev = np.clip((np.abs(dd[hit]) - trig) / span, 0.0, 1.0)
+    k = sev * max_cash[hit]
+    Wt = W[hit]
+    w_nc = Wt.copy()
+    w_nc[:, cash_idx] = 0.0
+    sum_nc = w_nc.sum(axis=1)
+    pos = sum_nc > 0
+    w_nc[pos] *= ((1.0 - k[pos]) / sum_nc[pos])[:, None]
+    w_nc[:, cash_idx] = 1.0 - w_nc.sum(axis=1)
+    sm = smoothing[hit][:, None]
+    w_smooth = sm * Wt + (1 - sm) * w_nc
+    out = W.copy()
+    out[hit] = project_capped_simplex_batch(w_smooth, min_w, max_w, s=1.0)
+    return out
+
+def load_prior(cfg: dict):
+    """Prior MPT gravado pelo estágio ``mpt`` (dinâmico ou estático, conforme o config); None se não houver."""
+    if cfg["mpt"].get("prior", {}).get("mode", "static") == "dynamic" and (MPT_PRIOR_STORE / "schema.json").exists():
+        return load_frame(MPT_PRIOR_STORE, mmap=False)
+    try:
+        return pd.read_csv(OUT_DIR / "mpt_weights.csv", index_col=0).iloc[:,0]
+    except Exception:
+        return None
 
 class PortfolioEnv(gym.Env):
     metadata = {"render_modes": []}
 
-    def __init__(self, prices: pd.DataFrame, features: pd.DataFrame, cfg: dict, train: bool = True):
+    def __init__(self, prices: pd.DataFrame | None, features: pd.DataFrame | None, cfg: dict, train: bool = True,
+                 w_mpt: pd.Series | pd.DataFrame | np.ndarray | None = None, market: MarketData | None = None):
+        """
+        ``w_mpt``: prior MPT — fixo (Series/array (N,)) ou variável no tempo: DataFrame
+        (datas de estimação × ativos, cada linha vale a partir da barra seguinte à sua data)
+        ou array (T, N) já alinhado aos passos. Sem ele: ``outputs/mpt_prior`` se
+        ``mpt.prior.mode == "dynamic"``, senão ``outputs/mpt_weights.csv``; por fim, uniforme.
+
+        ``market``: arrays já montados (ex.: memmap compartilhado entre processos); nesse
+        caso ``prices``/``features`` são ignorados e nada é copiado.
+        """
         super().__init__()
-        self.prices = prices.copy()
-        self.returns = self.prices.pct_change().fillna(0.0)
-        self.features = features.copy().loc[self.returns.index]
+        # Tensores densos pré-computados: obs/step viram apenas indexação
+        self.market = market if market is not None else MarketData.from_frames(prices, features)
+        self.idx = self.market.index
+        self._ret_arr = self.market.returns
+        self._feat_arr = self.market.features
         self.cfg = cfg
         self.train = train
 
@@ -59,60 +123,103 @@ class PortfolioEnv(gym.Env):
 
         self.include_weights = bool(cfg["env"]["include_weights"])
 
+        # Amostragem de episódios (só treino): início aleatório, tamanho fixo, block bootstrap
+        scfg = cfg["env"].get("sampling", {}) if train else {}
+        self.random_start = bool(scfg.get("random_start", False))
+        self.bootstrap = bool(scfg.get("bootstrap", False))
+        self.episode_len = int(scfg["episode_len"]) if scfg.get("episode_len") else None
+        self._p_jump = 1.0 / max(1.0, float(scfg.get("block_size", 20)))
+        # ns acumulados por componente do passo (lidos pelo callback de perf do PPO)
+        self.timings = new_env_timings()
+
         self.dd_trigger = float(cfg["risk_overlay"]["dd_trigger"])
         self.dd_hard = float(cfg["risk_overlay"]["dd_hard"])
         self.max_cash = float(cfg["risk_overlay"]["max_cash"])
         self.smoothing = float(cfg["risk_overlay"]["smoothing"])
 
-        self.assets = list(self.prices.columns)
+        self.assets = list(self.market.assets)
         self.n = len(self.assets)
         self.cash_sym = cfg["universe"].get("cash_symbol", "CASH")
         self.cash_idx = self.assets.index(self.cash_sym) if self.cash_sym in self.assets else -1
 
         # Obs: todas as features da data t-1 concat por ativo + pesos (opcional)
-        if isinstance(self.features.columns, pd.MultiIndex):
-            feature_names = sorted(set([c[1] for c in self.features.columns]))
-            self.fdim = len(feature_names)
-        else:
-            self.fdim = self.features.shape[1] // self.n
+        self.fdim = self.market.fdim
         obs_dim = self.n * self.fdim + (self.n if self.include_weights else 0)
         self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(obs_dim,), dtype=np.float32)
         self.action_space = spaces.Box(low=-1.0, high=1.0, shape=(self.n,), dtype=np.float32)
 
-        # Pesos MPT iniciais (se existir)
-        try:
-            import pandas as pd
-            w0 = pd.read_csv(OUT_DIR / "mpt_weights.csv", index_col=0).iloc[:,0].reindex(self.assets).fillna(0.0).values
-        except Exception:
-            w0 = np.ones(self.n) / self.n
-        self.w_mpt = w0 / np.sum(w0)
+        # Prior MPT (T, N): explícito (ex.: por fold) ou dos arquivos do pipeline, se existirem
+        if w_mpt is None:
+            w_mpt = self._load_prior()
+        self._prior_arr = self._align_prior(w_mpt)
 
         self._reset_state()
 
+    def _load_prior(self):
+        return load_prior(self.cfg)
+
+    def _align_prior(self, w_mpt) -> np.ndarray:
+        """
+        Prior por passo (T, N): a linha ``t`` usa a última estimativa datada antes de ``idx[t]``;
+        barras anteriores à 1ª estimativa ficam com pesos iguais fora do CASH (``engine.align_prior``).
+        """
+        T = len(self.idx)
+        uniform = np.ones(self.n) / self.n
+        if w_mpt is None:
+            return np.broadcast_to(uniform, (T, self.n))
+        if isinstance(w_mpt, pd.DataFrame):
+            arr, _ = align_prior(w_mpt, self.idx, self.assets, equal_weight_ex_cash(self.assets, self.cash_sym))
+        elif isinstance(w_mpt, pd.Series):
+            arr = w_mpt.reindex(self.assets).fillna(0.0).to_numpy(dtype=float)
+        else:
+            arr = np.asarray(w_mpt, dtype=float)
+        sums = arr.sum(axis=-1, keepdims=True)
+        arr = np.where(sums > 0, arr / np.where(sums > 0, sums, 1.0), uniform)
+        if arr.ndim == 1:
+            return np.broadcast_to(arr, (T, self.n))
+        if arr.shape != (T, self.n):
+            raise ValueError(f"Prior MPT com shape {arr.shape}; esperado {(T, self.n)}")
+        return np.ascontiguousarray(arr)
+
+    @property
+    def w_mpt(self) -> np.ndarray:
+        """Prior vigente no passo atual (âncora da deviation_penalty)."""
+        return self._prior_arr[min(self.t, len(self._prior_arr) - 1)]
+
+    @property
+    def returns(self) -> pd.DataFrame:
+        """Retornos por ativo como DataFrame (view dos arrays densos, sem cópia)."""
+        return pd.DataFrame(self._ret_arr, index=self.idx, columns=self.assets, copy=False)
+
+    @property
+    def features(self) -> pd.DataFrame:
+        """Features (ativo, feature) como DataFrame (view dos arrays densos, sem cópia)."""
+        return pd.DataFrame(self._feat_arr, index=self.idx, columns=self.market.feature_columns, copy=False)
+
     def _reset_state(self):
-        self.idx = self.prices.index
-        self.t0 = self.window
+        """O(1): só sorteia o início; retornos/features continuam nos arrays densos."""
+        T, L = len(self.idx), self.episode_len
+        if self.random_start or self.bootstrap:
+            last = T - 1 if L is None or self.bootstrap else max(self.window, T - L)
+            self.t0 = int(self.np_random.integers(self.window, last + 1))
+        else:
+            self.t0 = self.window
         self.t = self.t0
+        self.steps = 0
+        # bootstrap: episódio tem L passos (default = período inteiro); senão termina em t_end
+        self.t_end = T if L is None or self.bootstrap else min(T, self.t0 + L)
+        self.max_steps = (L or T - self.window) if self.bootstrap else self.t_end - self.t0
         self.done = False
         self.nav = 1.0
         self.max_nav = 1.0
-        self.w = self.w_mpt.copy()
+        self.w = self._prior_arr[self.t0].copy()
 
     def _get_obs(self):
-        t_idx = self.idx[self.t-1]
-        row = self.features.loc[t_idx]
-        if isinstance(row.index, pd.MultiIndex):
-            arr = []
-            for a in self.assets:
-                sub = row.loc[a]
-                arr.extend(sub.values.astype(np.float32))
-            feat_vec = np.array(arr, dtype=np.float32)
-        else:
-            feat_vec = row.values.astype(np.float32).ravel()
+        feat_vec = self._feat_arr[self.t-1]
         if self.include_weights:
             obs = np.concatenate([feat_vec, self.w.astype(np.float32)], axis=0)
         else:
-            obs = feat_vec
+            obs = feat_vec.copy()
         return obs
 
     def _apply_overlay(self, w_target: np.ndarray) -> np.ndarray:
@@ -153,19 +260,22 @@ class PortfolioEnv(gym.Env):
     def step(self, action: np.ndarray):
         if self.done:
             raise RuntimeError("Episode already done. Call reset().")
+        c0 = perf_counter_ns()
         action = np.asarray(action).reshape(-1)
         # Proposta: w_prev + step_scale * tanh(action)
         proposal = self.w + self.step_scale * np.tanh(action)
         w_target = project_capped_simplex(proposal, self.min_w, self.max_w, s=1.0)
+        c1 = perf_counter_ns()
         # Overlay de risco (drawdown → mais CASH)
         w_target = self._apply_overlay(w_target)
+        c2 = perf_counter_ns()
 
         # custos de transação por turnover
         turnover = float(np.sum(np.abs(w_target - self.w)))
         cost = (self.tx_bps + self.slp_bps) * turnover
 
         # retorno do passo
-        r_t = float(np.dot(self.returns.iloc[self.t].values, w_target))
+        r_t = float(np.dot(self._ret_arr[self.t], w_target))
 
         # NAV
         gross = (1.0 + r_t)
@@ -174,16 +284,33 @@ class PortfolioEnv(gym.Env):
         self.max_nav = max(self.max_nav, self.nav)
 
         # penalizações adicionais
-        dev = float(np.linalg.norm(w_target - self.w_mpt, ord=2))
+        dev = float(np.linalg.norm(w_target - self._prior_arr[self.t], ord=2))
         reward = np.log(max(1e-8, net)) - self.turnover_pen * turnover - self.dev_pen * dev
 
         # avançar
         self.w = w_target
-        self.t += 1
-        terminated = (self.t >= len(self.idx))
-        truncated = False
+        self.steps += 1
+        T = len(self.idx)
+        if self.bootstrap:
+            # bootstrap estacionário: continua o bloco (t+1) ou salta para uma barra ao acaso
+            if self.t + 1 >= T or self.np_random.random() < self._p_jump:
+                self.t = int(self.np_random.integers(self.window, T))
+            else:
+                self.t += 1
+            terminated, truncated = False, self.steps >= self.max_steps
+        else:
+            self.t += 1
+            terminated = (self.t >= T)
+            truncated = not terminated and self.t >= self.t_end
         self.done = terminated or truncated
+        c3 = perf_counter_ns()
         obs = self._get_obs()
+        tm = self.timings
+        tm["projection"] += c1 - c0
+        tm["overlay"] += c2 - c1
+        tm["reward"] += c3 - c2
+        tm["obs"] += perf_counter_ns() - c3
+        tm["steps"] += 1
         info = {
             "nav": float(self.nav),
             "turnover": float(turnover),
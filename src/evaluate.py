@@ -1,6 +1,9 @@
 from __future__ import annotations
-import numpy as np, pandas as pd, json, matplotlib.pyplot as plt
+import numpy as np, pandas as pd, json
 from .utils import OUT_DIR, DATA_DIR, load_config, drawdown_series
+from .bootstrap import bootstrap_report
+from .rolling import rolling_metrics, navs_to_returns, save_rolling, ROLLING_STORE
+from .perf import stage
 
 def max_drawdown(equity: pd.Series) -> float:
     dd = drawdown_series(equity)
@@ -36,6 +39,7 @@ def alpha_beta(strategy_ret: pd.Series, bench_ret: pd.Series, rf: float = 0.0, p
     return alpha, beta
 
 def make_plots(equity_rl: pd.Series, equity_bench: pd.DataFrame):
+    import matplotlib.pyplot as plt
     OUT_DIR.mkdir(parents=True, exist_ok=True)
 
     # Equity curves
@@ -61,6 +65,7 @@ def make_plots(equity_rl: pd.Series, equity_bench: pd.DataFrame):
     fig2.savefig(OUT_DIR / "drawdown.png", bbox_inches="tight")
     plt.close(fig2)
 
+@stage("evaluate")
 def main():
     cfg = load_config()
     rf = float(cfg["risk"]["risk_free_rate"])
@@ -84,12 +89,24 @@ def main():
     }
 
     # Alfa/Beta vs SPY se existir
+    spy_ret = None
     if bench is not None and "SPY" in bench.columns:
         spy_ret = bench["SPY"].pct_change().fillna(0.0)
         alpha, beta = alpha_beta(ret_rl, spy_ret, rf)
         metrics["Alpha_vs_SPY"] = alpha
         metrics["Beta_vs_SPY"] = beta
 
+    # Intervalos de confiança por bootstrap estacionário em blocos
+    bcfg = cfg.get("evaluate", {}).get("bootstrap", {})
+    if int(bcfg.get("n_resamples", 0)) > 0:
+        metrics["bootstrap"] = bootstrap_report(eq, spy_ret, rf, bcfg, seed=cfg["seed"])
+
+    # Métricas móveis (RL + cada benchmark) para o dashboard
+    rcfg = cfg.get("evaluate", {}).get("rolling", {})
+    navs = pd.concat([equity_rl.rename("RL"), bench.reindex(equity_rl.index)], axis=1) if bench is not None else equity_rl.to_frame("RL")
+    rolling = rolling_metrics(navs_to_returns(navs.ffill()), spy_ret, windows=rcfg.get("windows", [21, 63, 252]), rf=rf)
+    save_rolling(rolling)
+
     # Plots
     make_plots(equity_rl, bench if bench is not None else None)
 
@@ -112,6 +129,7 @@ def main():
         f.write("\n".join(lines))
 
     print(f"[evaluate] Métricas salvas em {OUT_DIR / 'metrics.json'} e relatório em {OUT_DIR / 'report.md'}")
+    print(f"[evaluate] Métricas móveis salvas em {ROLLING_STORE}")
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,13 @@
 from __future__ import annotations
 import pandas as pd, numpy as np
-from .utils import DATA_DIR, OUT_DIR, load_config
+from .utils import OUT_DIR, FEATURES_STORE, load_config, load_prices, save_features, append_frame
+from .perf import stage
+
+FEATURE_NAMES = ["ret_1", "ret_5", "ret_20", "mom_20", "vol_20", "vol_60", "rsi_14"]
+RSI_WINDOW = 14
+# preços guardados no estado incremental: vol_60 precisa de 60 retornos → 61 preços
+STATE_ROWS = 61
+STATE_PATH = OUT_DIR / "features_state.npz"
 
 def rsi(series: pd.Series, window: int = 14) -> pd.Series:
     delta = series.diff()
@@ -11,27 +18,181 @@ def rsi(series: pd.Series, window: int = 14) -> pd.Series:
     rs = roll_up / (roll_down + 1e-12)
     return 100.0 - (100.0 / (1.0 + rs))
 
+def _pct_change(px: np.ndarray, k: int) -> np.ndarray:
+    out = np.full_like(px, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[k:] = px[k:] / px[:-k] - 1.0
+    return out
+
+def _rolling_std(x: np.ndarray, w: int) -> np.ndarray:
+    """Desvio-padrão amostral (ddof=1) em janela ``w`` por coluna via somas acumuladas; NaN se a janela tiver NaN."""
+    valid = ~np.isnan(x)
+    # centraliza por coluna (std é invariante a deslocamento) para reduzir cancelamento numérico
+    mu = np.where(valid, x, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    x0 = np.where(valid, x - mu, 0.0)
+    zero = np.zeros((1, x.shape[1]))
+    c1 = np.concatenate([zero, np.cumsum(x0, axis=0)])
+    c2 = np.concatenate([zero, np.cumsum(x0 * x0, axis=0)])
+    cn = np.concatenate([zero, np.cumsum(valid, axis=0)])
+    out = np.full_like(x, np.nan)
+    if len(x) < w:
+        return out
+    s1, s2, n = c1[w:] - c1[:-w], c2[w:] - c2[:-w], cn[w:] - cn[:-w]
+    var = np.maximum((s2 - s1 * s1 / w) / (w - 1), 0.0)
+    out[w-1:] = np.where(n == w, np.sqrt(var), np.nan)
+    return out
+
+def _ewm(x: np.ndarray, alpha: float, init: np.ndarray | None = None):
+    """EWM com ``adjust=False`` (recursão vetorizada nos ativos); começa no 1º valor válido se ``init`` for None."""
+    m = np.full(x.shape[1], np.nan) if init is None else np.asarray(init, dtype=float).copy()
+    out = np.empty_like(x)
+    for t in range(len(x)):
+        xt = x[t]
+        m = np.where(np.isnan(xt), m, np.where(np.isnan(m), xt, (1 - alpha) * m + alpha * xt))
+        out[t] = m
+    return out, m
+
+def _rsi_block(delta: np.ndarray, up0=None, down0=None):
+    alpha = 1.0 / RSI_WINDOW
+    roll_up, up = _ewm(np.clip(delta, 0.0, None), alpha, up0)
+    roll_down, down = _ewm(np.clip(-delta, 0.0, None), alpha, down0)
+    rs = roll_up / (roll_down + 1e-12)
+    return 100.0 - (100.0 / (1.0 + rs)), up, down
+
+def _price_blocks(px: np.ndarray) -> dict:
+    ret = _pct_change(px, 1)
+    ret_20 = _pct_change(px, 20)
+    return {
+        "ret_1": ret,
+        "ret_5": _pct_change(px, 5),
+        "ret_20": ret_20,
+        "mom_20": ret_20,  # mesmo cálculo de ret_20; mantido pelo layout das observações
+        "vol_20": _rolling_std(ret, 20),
+        "vol_60": _rolling_std(ret, 60),
+    }
+
+def _assemble(blocks: dict, index, assets) -> pd.DataFrame:
+    T, N = len(index), len(assets)
+    arr = np.stack([blocks[f] for f in FEATURE_NAMES], axis=2).reshape(T, N * len(FEATURE_NAMES))
+    cols = pd.MultiIndex.from_product([list(assets), FEATURE_NAMES])
+    keep = ~np.isnan(arr).any(axis=1)  # equivalente a .dropna() sem passar pelo pandas
+    return pd.DataFrame(arr[keep], index=index[keep], columns=cols, copy=False)
+
 def make_features(close: pd.DataFrame) -> pd.DataFrame:
-    feats = {}
-    for col in close.columns:
-        px = close[col].ffill().dropna()
-        ret = px.pct_change()
-        feats[(col, "ret_1")] = ret
-        feats[(col, "ret_5")] = px.pct_change(5)
-        feats[(col, "ret_20")] = px.pct_change(20)
-        feats[(col, "mom_20")] = px.pct_change(20)
-        feats[(col, "vol_20")] = ret.rolling(20).std()
-        feats[(col, "vol_60")] = ret.rolling(60).std()
-        feats[(col, "rsi_14")] = rsi(px, 14)
-    feat_df = pd.concat(feats, axis=1).dropna().astype(float)
-    return feat_df
+    """Features por ativo calculadas sobre a matriz (T, N) inteira de preços, layout MultiIndex (ativo, feature)."""
+    px = close.ffill().to_numpy(dtype=float)
+    blocks = _price_blocks(px)
+    delta = np.full_like(px, np.nan)
+    delta[1:] = np.diff(px, axis=0)
+    blocks["rsi_14"], _, _ = _rsi_block(delta)
+    return _assemble(blocks, close.index, close.columns)
+
+# ---- Modo incremental -------------------------------------------------------
+def price_anchor(first_date, px_tail: pd.DataFrame) -> str:
+    """Hash da 1ª data do histórico + datas/ativos/valores de ``px_tail`` (detecta histórico reescrito)."""
+    import hashlib
+    h = hashlib.sha256()
+    h.update(np.int64(pd.Timestamp(first_date).value).tobytes())
+    h.update(pd.DatetimeIndex(px_tail.index).as_unit("ns").asi8.tobytes())
+    h.update("\x00".join(map(str, px_tail.columns)).encode())
+    h.update(np.ascontiguousarray(px_tail.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
 
+def feature_state(close: pd.DataFrame) -> dict:
+    """
+    Estado rolante por ativo ao fim de ``close``: últimos ``STATE_ROWS`` preços
+    (cobre ret_k, vol_20/vol_60), acumuladores EWM de alta/baixa do RSI e a âncora
+    (``price_anchor``) que valida o estado contra os preços atuais.
+    """
+    px = close.ffill()
+    arr = px.to_numpy(dtype=float)
+    _, up, down = _rsi_block(np.diff(arr, axis=0))
+    tail = px.iloc[-STATE_ROWS:]
+    return {"px_tail": tail, "rsi_up": up, "rsi_down": down, "first_date": close.index[0],
+            "anchor": price_anchor(close.index[0], tail)}
+
+def update_features(close: pd.DataFrame, state: dict):
+    """
+    Calcula só as linhas de features das barras de ``close`` posteriores ao estado.
+
+    Custo O(barras novas × ativos). O resultado coincide (tolerância de float)
+    com as últimas linhas de ``make_features`` sobre o histórico completo.
+
+    Returns:
+        (DataFrame com as novas linhas no layout MultiIndex, novo estado)
+    """
+    tail = state["px_tail"]
+    assets = list(tail.columns)
+    new = close.loc[close.index > tail.index[-1], assets]
+    if new.empty:
+        return pd.DataFrame(columns=pd.MultiIndex.from_product([assets, FEATURE_NAMES]), dtype=float), state
+    k = len(new)
+    px_df = pd.concat([tail, new]).ffill()
+    px = px_df.to_numpy(dtype=float)
+    blocks = {f: b[-k:] for f, b in _price_blocks(px).items()}
+    # recursão EWM do RSI a partir dos acumuladores salvos
+    blocks["rsi_14"], up, down = _rsi_block(np.diff(px, axis=0)[-k:], state["rsi_up"], state["rsi_down"])
+    out = _assemble(blocks, new.index, assets)
+    tail = px_df.iloc[-STATE_ROWS:]
+    first = state.get("first_date")
+    new_state = {"px_tail": tail, "rsi_up": up, "rsi_down": down, "first_date": first,
+                 "anchor": None if first is None else price_anchor(first, tail)}
+    return out, new_state
+
+def save_feature_state(state: dict, path=STATE_PATH):
+    tail = state["px_tail"]
+    np.savez(path, assets=np.array(tail.columns, dtype=str), px_tail=tail.to_numpy(),
+             px_index=pd.DatetimeIndex(tail.index).asi8, px_unit=pd.DatetimeIndex(tail.index).unit,
+             rsi_up=state["rsi_up"], rsi_down=state["rsi_down"],
+             first_date=np.int64(pd.Timestamp(state["first_date"]).value), anchor=np.array(state["anchor"]))
+
+def load_feature_state(path=STATE_PATH) -> dict:
+    z = np.load(path)
+    index = pd.DatetimeIndex(z["px_index"].astype(f"datetime64[{z['px_unit']}]"))
+    tail = pd.DataFrame(z["px_tail"], index=index, columns=list(z["assets"]))
+    state = {"px_tail": tail, "rsi_up": z["rsi_up"], "rsi_down": z["rsi_down"], "first_date": None, "anchor": None}
+    if "anchor" in z:                      # estados antigos, sem âncora, forçam recálculo completo
+        state["first_date"], state["anchor"] = pd.Timestamp(int(z["first_date"])), str(z["anchor"])
+    return state
+
+def _incremental_update(csv: bool) -> bool:
+    """
+    Tenta anexar só as barras novas; False quando é preciso recalcular tudo: estado
+    ausente/antigo, ativos diferentes ou histórico reescrito (1ª data ou preços da
+    cauda do estado diferentes dos atuais, ex.: novo ajuste de proventos).
+    """
+    if not (STATE_PATH.exists() and (FEATURES_STORE / "schema.json").exists()):
+        return False
+    state = load_feature_state(STATE_PATH)
+    tail = state["px_tail"]
+    if state["anchor"] is None:
+        return False
+    close = load_prices(start=tail.index[0])
+    if list(close.columns) != list(tail.columns) or not close.index[:len(tail)].equals(tail.index):
+        return False
+    first = load_prices(columns=[]).index[0]
+    if price_anchor(first, close.iloc[:len(tail)].ffill()) != state["anchor"]:
+        print("[features] Histórico de preços mudou desde o último estado: recálculo completo")
+        return False
+    rows, state = update_features(close, state)
+    if not rows.empty:
+        append_frame(rows, FEATURES_STORE, csv=csv)
+    save_feature_state(state, STATE_PATH)
+    print(f"[features] Incremental: +{len(rows)} linhas em {FEATURES_STORE}")
+    return True
+
+@stage("features")
 def main():
-    close = pd.read_csv(DATA_DIR / "prices.csv", index_col=0, parse_dates=True)
-    feats = make_features(close)
+    cfg = load_config()
+    csv = cfg.get("storage", {}).get("csv_export", False)
     OUT_DIR.mkdir(parents=True, exist_ok=True)
-    feats.to_csv(OUT_DIR / "features.csv")
-    print(f"[features] Salvo: {OUT_DIR / 'features.csv'}  shape={feats.shape}")
+    if cfg.get("features", {}).get("incremental", False) and _incremental_update(csv):
+        return
+    close = load_prices()
+    feats = make_features(close)
+    out_path = save_features(feats, csv=csv)
+    save_feature_state(feature_state(close))
+    print(f"[features] Salvo: {out_path}  shape={feats.shape}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+import numpy as np, pandas as pd
+import cvxpy as cp
+from .covariance import make_estimator
+
+class FrontierSolver:
+    """
+    Fronteira eficiente parametrizada (cvxpy/DPP) para N ativos, montada uma única vez.
+
+    Os mesmos problemas do ``mpt_initial_weights`` — ``efficient_risk`` com L2 e, se a
+    vol-alvo for inviável, ``max_sharpe`` transformado do pypfopt — mas com ``mu``, o
+    fator de Cholesky da covariância e a vol-alvo como ``cp.Parameter``: trocar de data
+    ou de perfil só atualiza valores, sem recanonicalizar, e cada solve parte da
+    solução anterior (``warm_start``).
+    """
+
+    def __init__(self, n_assets: int, min_w: float, max_w: float, l2_reg: float = 0.001,
+                 risk_free_rate: float = 0.0, solver: str | None = None):
+        self.n, self.rf, self.solver = n_assets, float(risk_free_rate), solver
+        self.mu = cp.Parameter(n_assets)
+        self.L = cp.Parameter((n_assets, n_assets))
+        self.sigma = cp.Parameter(nonneg=True)
+
+        w = self._w = cp.Variable(n_assets)
+        self._risk = cp.Problem(
+            cp.Minimize(-self.mu @ w + l2_reg * cp.sum_squares(w)),
+            [cp.norm(self.L.T @ w, 2) <= self.sigma, cp.sum(w) == 1, w >= min_w, w <= max_w])
+
+        y, k = self._y, self._k = cp.Variable(n_assets), cp.Variable()
+        self._sharpe = cp.Problem(
+            cp.Minimize(cp.sum_squares(self.L.T @ y) + l2_reg * cp.sum_squares(y)),
+            [(self.mu - self.rf) @ y == 1, cp.sum(y) == k, k >= 0, y >= min_w * k, y <= max_w * k])
+
+    def set_moments(self, mu: np.ndarray, S: np.ndarray):
+        """Fatora ``S`` uma vez por data; vale para todos os perfis e para o fallback."""
+        S = np.asarray(S, dtype=float)
+        try:
+            self.L.value = np.linalg.cholesky(S)
+        except np.linalg.LinAlgError:
+            # covariância singular (N > T): fator pela decomposição espectral
+            vals, vecs = np.linalg.eigh(S)
+            self.L.value = vecs * np.sqrt(np.maximum(vals, 0.0))
+        self.mu.value = np.asarray(mu, dtype=float)
+        self._gmv = float(np.sqrt(1.0 / np.sum(np.linalg.pinv(S))))
+
+    def _solve(self, prob: cp.Problem) -> bool:
+        try:
+            prob.solve(solver=self.solver, warm_start=True)
+        except cp.SolverError:
+            return False
+        return prob.status in ("optimal", "optimal_inaccurate")
+
+    def max_sharpe(self) -> np.ndarray:
+        if not self._solve(self._sharpe) or self._k.value is None or self._k.value <= 0:
+            raise ValueError(f"max_sharpe inviável (status {self._sharpe.status})")
+        return self._y.value / self._k.value
+
+    def efficient_risk(self, target_vols) -> np.ndarray:
+        """Pesos (P, N) para cada vol-alvo (em ordem crescente o warm start é mais útil)."""
+        out = np.empty((len(target_vols), self.n))
+        fallback = None
+        for i, vol in enumerate(target_vols):
+            ok = vol >= self._gmv
+            if ok:
+                self.sigma.value = float(vol)
+                ok = self._solve(self._risk)
+            if ok:
+                out[i] = self._w.value
+            else:
+                fallback = self.max_sharpe() if fallback is None else fallback
+                out[i] = fallback
+        return out
+
+def clean_weights(W: np.ndarray, min_w: float, max_w: float, cutoff: float = 1e-4, rounding: int = 5) -> np.ndarray:
+    """Pós-processamento do ``mpt_initial_weights`` (``clean_weights`` + normaliza/reclipa) em lote."""
+    W = np.where(np.abs(W) < cutoff, 0.0, W).round(rounding)
+    W = np.clip(W / W.sum(axis=-1, keepdims=True), min_w, max_w)
+    return W / W.sum(axis=-1, keepdims=True)
+
+def frontier_weights(close: pd.DataFrame, cfg: dict, dates, profiles=None, lookback: int | None = None,
+                     solver: FrontierSolver | None = None) -> np.ndarray:
+    """
+    Pesos MPT para cada data de rebalanceamento × perfil de risco: tensor (D, P, N).
+
+    Em cada data usa os preços até ela (inclusive). Sem ``lookback`` (janela
+    expansiva), o estimador de covariância é atualizado incrementalmente entre datas;
+    com ``lookback`` barras, é reestimado na janela. ``profiles`` default = chaves de
+    ``mpt.target_vol`` (ordem do config). CASH não é tratado aqui (ver ``mpt_prior``).
+    """
+    rcfg, mcfg = cfg["risk"], cfg["mpt"]
+    profiles = list(mcfg["target_vol"]) if profiles is None else list(profiles)
+    vols = np.array([mcfg["target_vol"][p] for p in profiles], dtype=float)
+    order = np.argsort(vols)
+    min_w, max_w = float(rcfg["min_weight"]), float(rcfg["max_weight"])
+    if solver is None:
+        solver = FrontierSolver(close.shape[1], min_w, max_w, float(mcfg.get("l2_reg", 0.001)),
+                                float(rcfg["risk_free_rate"]))
+
+    dates = pd.DatetimeIndex(dates)
+    out = np.empty((len(dates), len(profiles), close.shape[1]))
+    est = make_estimator(cfg, close.columns)
+    for d, date in enumerate(dates):
+        end = int(close.index.searchsorted(date, side="right"))
+        if lookback is None:
+            est.update_prices(close.iloc[:end])
+        else:
+            est = make_estimator(cfg, close.columns).update_prices(close.iloc[max(0, end - lookback - 1):end])
+        solver.set_moments(est.mean().to_numpy(), est.cov().to_numpy())
+        out[d, order] = solver.efficient_risk(vols[order])
+    return clean_weights(out, min_w, max_w)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import json, pathlib
+import numpy as np, pandas as pd
+from .utils import replace_npy, replace_json
+
+class MarketData:
+    """
+    Arrays densos consumidos pelo PortfolioEnv: retornos (T, N) float64 e features
+    (T, N*fdim) float32 com os blocos na ordem de ``assets``, mais os rótulos.
+
+    ``save`` grava ``.npy`` que ``open`` mapeia em memória (``mmap_mode="r"``): vários
+    processos (ex.: workers do SubprocVecEnv) leem as mesmas páginas do page cache,
+    então a memória não cresce com o número de workers.
+    """
+
+    def __init__(self, index: pd.DatetimeIndex, assets: list, returns: np.ndarray, features: np.ndarray,
+                 feature_names: list):
+        self.index = pd.DatetimeIndex(index)
+        self.assets = list(assets)
+        self.returns = returns
+        self.features = features
+        self.feature_names = list(feature_names)
+
+    @property
+    def fdim(self) -> int:
+        return len(self.feature_names)
+
+    @property
+    def feature_columns(self) -> pd.MultiIndex:
+        return pd.MultiIndex.from_product([self.assets, self.feature_names])
+
+    @classmethod
+    def from_frames(cls, prices: pd.DataFrame, features: pd.DataFrame) -> "MarketData":
+        assets = list(prices.columns)
+        returns = np.ascontiguousarray(prices.pct_change().fillna(0.0).to_numpy(dtype=np.float64))
+        feats = features.loc[prices.index]
+        cols = feats.columns
+        if isinstance(cols, pd.MultiIndex):
+            by_asset = {}
+            for c in cols:
+                by_asset.setdefault(c[0], []).append(c)
+            names = [c[1] for c in by_asset[assets[0]]]
+            arr = feats[[c for a in assets for c in by_asset[a]]].to_numpy(dtype=np.float32)
+        else:
+            fdim = feats.shape[1] // len(assets)
+            names = [f"f{k}" for k in range(fdim)]
+            arr = feats.to_numpy(dtype=np.float32)
+        return cls(prices.index, assets, returns, np.ascontiguousarray(arr), names)
+
+    def save(self, path) -> pathlib.Path:
+        path = pathlib.Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        # substitui (não trunca) arquivos que workers podem ter mapeados; meta.json por último
+        replace_npy(path / "returns.npy", self.returns)
+        replace_npy(path / "features.npy", self.features)
+        replace_npy(path / "index.npy", self.index.asi8)
+        replace_json(path / "meta.json", {"assets": self.assets, "feature_names": self.feature_names,
+                                          "index_unit": self.index.unit})
+        return path
+
+    @classmethod
+    def open(cls, path, mmap: bool = True) -> "MarketData":
+        path = pathlib.Path(path)
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        index = pd.DatetimeIndex(np.load(path / "index.npy").astype(f"datetime64[{meta['index_unit']}]"))
+        return cls(index, meta["assets"], np.load(path / "returns.npy", mmap_mode=mode),
+                   np.load(path / "features.npy", mmap_mode=mode), meta["feature_names"])
+
+def make_market_env(path, cfg: dict, train: bool = True, w_mpt=None):
+    """Fábrica (picklável) de PortfolioEnv sobre arrays mapeados de ``path`` — usada nos workers."""
+    from .env import PortfolioEnv
+    return PortfolioEnv(None, None, cfg, train=train, w_mpt=w_mpt, market=MarketData.open(path))
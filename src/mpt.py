@@ -1,9 +1,17 @@
 from __future__ import annotations
 import pandas as pd, numpy as np
-from pypfopt import EfficientFrontier, risk_models, expected_returns, objective_functions
-from .utils import DATA_DIR, OUT_DIR, load_config
+from .utils import OUT_DIR, MPT_PRIOR_STORE, load_config, load_prices, save_frame
+from .covariance import CovEstimator, estimate, COV_STATE_PATH
+from .perf import stage
 
-def mpt_initial_weights(close: pd.DataFrame, cfg: dict) -> pd.Series:
+def mpt_initial_weights(close: pd.DataFrame, cfg: dict, estimator: CovEstimator | None = None) -> pd.Series:
+    """
+    Pesos da fronteira eficiente (vol-alvo do perfil, fallback max Sharpe).
+
+    ``estimator`` fornece retorno esperado e covariância já estimados (ver
+    ``covariance.estimate``); sem ele, são estimados sobre ``close`` com o método
+    de ``mpt.covariance.method``.
+    """
     rf = cfg["risk"]["risk_free_rate"]
     max_w = cfg["risk"]["max_weight"]
     min_w = cfg["risk"]["min_weight"]
@@ -12,13 +20,19 @@ def mpt_initial_weights(close: pd.DataFrame, cfg: dict) -> pd.Series:
     target_vol = target_vol_map.get(profile, 0.10)
     l2_reg = float(cfg["mpt"].get("l2_reg", 0.001))
 
-    mu = expected_returns.mean_historical_return(close, compounding=True)
-    S = risk_models.sample_cov(close)
-    ef = EfficientFrontier(mu, S, weight_bounds=(min_w, max_w))
-    ef.add_objective(objective_functions.L2_reg, gamma=l2_reg)
+    est = estimator if estimator is not None else estimate(close, cfg)
+    mu, S = est.mean().reindex(close.columns), est.cov().loc[close.columns, close.columns]
+    from pypfopt import EfficientFrontier, objective_functions
+    def frontier():
+        ef = EfficientFrontier(mu, S, weight_bounds=(min_w, max_w))
+        ef.add_objective(objective_functions.L2_reg, gamma=l2_reg)
+        return ef
+    ef = frontier()
     try:
         ef.efficient_risk(target_volatility=target_vol)
     except Exception:
+        # o pypfopt não permite reotimizar a mesma instância após falha
+        ef = frontier()
         ef.max_sharpe(risk_free_rate=rf)
     w = ef.clean_weights()
     w = pd.Series(w).reindex(close.columns).fillna(0.0)
@@ -27,20 +41,56 @@ def mpt_initial_weights(close: pd.DataFrame, cfg: dict) -> pd.Series:
     w = w / w.sum()
     return w
 
-def main():
-    cfg = load_config()
-    close = pd.read_csv(DATA_DIR / "prices.csv", index_col=0, parse_dates=True)
+def mpt_prior(close: pd.DataFrame, cfg: dict, cache_path=None) -> pd.Series:
+    """
+    Pesos MPT sobre os ativos de ``close`` sem o CASH (que recebe peso zero).
+    Com ``cache_path``, o estado da covariância é retomado/salvo ali (só barras novas são lidas).
+    """
     # remove CASH da otimização MPT
     cash_sym = cfg["universe"].get("cash_symbol", "CASH")
     cols = [c for c in close.columns if c != cash_sym]
-    w0 = mpt_initial_weights(close[cols], cfg)
+    w0 = mpt_initial_weights(close[cols], cfg, estimate(close[cols], cfg, path=cache_path))
     # adiciona CASH com peso zero
-    w0 = w0.reindex(close.columns).fillna(0.0)
+    return w0.reindex(close.columns).fillna(0.0)
+
+def prior_schedule(close: pd.DataFrame, cfg: dict) -> pd.DataFrame:
+    """
+    Prior MPT re-otimizado periodicamente (perfil do config), sem look-ahead: cada linha
+    usa só preços até a sua data. Datas = 1º pregão de cada período ``mpt.prior.rebalance``
+    após ``min_history`` barras; janela expansiva ou ``lookback`` barras. CASH fica com zero.
+    """
+    from .engine import rebalance_mask
+    from .frontier import frontier_weights
+    pcfg = cfg["mpt"].get("prior", {})
+    cash_sym = cfg["universe"].get("cash_symbol", "CASH")
+    cols = [c for c in close.columns if c != cash_sym]
+    mask = rebalance_mask(close.index, pcfg.get("rebalance", "M"))
+    mask[: int(pcfg.get("min_history", 252))] = False
+    dates = close.index[mask]
+    lookback = pcfg.get("lookback")
+    W = frontier_weights(close[cols], cfg, dates, profiles=[cfg["mpt"]["profile"]],
+                         lookback=None if lookback is None else int(lookback))
+    out = pd.DataFrame(W[:, 0], index=dates, columns=cols).reindex(columns=close.columns, fill_value=0.0)
+    out.index.name = "date"
+    return out
+
+@stage("mpt")
+def main():
+    cfg = load_config()
+    close = load_prices()
     OUT_DIR.mkdir(parents=True, exist_ok=True)
+    # prior estático só com a janela de treino (evita look-ahead no período de teste)
+    train = close.loc[:cfg["walk_forward"]["train_end"]]
+    cache = COV_STATE_PATH if cfg["mpt"].get("covariance", {}).get("cache", True) else None
+    w0 = mpt_prior(train, cfg, cache_path=cache)
     w0.to_csv(OUT_DIR / "mpt_weights.csv", header=["weight"])
     print("[mpt] Pesos iniciais MPT:")
     print(w0.to_string())
     print(f"[mpt] Salvo: {OUT_DIR / 'mpt_weights.csv'}")
+    if cfg["mpt"].get("prior", {}).get("mode", "static") == "dynamic":
+        sched = prior_schedule(close, cfg)
+        save_frame(sched, MPT_PRIOR_STORE)
+        print(f"[mpt] Prior dinâmico: {len(sched)} re-otimizações → {MPT_PRIOR_STORE}")
 
 if __name__ == "__main__":
     main()
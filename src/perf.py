@@ -0,0 +1,162 @@
+from __future__ import annotations
+import os, json, time, fcntl, resource, functools, datetime
+from .utils import OUT_DIR, load_config
+
+PERF_PATH = OUT_DIR / "perf.json"
+PROFILE_DIR = OUT_DIR / "profiles"
+ENV_COMPONENTS = ("obs", "projection", "overlay", "reward")
+
+def _rss_mb() -> float:
+    """RSS atual (Linux: /proc/self/statm); NaN se indisponível."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return float("nan")
+
+def _peak_rss_mb() -> float:
+    """Pico de RSS do processo desde o início (não zera entre estágios)."""
+    # ru_maxrss: KB no Linux, bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 1024
+
+def record(section: str, key: str, value, path=None):
+    """Grava ``value`` em ``perf.json[section][key]`` (leitura-modificação-escrita atômica)."""
+    path = PERF_PATH if path is None else path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # estágios concorrentes (src.pipeline) gravam no mesmo arquivo
+    with open(path.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault(section, {})[key] = value
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2, default=float)
+        os.replace(tmp, path)
+
+def _profiled_stages(cfg: dict) -> set:
+    env = os.environ.get("SYNAPSE_PROFILE", "")
+    return set(cfg.get("perf", {}).get("profile") or []) | {s for s in env.split(",") if s}
+
+def stage(name: str):
+    """
+    Decorador dos ``main`` do pipeline: tempo de parede/CPU, pico de RSS do processo,
+    quanto o estágio elevou esse pico e variação de RSS em ``perf.json["stages"][name]``
+    (custo desprezível: só relógios e getrusage). ``ru_maxrss`` é do processo inteiro:
+    com vários estágios num processo (``python -m src``), o pico de um estágio só
+    aparece em ``peak_rss_delta_mb`` se passar dos anteriores.
+    Estágios listados em ``perf.profile`` (ou ``SYNAPSE_PROFILE=a,b``) também rodam sob
+    cProfile, com dump em ``outputs/profiles/<name>.prof``.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cfg = load_config()
+            if not cfg.get("perf", {}).get("enabled", True):
+                return fn(*args, **kwargs)
+            prof = None
+            if name in _profiled_stages(cfg) or "all" in _profiled_stages(cfg):
+                import cProfile
+                prof = cProfile.Profile()
+            rss0, peak0, wall0, cpu0 = _rss_mb(), _peak_rss_mb(), time.perf_counter(), time.process_time()
+            try:
+                if prof is not None:
+                    prof.enable()
+                return fn(*args, **kwargs)
+            finally:
+                if prof is not None:
+                    prof.disable()
+                    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+                    prof.dump_stats(PROFILE_DIR / f"{name}.prof")
+                rec = {
+                    "wall_s": time.perf_counter() - wall0,
+                    "cpu_s": time.process_time() - cpu0,
+                    "process_peak_rss_mb": _peak_rss_mb(),
+                    "peak_rss_delta_mb": _peak_rss_mb() - peak0,
+                    "rss_delta_mb": _rss_mb() - rss0,
+                    "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                }
+                if prof is not None:
+                    rec["profile"] = str(PROFILE_DIR / f"{name}.prof")
+                record("stages", name, rec)
+                print(f"[perf] {name}: {rec['wall_s']:.2f}s, pico RSS do processo {rec['process_peak_rss_mb']:.0f} MB "
+                      f"(+{rec['peak_rss_delta_mb']:.0f} MB no estágio)")
+        return wrapper
+    return deco
+
+def new_env_timings() -> dict:
+    """Acumuladores (ns) por componente do passo do env + nº de env-steps."""
+    return dict.fromkeys(ENV_COMPONENTS + ("steps",), 0)
+
+def summarize_env_timings(timings: list[dict]) -> dict:
+    """µs por env-step de cada componente, somando os acumuladores de vários envs."""
+    total = new_env_timings()
+    for t in timings:
+        for k in total:
+            total[k] += t.get(k, 0)
+    steps = max(total.pop("steps"), 1)
+    return {f"{k}_us": v / steps / 1e3 for k, v in total.items()} | {"env_steps": steps}
+
+def ppo_perf_callback(section_key: str = "train_rl", path=None):
+    """
+    Callback SB3 com o throughput do PPO: env-steps/s na coleta, updates de gradiente/s
+    no treino e µs por componente do env, no tensorboard (``perf/*``) e no ``perf.json``
+    (``path``; default ``outputs/perf.json``).
+    """
+    from stable_baselines3.common.callbacks import BaseCallback
+
+    class PPOPerfCallback(BaseCallback):
+        def _on_training_start(self):
+            self._t_train = None
+            self._wall0 = time.perf_counter()
+            self._collect_s = self._train_s = 0.0
+            self._steps0, self._updates0 = self.num_timesteps, self.model._n_updates
+            self._t_rollout = time.perf_counter()
+            self._n_roll = self.num_timesteps
+
+        def _on_rollout_start(self):
+            now = time.perf_counter()
+            if self._t_train is not None:
+                dt = now - self._t_train
+                self._train_s += dt
+                n_upd = self.model._n_updates - self._upd_mark
+                self.logger.record("perf/grad_updates_per_s", n_upd / max(dt, 1e-9))
+            self._t_rollout, self._n_roll = now, self.num_timesteps
+
+        def _on_step(self) -> bool:
+            return True
+
+        def _env_timings(self) -> dict:
+            venv = self.training_env
+            timings = [venv.timings] if hasattr(venv, "timings") else venv.get_attr("timings")
+            return summarize_env_timings(timings)
+
+        def _on_rollout_end(self):
+            now = time.perf_counter()
+            dt = now - self._t_rollout
+            self._collect_s += dt
+            self.logger.record("perf/env_steps_per_s", (self.num_timesteps - self._n_roll) / max(dt, 1e-9))
+            for k, v in self._env_timings().items():
+                if k.endswith("_us"):
+                    self.logger.record(f"perf/env_{k}", v)
+            self._t_train, self._upd_mark = now, self.model._n_updates
+
+        def _on_training_end(self):
+            if self._t_train is not None:
+                self._train_s += time.perf_counter() - self._t_train
+            steps = self.num_timesteps - self._steps0
+            updates = self.model._n_updates - self._updates0
+            record("ppo", section_key, {
+                "timesteps": steps,
+                "wall_s": time.perf_counter() - self._wall0,
+                "env_steps_per_s": steps / max(self._collect_s, 1e-9),
+                "grad_updates": updates,
+                "grad_updates_per_s": updates / max(self._train_s, 1e-9),
+                "env": self._env_timings(),
+            }, path=path)
+
+    return PPOPerfCallback()
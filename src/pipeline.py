@@ -0,0 +1,296 @@
+"""
+Runner do pipeline (DAG) com cache de estágios endereçado por conteúdo.
+
+A chave de cada estágio é o hash de: código-fonte do módulo e dos módulos locais
+que ele importa (transitivamente), seções do ``config.yaml`` que ele lê e digests
+dos artefatos produzidos pelos estágios de que depende. Se a chave já foi vista e
+os artefatos no disco batem com o manifesto, o estágio é pulado; se os arquivos
+foram sobrescritos (ex.: rodada com outro config), são restaurados do object
+store (``outputs/stage_cache/objects``) sem rodar nada. Estágios independentes
+rodam em paralelo, cada um num subprocesso ``python -m src.<módulo>``.
+
+Uso: python -m src.pipeline [alvos ...] [-j 2] [--force train] [--dry-run]
+"""
+from __future__ import annotations
+import argparse, ast, hashlib, json, os, pathlib, shutil, subprocess, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .utils import ROOT, OUT_DIR, load_config
+
+CACHE_DIR = OUT_DIR / "stage_cache"
+OBJECTS_DIR = CACHE_DIR / "objects"
+
+# Estágios do ``make all`` (+ walk_forward, fora do alvo default). ``config`` lista as
+# seções lidas pelo estágio e suas dependências (``perf`` fica de fora: não muda
+# resultados); ``outputs`` são arquivos/diretórios relativos à raiz (os ausentes são
+# ignorados, ex.: exports CSV opcionais).
+STAGES = {
+    "data": {"module": "src.data", "deps": [], "config": ("universe", "data", "storage"),
+             "outputs": ("data/prices", "data/prices.csv")},
+    "features": {"module": "src.features", "deps": ["data"], "config": ("features", "storage"),
+                 "outputs": ("outputs/features", "outputs/features.csv", "outputs/features_state.npz")},
+    "mpt": {"module": "src.mpt", "deps": ["data"], "config": ("universe", "risk", "mpt", "walk_forward"),
+            "outputs": ("outputs/mpt_weights.csv", "outputs/mpt_prior")},
+    "train": {"module": "src.train_rl", "deps": ["data", "features", "mpt"],
+              "config": ("seed", "universe", "risk", "mpt", "walk_forward", "env", "risk_overlay", "ppo"),
+              "outputs": ("models/ppo_synapse.zip", "models/ppo_synapse_policy.npz", "models/best",
+                          "outputs/test_equity_curve.csv", "outputs/test_weights.csv")},
+    "benchmark": {"module": "src.benchmark", "deps": ["data", "mpt"],
+                  "config": ("universe", "risk", "mpt", "walk_forward", "benchmark"),
+                  "outputs": ("outputs/benchmarks.csv",)},
+    "backtest": {"module": "src.backtest", "deps": ["data", "features", "mpt", "train"],
+                 "config": ("seed", "universe", "risk", "mpt", "walk_forward", "env", "risk_overlay", "backtest",
+                            "inference"),
+                 "outputs": ("outputs/backtest_equity_curve.csv", "outputs/backtest_weights.csv",
+                             "outputs/backtest_scenarios.npy", "outputs/backtest_scenarios.csv")},
+    "report": {"module": "src.evaluate", "deps": ["train", "benchmark"], "config": ("seed", "risk", "evaluate"),
+               "outputs": ("outputs/metrics.json", "outputs/report.md", "outputs/equity_curve.png",
+                           "outputs/drawdown.png", "outputs/rolling")},
+    "walk_forward": {"module": "src.walk_forward", "deps": ["data", "features"],
+                     "config": ("seed", "universe", "risk", "mpt", "walk_forward", "env", "risk_overlay", "ppo"),
+                     "outputs": ("outputs/walk_forward_equity.csv", "outputs/walk_forward_folds.json")},
+}
+DEFAULT_TARGETS = ("data", "features", "mpt", "train", "benchmark", "backtest", "report")
+
+# ---- hashing ----------------------------------------------------------------
+_stat_lock = threading.Lock()
+
+class FileHasher:
+    """sha256 de arquivos com cache por (tamanho, mtime) para não reler artefatos grandes."""
+
+    def __init__(self, path=None):
+        self.path = pathlib.Path(path) if path is not None else CACHE_DIR / "stat.json"
+        try:
+            with open(self.path) as f:
+                self._cache = json.load(f)
+        except (OSError, ValueError):
+            self._cache = {}
+
+    def file(self, path: pathlib.Path) -> str:
+        st = path.stat()
+        key, sig = str(path), [st.st_size, st.st_mtime_ns]
+        with _stat_lock:
+            hit = self._cache.get(key)
+        if hit and hit[:2] == sig:
+            return hit[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        with _stat_lock:
+            self._cache[key] = sig + [h.hexdigest()]
+        return h.hexdigest()
+
+    def tree(self, rel_paths) -> dict:
+        """{caminho relativo: sha256} dos arquivos existentes em ``rel_paths`` (diretórios recursivos)."""
+        out = {}
+        for rel in rel_paths:
+            p = ROOT / rel
+            files = sorted(q for q in p.rglob("*") if q.is_file()) if p.is_dir() else [p] if p.is_file() else []
+            for q in files:
+                out[q.relative_to(ROOT).as_posix()] = self.file(q)
+        return out
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _stat_lock:
+            data = json.dumps(self._cache)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(data)
+        os.replace(tmp, self.path)
+
+def module_sources(module: str) -> list[pathlib.Path]:
+    """Arquivo do módulo + módulos de ``src`` importados por ele (``from .x import``), transitivamente."""
+    src = ROOT / "src"
+    seen, stack = set(), [module.split(".")[-1]]
+    while stack:
+        name = stack.pop()
+        path = src / f"{name}.py"
+        if name in seen or not path.exists():
+            continue
+        seen.add(name)
+        for node in ast.walk(ast.parse(path.read_text())):
+            if isinstance(node, ast.ImportFrom) and node.level == 1:
+                if node.module:
+                    stack.append(node.module.split(".")[0])
+                else:
+                    stack.extend(a.name for a in node.names)
+    return sorted(src / f"{n}.py" for n in seen)
+
+def _digest(files: dict) -> str:
+    return hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+
+def stage_key(name: str, cfg: dict, upstream: dict, hasher: FileHasher) -> str:
+    """Hash de código + config + digests dos artefatos dos estágios de ``deps``."""
+    spec = STAGES[name]
+    h = hashlib.sha256(name.encode())
+    for p in module_sources(spec["module"]):
+        h.update(p.name.encode())
+        h.update(hasher.file(p).encode())
+    h.update(json.dumps({k: cfg.get(k) for k in spec["config"]}, sort_keys=True, default=str).encode())
+    for dep in spec["deps"]:
+        h.update(f"{dep}:{upstream[dep]}".encode())
+    return h.hexdigest()
+
+# ---- manifestos e object store ----------------------------------------------
+def _manifest_path(name: str, key: str) -> pathlib.Path:
+    return CACHE_DIR / "stages" / name / f"{key[:32]}.json"
+
+def load_manifest(name: str, key: str) -> dict | None:
+    try:
+        with open(_manifest_path(name, key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _object(sha: str) -> pathlib.Path:
+    return OBJECTS_DIR / sha[:2] / sha[2:]
+
+def store_outputs(name: str, key: str, files: dict, store_objects: bool = True):
+    """Grava o manifesto (arquivos → sha256) e copia os artefatos para o object store."""
+    if store_objects:
+        for rel, sha in files.items():
+            obj = _object(sha)
+            if not obj.exists():
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                tmp = obj.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                # cópia (não hardlink): os estágios reescrevem os arquivos no mesmo inode
+                shutil.copyfile(ROOT / rel, tmp)
+                os.replace(tmp, obj)
+    path = _manifest_path(name, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"stage": name, "key": key, "files": files, "digest": _digest(files),
+                   "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2)
+
+def restore_outputs(manifest: dict, hasher: FileHasher) -> bool:
+    """Reconstrói os artefatos do manifesto a partir do object store; False se faltar algum objeto."""
+    files = manifest["files"]
+    if not all(_object(sha).exists() for sha in files.values()):
+        return False
+    spec = STAGES[manifest["stage"]]
+    for rel in spec["outputs"]:
+        # remove arquivos de saída que não fazem parte desta versão (ex.: export CSV de outra rodada)
+        p = ROOT / rel
+        for q in ([*p.rglob("*")] if p.is_dir() else [p] if p.is_file() else []):
+            if q.is_file() and q.relative_to(ROOT).as_posix() not in files:
+                q.unlink()
+    for rel, sha in files.items():
+        dst = ROOT / rel
+        if dst.is_file() and hasher.file(dst) == sha:
+            continue
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(_object(sha), dst)
+    return True
+
+# ---- execução -----------------------------------------------------------------
+def resolve(targets) -> list[str]:
+    """Alvos + dependências transitivas, em ordem topológica (a ordem de ``STAGES``)."""
+    unknown = set(targets) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Estágios desconhecidos: {sorted(unknown)} (disponíveis: {list(STAGES)})")
+    need, stack = set(), list(targets)
+    while stack:
+        s = stack.pop()
+        if s not in need:
+            need.add(s)
+            stack.extend(STAGES[s]["deps"])
+    return [s for s in STAGES if s in need]
+
+def _run_module(name: str) -> int:
+    """Roda o estágio num subprocesso, repassando a saída com o prefixo do estágio."""
+    proc = subprocess.Popen([sys.executable, "-m", STAGES[name]["module"]], cwd=ROOT, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, bufsize=1)
+    for line in proc.stdout:
+        print(f"[{name}] {line}", end="", flush=True)
+    return proc.wait()
+
+def run_pipeline(targets=DEFAULT_TARGETS, max_workers: int = 2, force=(), dry_run: bool = False,
+                 store_objects: bool = True, runner=_run_module) -> dict:
+    """
+    Executa os ``targets`` (e dependências) respeitando o DAG. Devolve
+    ``{estágio: status}`` com status em ``cached``, ``restored``, ``ran``, ``failed``,
+    ``skipped`` (dependência falhou) ou, em ``dry_run``, ``stale``.
+    """
+    cfg = load_config()
+    order = resolve(targets)
+    force = set(force)
+    hasher = FileHasher()
+    status, digests = {}, {}
+
+    def check(name: str):
+        """(chave, status de cache) — ``cached``/``restored`` se não precisa rodar, senão None."""
+        key = stage_key(name, cfg, digests, hasher)
+        man = None if name in force else load_manifest(name, key)
+        if man is None:
+            return key, None
+        if hasher.tree(STAGES[name]["outputs"]) == man["files"]:
+            return key, "cached"
+        if dry_run:
+            return key, "restorable" if all(_object(s).exists() for s in man["files"].values()) else None
+        return key, "restored" if restore_outputs(man, hasher) else None
+
+    def execute(name: str, key: str) -> str:
+        t0 = time.perf_counter()
+        rc = runner(name)
+        if rc != 0:
+            print(f"[pipeline] {name}: falhou (código {rc})")
+            return "failed"
+        files = hasher.tree(STAGES[name]["outputs"])
+        store_outputs(name, key, files, store_objects)
+        digests[name] = _digest(files)
+        print(f"[pipeline] {name}: concluído em {time.perf_counter() - t0:.1f}s")
+        return "ran"
+
+    pending = list(order)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as pool:
+        while pending or running:
+            for name in list(pending):
+                deps = STAGES[name]["deps"]
+                if {status.get(d) for d in deps} & {"failed", "skipped", "stale"}:
+                    status[name] = "stale" if dry_run else "skipped"
+                    pending.remove(name)
+                    continue
+                if not all(d in digests for d in deps):
+                    continue
+                pending.remove(name)
+                key, hit = check(name)
+                if hit in ("cached", "restored", "restorable"):
+                    status[name] = hit
+                    digests[name] = _digest(load_manifest(name, key)["files"])
+                    print(f"[pipeline] {name}: {hit} ({key[:12]})")
+                elif dry_run:
+                    status[name] = "stale"
+                    print(f"[pipeline] {name}: precisa rodar ({key[:12]})")
+                else:
+                    print(f"[pipeline] {name}: rodando ({key[:12]})")
+                    running[pool.submit(execute, name, key)] = name
+            if not running:
+                # ``pending`` está em ordem topológica: uma passada sem nada rodando esgota a fila
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    status[name] = fut.result()
+                except Exception as e:  # erro no próprio runner (ex.: hashing)
+                    print(f"[pipeline] {name}: erro {e!r}")
+                    status[name] = "failed"
+    hasher.save()
+    return status
+
+def main(argv=None) -> int:
+    pcfg = load_config().get("pipeline", {})
+    ap = argparse.ArgumentParser(description="Pipeline com cache de estágios por conteúdo")
+    ap.add_argument("targets", nargs="*", default=list(DEFAULT_TARGETS), help=f"estágios ({', '.join(STAGES)})")
+    ap.add_argument("-j", "--jobs", type=int, default=int(pcfg.get("max_workers", 2)))
+    ap.add_argument("--force", nargs="+", default=[], help="estágios a rodar mesmo com cache válido")
+    ap.add_argument("--dry-run", action="store_true", help="só mostra o que rodaria")
+    args = ap.parse_args(argv)
+    status = run_pipeline(args.targets, args.jobs, args.force, args.dry_run,
+                          store_objects=bool(pcfg.get("store_objects", True)))
+    print("[pipeline] " + ", ".join(f"{k}={v}" for k, v in status.items()))
+    return 1 if "failed" in status.values() or "skipped" in status.values() else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Exportação do ator do PPO para inferência sem SB3/torch.
+
+``export_policy`` grava em ``models/ppo_synapse_policy.npz`` só o que a ação
+determinística precisa — camadas ``Linear`` do ``policy_net``, ativação,
+``action_net`` e limites do espaço de ações — e ``NumpyPolicy`` refaz o forward
+em float32 com NumPy puro. Backtest e serviço carregam a política por
+``load_policy``, que usa o export quando ele existe e não é mais antigo que o
+``.zip`` (``inference.runtime: auto``).
+
+Uso: python -m src.policy_export [--model models/ppo_synapse.zip] [--out models/ppo_synapse_policy.npz]
+"""
+from __future__ import annotations
+import argparse, pathlib
+import numpy as np
+from .utils import MODELS_DIR, load_config
+
+MODEL_PATH = MODELS_DIR / "ppo_synapse.zip"
+POLICY_EXPORT_PATH = MODELS_DIR / "ppo_synapse_policy.npz"
+FORMAT_VERSION = 1
+
+_ACTIVATIONS = {
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0.0, out=x),
+    "identity": lambda x: x,
+}
+
+def _activation_name(module) -> str:
+    name = type(module).__name__.lower()
+    if name == "relu":
+        return "relu"
+    if name == "tanh":
+        return "tanh"
+    raise ValueError(f"ativação não suportada no export: {type(module).__name__}")
+
+def export_policy(model, path=POLICY_EXPORT_PATH) -> pathlib.Path:
+    """
+    Grava o ator de um PPO ``MlpPolicy`` (Box contínuo, distribuição gaussiana) em ``.npz``.
+
+    Só o caminho determinístico é exportado (média da gaussiana + clip, como
+    ``model.predict(obs, deterministic=True)``); crítico e ``log_std`` ficam de fora.
+    """
+    import torch
+    policy = model.policy
+    extractor = getattr(policy, "pi_features_extractor", policy.features_extractor)
+    if type(extractor).__name__ != "FlattenExtractor":
+        raise ValueError(f"export suporta apenas FlattenExtractor, não {type(extractor).__name__}")
+    arrays, acts = {}, []
+    k = 0
+    for module in policy.mlp_extractor.policy_net:
+        if isinstance(module, torch.nn.Linear):
+            arrays[f"W{k}"] = module.weight.detach().cpu().numpy().T.astype(np.float32)
+            arrays[f"b{k}"] = module.bias.detach().cpu().numpy().astype(np.float32)
+            acts.append("identity")
+            k += 1
+        elif k and acts[-1] == "identity":
+            acts[-1] = _activation_name(module)
+        else:
+            raise ValueError(f"camada inesperada no policy_net: {module}")
+    arrays[f"W{k}"] = policy.action_net.weight.detach().cpu().numpy().T.astype(np.float32)
+    arrays[f"b{k}"] = policy.action_net.bias.detach().cpu().numpy().astype(np.float32)
+    acts.append("identity")
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, version=np.int64(FORMAT_VERSION), activations=np.array(acts),
+             low=model.action_space.low.astype(np.float32), high=model.action_space.high.astype(np.float32),
+             squash=np.bool_(getattr(policy, "squash_output", False)),
+             obs_dim=np.int64(model.observation_space.shape[0]), **arrays)
+    return path
+
+class NumpyPolicy:
+    """Ator exportado: ``policy(obs) -> ações`` (act_fn das rollouts) e ``predict`` no formato do SB3."""
+
+    def __init__(self, layers: list[tuple[np.ndarray, np.ndarray]], activations: list[str],
+                 low: np.ndarray, high: np.ndarray, squash: bool = False):
+        self.layers = layers
+        self.activations = [_ACTIVATIONS[a] for a in activations]
+        self.low, self.high, self.squash = low, high, bool(squash)
+        self.obs_dim = layers[0][0].shape[0]
+
+    @classmethod
+    def load(cls, path=POLICY_EXPORT_PATH) -> "NumpyPolicy":
+        with np.load(path) as z:
+            if int(z["version"]) != FORMAT_VERSION:
+                raise ValueError(f"versão de export incompatível em {path}: {int(z['version'])}")
+            acts = [str(a) for a in z["activations"]]
+            layers = [(z[f"W{i}"], z[f"b{i}"]) for i in range(len(acts))]
+            return cls(layers, acts, z["low"], z["high"], bool(z["squash"]))
+
+    def __call__(self, obs: np.ndarray) -> np.ndarray:
+        x = np.asarray(obs, dtype=np.float32).reshape(-1, self.obs_dim)
+        for (W, b), act in zip(self.layers, self.activations):
+            x = act(x @ W + b)
+        if self.squash:
+            # mesma conta de ``policy.unscale_action`` sobre a saída tanh
+            return self.low + 0.5 * (np.tanh(x) + 1.0) * (self.high - self.low)
+        return np.clip(x, self.low, self.high)
+
+    def predict(self, obs, state=None, episode_start=None, deterministic: bool = True):
+        obs = np.asarray(obs)
+        actions = self(obs)
+        return (actions[0] if obs.ndim == 1 else actions), None
+
+def load_policy(cfg: dict | None = None, model_path=None, export_path=None, runtime: str | None = None,
+                torch_threads: int | None = None):
+    """
+    act_fn da política treinada conforme ``inference.runtime``:
+    ``numpy`` (export ``.npz``), ``sb3`` (``PPO.load`` + ``sb3_act_fn``) ou ``auto``
+    (export se existir e não for mais antigo que o ``.zip``; senão SB3).
+    ``torch_threads`` só vale para o caminho SB3.
+    """
+    cfg = load_config() if cfg is None else cfg
+    runtime = runtime or cfg.get("inference", {}).get("runtime", "auto")
+    model_path = pathlib.Path(model_path or MODEL_PATH)
+    export_path = pathlib.Path(export_path or POLICY_EXPORT_PATH)
+    if runtime not in ("auto", "numpy", "sb3"):
+        raise ValueError(f"inference.runtime inválido: {runtime}")
+    if runtime == "auto":
+        fresh = export_path.exists() and (not model_path.exists()
+                                          or export_path.stat().st_mtime_ns >= model_path.stat().st_mtime_ns)
+        runtime = "numpy" if fresh else "sb3"
+    if runtime == "numpy":
+        if not export_path.exists():
+            raise FileNotFoundError(f"Política exportada não encontrada: {export_path}. Execute: python -m src.policy_export")
+        return NumpyPolicy.load(export_path)
+    if not model_path.exists():
+        raise FileNotFoundError("Modelo PPO não encontrado. Execute: python -m src.train_rl")
+    import torch
+    from stable_baselines3 import PPO
+    from .rollout import sb3_act_fn
+    if torch_threads:
+        torch.set_num_threads(int(torch_threads))
+    return sb3_act_fn(PPO.load(str(model_path), device="cpu"))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Exporta o ator do PPO para inferência só com NumPy")
+    ap.add_argument("--model", default=str(MODEL_PATH))
+    ap.add_argument("--out", default=str(POLICY_EXPORT_PATH))
+    args = ap.parse_args(argv)
+    from stable_baselines3 import PPO
+    path = export_policy(PPO.load(args.model, device="cpu"), args.out)
+    print(f"[policy_export] Salvo: {path}")
+
+if __name__ == "__main__":
+    main()
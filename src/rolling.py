@@ -0,0 +1,134 @@
+from __future__ import annotations
+import numpy as np, pandas as pd
+from .utils import OUT_DIR, save_frame, load_frame
+
+ROLLING_STORE = OUT_DIR / "rolling"
+ROLLING_METRICS = ("sharpe", "sortino", "vol", "beta", "max_drawdown")
+
+def _window_sum(X: np.ndarray, w: int) -> np.ndarray:
+    """
+    Somas móveis (T, K) de ``w`` linhas via cumsum; NaN nas primeiras ``w-1`` e em toda
+    janela com algum NaN (ex.: curva que começa depois) — sem contaminar as seguintes.
+    """
+    valid = ~np.isnan(X)
+    c = np.cumsum(np.where(valid, X, 0.0), axis=0)
+    n = np.cumsum(valid, axis=0)
+    out = np.full(X.shape, np.nan)
+    out[w-1] = c[w-1]
+    out[w:] = c[w:] - c[:-w]
+    full = np.zeros(X.shape, dtype=bool)
+    full[w-1] = n[w-1] == w
+    full[w:] = n[w:] - n[:-w] == w
+    out[~full] = np.nan
+    return out
+
+def _nanmean0(X: np.ndarray) -> np.ndarray:
+    """Média por coluna ignorando NaN (0 em colunas sem dados)."""
+    n = (~np.isnan(X)).sum(axis=0)
+    return np.where(n > 0, np.nansum(X, axis=0) / np.maximum(n, 1), 0.0)
+
+def _window_std(X: np.ndarray, w: int) -> np.ndarray:
+    # centraliza pela média global antes das somas para evitar cancelamento numérico
+    Xc = X - _nanmean0(X)
+    s1, s2 = _window_sum(Xc, w), _window_sum(Xc * Xc, w)
+    return np.sqrt(np.maximum(s2 - s1 * s1 / w, 0.0) / (w - 1))
+
+def _blocks(X: np.ndarray, w: int):
+    """(T, K) -> (n_blocos, w, K), completando a última linha com NaN."""
+    T = X.shape[0]
+    pad = (-T) % w
+    Xp = np.concatenate([X, np.full((pad,) + X.shape[1:], np.nan)]) if pad else X
+    return Xp.reshape((-1, w) + X.shape[1:]), T
+
+def rolling_max_drawdown(nav: np.ndarray, w: int) -> np.ndarray:
+    """
+    Pior drawdown dentro de cada janela de ``w`` barras (pico e vale na própria janela).
+
+    Algoritmo de van Herk/Gil-Werman em O(T) para o monóide (máx, mín, queda) do log da
+    NAV: varreduras de prefixo e sufixo por blocos de ``w`` e uma combinação por janela.
+    """
+    L = np.log(np.asarray(nav, dtype=float))
+    squeeze = L.ndim == 1
+    L = L.reshape(len(L), -1)
+    B, T = _blocks(L, w)
+    # prefixo do bloco: [início, j]
+    p_max = np.fmax.accumulate(B, axis=1)
+    p_min = np.fmin.accumulate(B, axis=1)
+    p_drop = np.fmin.accumulate(B - p_max, axis=1)
+    # sufixo do bloco: [j, fim]
+    R = B[:, ::-1]
+    s_max = np.fmax.accumulate(R, axis=1)[:, ::-1]
+    s_min = np.fmin.accumulate(R, axis=1)[:, ::-1]
+    nxt_min = np.concatenate([s_min[:, 1:], np.full_like(s_min[:, :1], np.nan)], axis=1)
+    s_drop = np.fmin(np.fmin.accumulate((nxt_min - B)[:, ::-1], axis=1)[:, ::-1], 0.0)
+    flat = lambda A: A.reshape(-1, L.shape[1])[:T]
+    p_max, p_min, p_drop, s_max, s_drop = map(flat, (p_max, p_min, p_drop, s_max, s_drop))
+
+    out = np.full(L.shape, np.nan)
+    i = np.arange(w - 1, T)
+    j = i - w + 1
+    drop = np.minimum(np.minimum(s_drop[j], p_drop[i]), p_min[i] - s_max[j])
+    aligned = (i + 1) % w == 0          # janela = bloco inteiro: o prefixo já cobre tudo
+    drop[aligned] = p_drop[i[aligned]]
+    out[w-1:] = np.expm1(drop)
+    return out[:, 0] if squeeze else out
+
+def rolling_metrics(returns: pd.DataFrame, bench: pd.Series | None = None, windows=(21, 63, 252),
+                    rf: float = 0.0, period_per_year: int = 252) -> pd.DataFrame:
+    """
+    Sharpe, Sortino, vol anualizada, beta vs ``bench`` e max drawdown móveis de todas as
+    colunas de ``returns`` para cada janela, em O(T) por janela (somas acumuladas).
+    Janelas com algum retorno NaN (antes do início de uma curva) ficam NaN.
+
+    Returns:
+        DataFrame com colunas MultiIndex (série, janela, métrica), mesmo índice de ``returns``
+    """
+    R = returns.to_numpy(dtype=float)
+    X = R - rf / period_per_year
+    nav = np.cumprod(1.0 + np.nan_to_num(R), axis=0)   # NaN não propaga; janelas com NaN mascaradas abaixo
+    ann = np.sqrt(period_per_year)
+    if bench is not None:
+        x = bench.reindex(returns.index).fillna(0.0).to_numpy(dtype=float) - rf / period_per_year
+        x = x - x.mean()
+        Xc = X - _nanmean0(X)
+    blocks = {}
+    for w in windows:
+        w = int(w)
+        if w < 2 or w > len(R):
+            continue
+        mu = _window_sum(X, w) / w
+        sd = _window_std(X, w)
+        down = _window_std(np.minimum(X, 0.0), w)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            m = {
+                "sharpe": np.where(sd > 1e-12, mu * ann / sd, np.nan),
+                "sortino": np.where(down > 1e-12, mu * ann / down, np.nan),
+                "vol": sd * ann,
+            }
+            if bench is not None:
+                sx, sxx = _window_sum(x, w), _window_sum(x * x, w)
+                var = sxx - sx * sx / w
+                cov = _window_sum(Xc * x[:, None], w) - _window_sum(Xc, w) * (sx / w)[:, None]
+                m["beta"] = np.where((var > 1e-18)[:, None], cov / var[:, None], np.nan)
+        m["max_drawdown"] = np.where(np.isnan(_window_sum(R, w)), np.nan, rolling_max_drawdown(nav, w))
+        for metric, arr in m.items():
+            for k, col in enumerate(returns.columns):
+                blocks[(str(col), str(w), metric)] = arr[:, k]
+    out = pd.DataFrame(blocks, index=returns.index)
+    out.columns = pd.MultiIndex.from_tuples(out.columns, names=["series", "window", "metric"])
+    return out
+
+def navs_to_returns(navs: pd.DataFrame, base: float = 1.0) -> pd.DataFrame:
+    """
+    Retornos líquidos de curvas NAV. A 1ª barra válida de cada curva rende contra ``base``
+    (NAV antes do 1º dia: a do RL começa em (1+r0)(1-c0), não em 1, e esse dia conta;
+    curva que já começa na base rende 0); barras antes do início da curva ficam NaN.
+    """
+    first = navs.notna() & navs.shift().isna()
+    return (navs / navs.shift() - 1.0).mask(first, navs / base - 1.0)
+
+def save_rolling(df: pd.DataFrame, path=ROLLING_STORE):
+    return save_frame(df, path, dtype=np.float32)
+
+def load_rolling(series=None, path=ROLLING_STORE) -> pd.DataFrame:
+    return load_frame(path, columns=series)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+import numpy as np, pandas as pd
+from .env import PortfolioEnv
+from .features import make_features
+from .batch import BatchedPortfolio
+
+def rollout_dtype(n_assets: int) -> np.dtype:
+    return np.dtype([("t", np.int64), ("nav", np.float64), ("ret", np.float64), ("turnover", np.float64),
+                     ("cost", np.float64), ("reward", np.float64), ("weights", np.float64, (n_assets,))])
+
+def sb3_act_fn(model, deterministic: bool = True):
+    """Ações em lote direto na rede da política SB3 (``torch.no_grad``), com o mesmo clip de ``predict``."""
+    import torch
+    policy = model.policy
+    policy.set_training_mode(False)
+    low, high = model.action_space.low, model.action_space.high
+
+    def act(obs: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            obs_t, _ = policy.obs_to_tensor(obs)
+            actions = policy._predict(obs_t, deterministic=deterministic).cpu().numpy()
+        if getattr(policy, "squash_output", False):
+            return policy.unscale_action(actions)
+        return np.clip(actions, low, high)
+    return act
+
+def rollout(act_fn, vec: BatchedPortfolio, starts=None, max_steps: int | None = None) -> np.ndarray:
+    """
+    Roda os N episódios de ``vec`` até o fim dos dados (ou ``max_steps``) com ações em lote.
+
+    Args:
+        act_fn: obs (N, obs_dim) -> ações (N, n_assets)
+        starts: ``t0`` por episódio (default: ``window`` para todos)
+
+    Returns:
+        array estruturado (N, L) com ``t`` (índice em ``vec.idx``; -1 depois do fim),
+        ``nav``, ``ret``, ``turnover``, ``cost``, ``reward`` e ``weights``
+    """
+    vec.autoreset = False
+    obs = vec.reset_at(vec.window if starts is None else starts)
+    L = vec.T - int(vec.t0.min())
+    if max_steps is not None:
+        L = min(L, int(max_steps))
+    out = np.zeros((vec.num_envs, L), dtype=rollout_dtype(vec.n))
+    out["t"] = -1
+    for j in range(L):
+        live = vec.live()
+        if not live.any():
+            break
+        t_now = vec.t.copy()
+        reward, turnover, r_t, cost = vec.advance(act_fn(obs))
+        rec = out[:, j]
+        rec["t"] = np.where(live, t_now, -1)
+        rec["nav"], rec["ret"], rec["turnover"] = vec.nav, r_t, turnover
+        rec["cost"], rec["reward"], rec["weights"] = cost, reward, vec.w
+        obs = vec._get_obs()
+    return out
+
+def rollout_frames(res: np.ndarray, index: pd.DatetimeIndex, assets, k: int = 0):
+    """Episódio ``k`` de ``rollout`` no formato das curvas salvas: (nav/ret/turnover, pesos) por data."""
+    rec = res[k][res[k]["t"] >= 0]
+    dates = pd.DatetimeIndex(index[rec["t"]], name="date")
+    df = pd.DataFrame({"nav": rec["nav"], "ret": rec["ret"], "turnover": rec["turnover"]}, index=dates)
+    wdf = pd.DataFrame(rec["weights"], index=dates, columns=list(assets))
+    return df, wdf
+
+def stress_scenarios(env: PortfolioEnv, n: int, noise: float = 0.5, seed: int = 0):
+    """
+    ``n`` trajetórias perturbadas do período de ``env``: ruído gaussiano de ``noise`` × vol
+    de cada ativo somado aos retornos a partir de ``t = window``; as features são
+    recalculadas sobre os preços perturbados (antes disso valem as originais; as
+    features são invariantes à escala, então os preços partem de 1).
+
+    Returns:
+        (retornos (n, T, n_assets), features (n, T, n_assets*fdim)) alinhados a ``env.idx``
+    """
+    rng = np.random.default_rng(seed)
+    R = env._ret_arr
+    sigma = R.std(axis=0)
+    rets = np.repeat(R[None], n, axis=0)
+    rets[:, env.window:] += noise * sigma * rng.standard_normal((n, len(R) - env.window, R.shape[1]))
+    feats = np.empty((n,) + env._feat_arr.shape, dtype=np.float32)
+    for k in range(n):
+        close = pd.DataFrame(np.cumprod(1.0 + rets[k], axis=0), index=env.idx, columns=env.assets)
+        f = make_features(close).reindex(env.idx).to_numpy(dtype=np.float32)
+        feats[k] = np.where(np.isnan(f), env._feat_arr, f)
+    return rets, feats
+
+def evaluate_policy_batch(model, env: PortfolioEnv, n_scenarios: int = 0, noise: float = 0.5, seed: int = 0,
+                          act_fn=None) -> np.ndarray:
+    """Cenário histórico (linha 0) + ``n_scenarios`` de estresse, todos numa única rollout em lote."""
+    vec = BatchedPortfolio.from_env(env, num_envs=1 + n_scenarios, autoreset=False)
+    if n_scenarios:
+        rets, feats = stress_scenarios(env, n_scenarios, noise, seed)
+        vec.set_scenarios(np.concatenate([env._ret_arr[None], rets]),
+                          np.concatenate([env._feat_arr[None], feats]))
+    return rollout(act_fn or sb3_act_fn(model), vec)
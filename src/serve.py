@@ -0,0 +1,354 @@
+"""
+Serviço local de inferência para o rebalanceamento diário.
+
+Carrega a política uma vez e mantém em memória a linha de features mais recente
+(e o estado incremental de ``features.update_features``). Responde "pesos-alvo de
+hoje dados os pesos atuais e a NAV" aplicando o mesmo pipeline do
+``PortfolioEnv.step``: ``w + step_scale·tanh(ação)``, ``project_capped_simplex`` e o
+overlay de drawdown. Pedidos concorrentes são agregados em micro-lotes (uma
+inferência por lote). HTTP/1.1 (keep-alive) em TCP ou Unix socket, só asyncio.
+
+Endpoints (JSON):
+    GET  /health   -> {"status", "date", "assets"}
+    POST /weights  {"accounts": [{"holdings": [...] | {ativo: peso}, "nav": 1.0, "max_nav": 1.0}, ...]}
+                   -> {"date", "assets", "weights": [[...], ...]}
+    POST /prices   {"date": "YYYY-MM-DD", "close": {ativo: preço}} -> {"date"}  (nova barra)
+
+Uso: python -m src.serve [--host 127.0.0.1 --port 8765 | --unix /tmp/synapse.sock] [--model models/ppo_synapse.zip]
+"""
+from __future__ import annotations
+import argparse, asyncio, json, pathlib
+import numpy as np, pandas as pd
+from .utils import load_config, load_features
+from .env import PortfolioEnv, project_capped_simplex_batch, drawdown_overlay_batch
+from .features import STATE_PATH, load_feature_state, update_features
+
+class PolicyService:
+    """
+    Núcleo síncrono do serviço (sem I/O): ``act_fn`` mapeia obs (B, obs_dim) em ações
+    (B, N). ``env`` é um ``PortfolioEnv`` de referência sobre as últimas barras — dele
+    vêm ativos, layout da observação, limites, parâmetros do overlay e o prior MPT
+    (pesos iniciais de contas sem posição).
+    """
+
+    def __init__(self, act_fn, env: PortfolioEnv, feature_state: dict | None = None):
+        self.act_fn = act_fn
+        self.env = env
+        self.assets = list(env.assets)
+        self.n = env.n
+        self._asset_pos = {a: i for i, a in enumerate(self.assets)}
+        self._feat_cols = pd.MultiIndex.from_product([self.assets, env.market.feature_names])
+        self.features = np.asarray(env._feat_arr[-1], dtype=np.float32)
+        self.date = env.idx[-1]
+        self.w0 = np.asarray(env._prior_arr[-1], dtype=float)
+        self.feature_state = feature_state
+
+    @classmethod
+    def from_outputs(cls, cfg: dict, act_fn, assets) -> "PolicyService":
+        """Últimas barras de ``outputs/features`` (+ estado incremental, se existir) para ``assets``."""
+        window = int(cfg["env"]["window_size"])
+        feats = load_features(assets=assets)
+        feats = feats.dropna().iloc[-(window + 2):]
+        close = pd.DataFrame(1.0, index=feats.index, columns=list(assets))   # só o índice/ativos são usados
+        env = PortfolioEnv(prices=close, features=feats, cfg=cfg, train=False)
+        state = load_feature_state() if STATE_PATH.exists() else None
+        return cls(act_fn, env, state)
+
+    # ---- inferência --------------------------------------------------------
+    def target_weights(self, holdings: np.ndarray, nav: np.ndarray, max_nav: np.ndarray) -> np.ndarray:
+        """Pesos-alvo (B, N) para ``holdings`` (B, N), ``nav`` e ``max_nav`` (B,)."""
+        env = self.env
+        W = np.asarray(holdings, dtype=float)
+        B = len(W)
+        feat = np.broadcast_to(self.features, (B, self.features.size))
+        obs = np.concatenate([feat, W.astype(np.float32)], axis=1) if env.include_weights else np.array(feat)
+        actions = np.asarray(self.act_fn(obs), dtype=float).reshape(B, self.n)
+        proposal = W + env.step_scale * np.tanh(actions)
+        target = project_capped_simplex_batch(proposal, env.min_w, env.max_w, s=1.0)
+        dd = np.asarray(nav, dtype=float) / (np.asarray(max_nav, dtype=float) + 1e-12) - 1.0
+        return drawdown_overlay_batch(target, dd, env.cash_idx, env.dd_trigger, env.dd_hard, env.max_cash,
+                                      env.smoothing, env.min_w, env.max_w)
+
+    def parse_accounts(self, accounts: list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Contas JSON → (holdings, nav, max_nav). Sem ``holdings``: prior MPT; sem ``max_nav``: ``nav``."""
+        if not isinstance(accounts, list) or not accounts:
+            raise ValueError("'accounts' deve ser uma lista não vazia")
+        B = len(accounts)
+        H = np.tile(self.w0, (B, 1))
+        nav, max_nav = np.ones(B), np.ones(B)
+        for i, acc in enumerate(accounts):
+            if not isinstance(acc, dict):
+                raise ValueError(f"conta {i}: esperado objeto JSON, veio {type(acc).__name__}")
+            h = acc.get("holdings")
+            if isinstance(h, dict):
+                unknown = set(h) - set(self._asset_pos)
+                if unknown:
+                    raise ValueError(f"conta {i}: ativos desconhecidos {sorted(unknown)[:5]}")
+                H[i] = 0.0
+                for a, w in h.items():
+                    H[i, self._asset_pos[a]] = float(w)
+            elif h is not None:
+                if not isinstance(h, list):
+                    raise ValueError(f"conta {i}: 'holdings' deve ser lista ou objeto")
+                if len(h) != self.n:
+                    raise ValueError(f"conta {i}: 'holdings' com {len(h)} pesos; esperado {self.n}")
+                H[i] = np.asarray(h, dtype=float)
+            total = H[i].sum()
+            H[i] = H[i] / total if total > 0 else self.w0
+            nav[i] = float(acc.get("nav", 1.0))
+            max_nav[i] = float(acc.get("max_nav", max(nav[i], 1.0)))
+            if not (np.isfinite(H[i]).all() and np.isfinite(nav[i]) and np.isfinite(max_nav[i])):
+                raise ValueError(f"conta {i}: pesos/NAV não finitos")
+        return H, nav, np.maximum(max_nav, nav)
+
+    # ---- estado de features --------------------------------------------------
+    def update_prices(self, date, close: dict) -> pd.Timestamp:
+        """
+        Nova barra de fechamento: avança o estado incremental e troca a linha de features servida.
+        Todos os ativos servidos precisam de preço finito (senão ValueError, sem mexer no estado).
+        """
+        if self.feature_state is None:
+            raise RuntimeError(f"Sem estado de features ({STATE_PATH}); rode python -m src.features")
+        if not isinstance(close, dict):
+            raise ValueError("'close' deve ser um objeto {ativo: preço}")
+        bad = [a for a in self.assets if not _finite(close.get(a))]
+        if bad:
+            raise ValueError(f"preços ausentes ou inválidos para {len(bad)} ativos: {bad[:5]}")
+        tail = self.feature_state["px_tail"]
+        row = pd.DataFrame([close], index=pd.DatetimeIndex([pd.Timestamp(date)])).reindex(columns=tail.columns)
+        rows, state = update_features(row.astype(float), self.feature_state)
+        if rows.empty:
+            raise ValueError(f"Data {date} não é posterior à última barra ({tail.index[-1].date()})")
+        self.features = rows[self._feat_cols].to_numpy(dtype=np.float32)[-1]
+        self.feature_state, self.date = state, rows.index[-1]
+        return self.date
+
+def _finite(x) -> bool:
+    return isinstance(x, (int, float)) and not isinstance(x, bool) and bool(np.isfinite(x))
+
+class MicroBatcher:
+    """
+    Agrega pedidos concorrentes: cada ``submit`` entra numa fila e um único consumidor
+    junta tudo o que estiver pendente (até ``max_batch`` contas, esperando no máximo
+    ``window_ms``) numa só chamada de ``PolicyService.target_weights``.
+    """
+
+    def __init__(self, service: PolicyService, max_batch: int = 1024, window_ms: float = 0.0):
+        self.service, self.max_batch, self.window = service, int(max_batch), float(window_ms) / 1e3
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+        self.batches = self.requests = 0
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, H: np.ndarray, nav: np.ndarray, max_nav: np.ndarray) -> np.ndarray:
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((H, nav, max_nav, fut))
+        return await fut
+
+    async def _run(self):
+        while True:
+            items = [await self._queue.get()]
+            size = len(items[0][0])
+            if self.window > 0:
+                await asyncio.sleep(self.window)
+            while size < self.max_batch and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+                size += len(items[-1][0])
+            try:
+                out = self.service.target_weights(*(np.concatenate([it[k] for it in items]) for k in range(3)))
+            except Exception as e:      # falha do lote vai para todos os pedidos dele
+                for *_, fut in items:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(items)
+            pos = 0
+            for H, *_, fut in items:
+                if not fut.done():
+                    fut.set_result(out[pos:pos + len(H)])
+                pos += len(H)
+
+# ---- HTTP mínimo sobre asyncio ------------------------------------------------
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 409: "Conflict", 413: "Payload Too Large",
+            500: "Internal Server Error"}
+MAX_BODY = 1 << 20
+
+class _Unparseable(Exception):
+    """Pedido que não dá para ler até o fim: responde ``status`` e fecha (o stream perdeu o enquadramento)."""
+
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+
+def _json_object(body: bytes) -> dict:
+    req = json.loads(body or b"{}")
+    if not isinstance(req, dict):
+        raise ValueError(f"corpo deve ser um objeto JSON, veio {type(req).__name__}")
+    return req
+
+def _response(status: int, payload: dict, keep_alive: bool) -> bytes:
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+class PolicyServer:
+    """Servidor HTTP/1.1 (TCP ou Unix socket) na frente de um ``MicroBatcher``."""
+
+    def __init__(self, service: PolicyService, max_batch: int = 1024, window_ms: float = 0.0,
+                 max_body: int = MAX_BODY):
+        self.service = service
+        self.batcher = MicroBatcher(service, max_batch, window_ms)
+        self.max_body = int(max_body)
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765, unix: str | None = None):
+        self.batcher.start()
+        if unix:
+            pathlib.Path(unix).unlink(missing_ok=True)
+            self._server = await asyncio.start_unix_server(self._handle, path=unix)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    @property
+    def port(self) -> int | None:
+        sock = self._server.sockets[0].getsockname() if self._server else None
+        return sock[1] if isinstance(sock, tuple) else None
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        svc = self.service
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "date": str(svc.date.date()), "assets": svc.assets,
+                         "batches": self.batcher.batches, "requests": self.batcher.requests}
+        if method == "POST" and path == "/weights":
+            H, nav, max_nav = svc.parse_accounts(_json_object(body).get("accounts"))
+            W = await self.batcher.submit(H, nav, max_nav)
+            return 200, {"date": str(svc.date.date()), "assets": svc.assets, "weights": W.round(6).tolist()}
+        if method == "POST" and path == "/prices":
+            req = _json_object(body)
+            if not isinstance(req.get("date"), str):
+                raise ValueError("'date' deve ser uma string YYYY-MM-DD")
+            return 200, {"date": str(svc.update_prices(req["date"], req.get("close")).date())}
+        return 404, {"error": f"{method} {path} não existe"}
+
+    async def _read_request(self, reader: asyncio.StreamReader, line: bytes) -> tuple[str, str, bytes, bool]:
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise _Unparseable(400, f"linha de requisição inválida: {line[:80]!r}")
+        method, path, version = parts
+        headers = {}
+        while (h := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            k, _, v = h.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise _Unparseable(400, f"Content-Length inválido: {headers['content-length']!r}") from None
+        if length < 0:
+            raise _Unparseable(400, f"Content-Length inválido: {length}")
+        if length > self.max_body:
+            raise _Unparseable(413, f"corpo de {length} bytes excede o limite de {self.max_body}")
+        try:
+            body = await reader.readexactly(length)
+        except asyncio.IncompleteReadError as e:
+            raise _Unparseable(400, f"corpo incompleto: {len(e.partial)} de {length} bytes") from None
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        return method, path, body, keep_alive
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, path, body, keep_alive = await self._read_request(reader, line)
+                    status, payload = await self._dispatch(method, path, body)
+                except _Unparseable as e:
+                    status, payload, keep_alive = e.status, {"error": str(e)}, False
+                except (ValueError, KeyError, TypeError) as e:
+                    status, payload = 400, {"error": str(e)}
+                except RuntimeError as e:
+                    status, payload = 409, {"error": str(e)}
+                except Exception as e:          # bug no handler não derruba a conexão nem o servidor
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def http_json(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, path: str,
+                    payload: dict | None = None) -> tuple[int, dict]:
+    """Cliente mínimo (mesma conexão keep-alive) — usado no teste de carga."""
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: local\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (h := await reader.readline()) not in (b"\r\n", b""):
+        k, _, v = h.decode("latin-1").partition(":")
+        if k.strip().lower() == "content-length":
+            length = int(v)
+    return status, json.loads(await reader.readexactly(length))
+
+def load_service(cfg: dict, model_path=None) -> PolicyService:
+    """Política PPO treinada (export NumPy ou ``models/ppo_synapse.zip``) sobre os ativos do split de treino."""
+    from .policy_export import load_policy
+    from .train_rl import load_split
+    act_fn = load_policy(cfg, model_path, torch_threads=int(cfg.get("serve", {}).get("torch_threads", 1)))
+    assets = list(load_split(cfg, "train")[0].columns)
+    return PolicyService.from_outputs(cfg, act_fn, assets)
+
+async def serve_forever(service: PolicyService, host: str, port: int, unix: str | None = None,
+                        max_batch: int = 1024, window_ms: float = 0.0, max_body: int = MAX_BODY):
+    server = PolicyServer(service, max_batch, window_ms, max_body)
+    srv = await server.start(host, port, unix)
+    print(f"[serve] {len(service.assets)} ativos, features de {service.date.date()} | "
+          f"ouvindo em {unix or f'http://{host}:{server.port}'}")
+    try:
+        await srv.serve_forever()
+    finally:
+        await server.stop()
+
+def main(argv=None):
+    cfg = load_config()
+    scfg = cfg.get("serve", {})
+    ap = argparse.ArgumentParser(description="Serviço de inferência (pesos-alvo do dia)")
+    ap.add_argument("--host", default=scfg.get("host", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(scfg.get("port", 8765)))
+    ap.add_argument("--unix", default=scfg.get("unix_socket"))
+    ap.add_argument("--model", default=None)
+    args = ap.parse_args(argv)
+    service = load_service(cfg, args.model)
+    try:
+        asyncio.run(serve_forever(service, args.host, args.port, args.unix,
+                                  int(scfg.get("max_batch", 1024)), float(scfg.get("batch_window_ms", 0.0)),
+                                  int(scfg.get("max_body_bytes", MAX_BODY))))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
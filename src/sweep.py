@@ -0,0 +1,354 @@
+"""
+Varredura de hiperparâmetros do PPO e de parâmetros de risco.
+
+Cada trial é o config base com os valores de ``sweep.space`` aplicados (chaves
+``seção.param``, ex.: ``ppo.learning_rate``, ``risk.turnover_penalty``). Os trials
+rodam num process pool (``spawn``) com orçamento de threads de torch/BLAS por
+trial. O fim do período de treino (``sweep.val_frac``) fica de fora do ajuste e
+serve de validação: o ``EvalCallback`` avalia nela e, depois de cada avaliação, o
+trial é podado se a melhor recompensa até ali ficar abaixo da mediana dos outros
+trials no mesmo ponto (``sweep.prune``). O progresso de cada trial fica em
+``progress.json`` no seu diretório, que é o que os outros processos leem. Trials
+e overlays são ordenados pelas métricas de validação (``val_*``); as de teste
+(``test_*``) só são reportadas, para não escolher hiperparâmetros no teste.
+
+Os parâmetros do overlay de drawdown (``sweep.overlay_space``) não mudam o que a
+política vê no treino: as ações de cada trial na validação e no teste são gravadas e
+reexecutadas em malha aberta, todas as combinações de uma vez num
+``BatchedPortfolio`` com parâmetros de overlay por linha. A combinação igual ao
+config do trial reproduz exatamente a rollout original; nas outras, a política
+não reage aos pesos diferentes que o overlay produz (aproximação).
+
+Saídas em ``outputs/sweep/``: ``trials.csv`` (um trial por linha), ``overlay.csv``
+(trial × combinação de overlay) e ``trials/<chave>/`` (config, evaluations.npz,
+progress.json, ações por período e resultado, reaproveitados em novas rodadas).
+
+Uso: python -m src.sweep [--trials 8] [-j 2] [--threads 1] [--no-prune]
+"""
+from __future__ import annotations
+import argparse, copy, hashlib, itertools, json, multiprocessing, pathlib, time
+import numpy as np, pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .utils import OUT_DIR, ensure_dirs, load_config
+from .walk_forward import fold_key, _limit_threads
+from .perf import stage
+
+SWEEP_DIR = OUT_DIR / "sweep"
+OVERLAY_KEYS = ("dd_trigger", "dd_hard", "max_cash", "smoothing")
+METRICS = ("final_nav", "CAGR", "Sharpe", "Sortino", "MaxDrawdown", "Calmar", "turnover")
+
+# ---- espaço de busca ----------------------------------------------------------
+def expand_space(space: dict, n_trials: int | None = None, seed: int = 0) -> list[dict]:
+    """
+    Combinações de ``{"seção.param": [valores]}``: a grade completa ou, se
+    ``n_trials`` for menor que ela, uma amostra sem reposição (ordem da grade).
+    """
+    if not space:
+        return [{}]
+    keys = list(space)
+    grid = [dict(zip(keys, vals)) for vals in itertools.product(*(space[k] for k in keys))]
+    if n_trials is None or n_trials >= len(grid):
+        return grid
+    pick = np.sort(np.random.default_rng(seed).choice(len(grid), size=int(n_trials), replace=False))
+    return [grid[i] for i in pick]
+
+def apply_params(cfg: dict, params: dict) -> dict:
+    """Cópia do config com ``params`` (``"seção.sub.param"``) aplicados."""
+    cfg = copy.deepcopy(cfg)
+    for key, value in params.items():
+        *path, leaf = key.split(".")
+        node = cfg
+        for part in path:
+            node = node.setdefault(part, {})
+        if leaf not in node:
+            raise KeyError(f"Parâmetro de sweep inexistente no config: {key}")
+        node[leaf] = value
+    return cfg
+
+def validation_split(train: tuple, val_frac: float, window: int) -> tuple[tuple, tuple]:
+    """
+    (ajuste, validação) a partir de ``train`` = (close, feats): as ``val_frac`` barras
+    finais ficam para validação, precedidas de ``window`` barras só de histórico
+    (o env começa a pontuar em ``t = window``), e o PPO treina nas anteriores.
+    """
+    close, feats = train
+    n_val = int(round(len(close) * val_frac))
+    cut = len(close) - n_val
+    if n_val < 2 or cut <= window + 1:
+        raise ValueError(f"sweep.val_frac={val_frac} inviável com {len(close)} barras de treino e janela {window}")
+    return (close.iloc[:cut], feats.iloc[:cut]), (close.iloc[cut - window:], feats.iloc[cut - window:])
+
+def _prior_digest(w_mpt) -> str:
+    """Hash do prior MPT (Series, DataFrame ou array) para a chave dos trials."""
+    obj = w_mpt if isinstance(w_mpt, (pd.Series, pd.DataFrame)) else pd.DataFrame(np.asarray(w_mpt, dtype=float))
+    h = hashlib.sha256(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    if isinstance(obj, pd.DataFrame):
+        h.update(json.dumps(list(map(str, obj.columns))).encode())
+    return h.hexdigest()
+
+# ---- poda -----------------------------------------------------------------------
+def should_prune(history: list[float], others: list[list[float]], warmup_evals: int = 2,
+                 min_trials: int = 2) -> bool:
+    """
+    Poda pela mediana: depois de ``warmup_evals`` avaliações, o trial para se a sua
+    melhor recompensa até a avaliação atual for menor que a mediana das melhores dos
+    outros trials até a mesma avaliação (com pelo menos ``min_trials`` comparáveis).
+    """
+    k = len(history)
+    if k < max(1, warmup_evals):
+        return False
+    peers = [max(h[:k]) for h in others if len(h) >= k]
+    if len(peers) < min_trials:
+        return False
+    return max(history) < float(np.median(peers))
+
+def _read_progress(trial_dir: pathlib.Path) -> list[float]:
+    try:
+        with open(trial_dir / "progress.json") as f:
+            return json.load(f)["rewards"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return []
+
+def median_pruner(trial_dir, peer_dirs=(), prune: dict | None = None):
+    """
+    Callback SB3 para ``EvalCallback(callback_after_eval=...)``: grava o progresso do
+    trial e, com ``prune`` (``warmup_evals``/``min_trials``), poda pela mediana.
+    """
+    from stable_baselines3.common.callbacks import BaseCallback
+    trial_dir, peer_dirs = pathlib.Path(trial_dir), [pathlib.Path(d) for d in peer_dirs]
+    warmup, min_trials = int((prune or {}).get("warmup_evals", 2)), int((prune or {}).get("min_trials", 2))
+
+    class MedianPruneCallback(BaseCallback):
+        pruned = False
+
+        def _on_step(self) -> bool:
+            rewards = [float(np.mean(r)) for r in self.parent.evaluations_results]
+            tmp = trial_dir / "progress.json.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"timesteps": list(map(int, self.parent.evaluations_timesteps)), "rewards": rewards}, f)
+            tmp.replace(trial_dir / "progress.json")
+            if prune is None:
+                return True
+            if should_prune(rewards, [_read_progress(d) for d in peer_dirs], warmup, min_trials):
+                self.pruned = True
+                return False
+            return True
+    return MedianPruneCallback()
+
+# ---- trials ---------------------------------------------------------------------
+def _metrics(res: np.ndarray) -> pd.DataFrame:
+    """Métricas de teste por linha de uma rollout (episódios inteiros, mesmo tamanho)."""
+    from .bootstrap import path_metrics
+    nav = res["nav"]
+    net = nav / np.concatenate([np.ones((len(nav), 1)), nav[:, :-1]], axis=1) - 1.0
+    out = path_metrics(res["ret"], net)
+    return pd.DataFrame({"final_nav": nav[:, -1], **{k: out[k] for k in METRICS[1:-1]},
+                         "turnover": res["turnover"].mean(axis=1)})
+
+def run_trial(params: dict, cfg: dict, train: tuple, val: tuple, test: tuple, w_mpt, trial_dir, peer_dirs=(),
+              threads: int = 1, prune: dict | None = None, eval_freq: int | None = None) -> dict:
+    """
+    Treina um trial (PPO com ``cfg`` já com ``params``) em ``train``, avaliando e podando
+    em ``val``; depois roda a política na validação e no teste gravando as ações e salva
+    ``result.json`` (métricas ``val_*`` e ``test_*``). Devolve o resultado.
+    """
+    _limit_threads(threads)
+    import torch
+    torch.set_num_threads(threads)
+    from stable_baselines3.common.vec_env import DummyVecEnv
+    from .env import PortfolioEnv
+    from .rollout import sb3_act_fn, evaluate_policy_batch
+    from .train_rl import train_model
+
+    t0 = time.perf_counter()
+    trial_dir = pathlib.Path(trial_dir)
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    (trial_dir / "progress.json").unlink(missing_ok=True)
+    with open(trial_dir / "config.json", "w") as f:
+        json.dump({"params": params, "cfg": cfg}, f, indent=2, default=str)
+    (close_tr, feats_tr), (close_va, feats_va) = train, val
+    n_envs = int(cfg["ppo"].get("n_envs", 1))
+    if n_envs > 1:
+        from .vec_env import BatchedPortfolioEnv
+        vec = BatchedPortfolioEnv(close_tr, feats_tr, cfg, num_envs=n_envs, seed=cfg["seed"], w_mpt=w_mpt)
+    else:
+        vec = DummyVecEnv([lambda: PortfolioEnv(prices=close_tr, features=feats_tr, cfg=cfg, w_mpt=w_mpt)])
+    eval_env = DummyVecEnv([lambda: PortfolioEnv(prices=close_va, features=feats_va, cfg=cfg, train=False, w_mpt=w_mpt)])
+    pruner = median_pruner(trial_dir, peer_dirs, prune)
+    model = train_model(cfg, vec, eval_env, tensorboard=False, best_model_dir=None, eval_log_dir=trial_dir,
+                        verbose=0, perf_key=f"sweep/{trial_dir.name}", eval_freq=eval_freq,
+                        callback_after_eval=pruner)
+    vec.close()
+
+    act, metrics = sb3_act_fn(model), {}
+    for split, (close, feats) in (("val", val), ("test", test)):
+        actions = []
+        def record(obs):
+            a = act(obs)
+            actions.append(a[0])
+            return a
+        env = PortfolioEnv(prices=close, features=feats, cfg=cfg, train=False, w_mpt=w_mpt)
+        res = evaluate_policy_batch(None, env, act_fn=record)
+        np.save(trial_dir / f"actions_{split}.npy", np.asarray(actions, dtype=np.float32))
+        metrics.update(_metrics(res).iloc[0].add_prefix(f"{split}_").to_dict())
+    rewards = _read_progress(trial_dir)
+    result = {"params": params, "status": "pruned" if pruner.pruned else "complete",
+              "timesteps": int(model.num_timesteps), "n_evals": len(rewards),
+              "best_eval_reward": max(rewards) if rewards else None,
+              "last_eval_reward": rewards[-1] if rewards else None,
+              **metrics, "wall_s": time.perf_counter() - t0}
+    with open(trial_dir / "result.json", "w") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+# ---- overlay por replay ------------------------------------------------------------
+def replay_overlays(env, actions: np.ndarray, overlays: list[dict]) -> pd.DataFrame:
+    """
+    Reexecuta as ``actions`` (L, n) gravadas a partir de ``t = window`` com cada
+    combinação de overlay (``dd_trigger``/``dd_hard``/``max_cash``/``smoothing``;
+    ausentes ficam como no ``env``), numa só rollout em lote. Métricas por combinação.
+    """
+    from .batch import BatchedPortfolio
+    from .rollout import rollout
+    vec = BatchedPortfolio.from_env(env, num_envs=len(overlays), autoreset=False)
+    for key in OVERLAY_KEYS:
+        setattr(vec, key, np.array([float(o.get(key, getattr(env, key))) for o in overlays]))
+    steps = iter(actions)
+    res = rollout(lambda obs: np.broadcast_to(next(steps), (len(overlays), env.n)), vec, max_steps=len(actions))
+    return _metrics(res)
+
+def overlay_table(trials: pd.DataFrame, trial_dirs: dict, cfgs: dict, splits: dict, overlay_space: dict,
+                  w_mpt) -> pd.DataFrame:
+    """
+    Métricas de cada trial concluído × combinação de ``overlay_space`` (1ª linha: o overlay
+    do próprio trial) em cada período de ``splits`` (``{"val": (close, feats), ...}``, colunas
+    ``<período>_<métrica>``), ordenadas pelo Sharpe de validação.
+    """
+    from .env import PortfolioEnv
+    unknown = set(overlay_space) - set(OVERLAY_KEYS)
+    if unknown:
+        raise KeyError(f"sweep.overlay_space aceita só {OVERLAY_KEYS}: {sorted(unknown)}")
+    combos = expand_space(overlay_space) if overlay_space else []
+    rows = []
+    for key in trials.index[trials["status"] == "complete"]:
+        cfg = cfgs[key]
+        base = {k: float(cfg["risk_overlay"][k]) for k in OVERLAY_KEYS}
+        overlays = [base] + [{**base, **c} for c in combos]
+        head = pd.DataFrame(overlays)
+        head.insert(0, "overlay", ["trial"] + [f"combo_{i}" for i in range(len(combos))])
+        head.insert(0, "trial", key)
+        parts = [head]
+        for split, (close, feats) in splits.items():
+            env = PortfolioEnv(prices=close, features=feats, cfg=cfg, train=False, w_mpt=w_mpt)
+            m = replay_overlays(env, np.load(trial_dirs[key] / f"actions_{split}.npy"), overlays)
+            parts.append(m.add_prefix(f"{split}_"))
+        rows.append(pd.concat(parts, axis=1))
+    if not rows:
+        return pd.DataFrame()
+    return pd.concat(rows, ignore_index=True).sort_values("val_Sharpe", ascending=False, kind="stable")
+
+# ---- orquestração ------------------------------------------------------------------
+def run_sweep(cfg: dict, train: tuple, test: tuple, space: dict, overlay_space: dict | None = None,
+              n_trials: int | None = None, n_workers: int = 1, threads_per_trial: int = 1,
+              prune: dict | None = None, eval_freq: int | None = None, out_dir=SWEEP_DIR,
+              seed: int = 0, val_frac: float = 0.2, w_mpt=None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Roda os trials de ``space`` (em paralelo num process pool), pulando os que já têm
+    resultado em ``out_dir/trials``, e avalia ``overlay_space`` por replay. As
+    ``val_frac`` barras finais de ``train`` são a validação (ver ``validation_split``).
+    ``w_mpt`` é o prior MPT de todos os envs (default: pesos iguais) e entra na chave
+    dos trials. Devolve (tabela de trials, tabela de overlay), também salvas em ``out_dir``.
+    """
+    out_dir = pathlib.Path(out_dir)
+    fit, val = validation_split(train, val_frac, int(cfg["env"]["window_size"]))
+    if w_mpt is None:
+        w_mpt = pd.Series(1.0 / train[0].shape[1], index=train[0].columns)
+    prior = _prior_digest(w_mpt)
+    plan = {}
+    for params in expand_space(space, n_trials, seed):
+        tcfg = apply_params(cfg, params)
+        spec = {"sweep": params, "eval_freq": eval_freq, "prune": prune, "val_frac": val_frac, "w_mpt": prior}
+        key = fold_key(tcfg, spec, *train, *test)[:16]
+        plan[key] = (params, tcfg)
+    dirs = {key: out_dir / "trials" / key for key in plan}
+    results, pending = {}, []
+    for key, (params, tcfg) in plan.items():
+        if (dirs[key] / "result.json").exists():
+            with open(dirs[key] / "result.json") as f:
+                results[key] = json.load(f)
+        else:
+            peers = [d for k, d in dirs.items() if k != key]
+            pending.append((key, (params, tcfg, fit, val, test, w_mpt, dirs[key], peers, threads_per_trial, prune,
+                                  eval_freq)))
+    print(f"[sweep] {len(plan)} trials: {len(results)} em cache, {len(pending)} a treinar "
+          f"({n_workers} workers × {threads_per_trial} threads)")
+
+    def report(key):
+        r = results[key]
+        print(f"[sweep] {key} {r['status']:<8s} Sharpe val {r['val_Sharpe']:.3f} / teste {r['test_Sharpe']:.3f} "
+              f"| {r['params']}", flush=True)
+
+    if n_workers <= 1:
+        for key, args in pending:
+            results[key] = run_trial(*args)
+            report(key)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx,
+                                 initializer=_limit_threads, initargs=(threads_per_trial,)) as pool:
+            futures = {pool.submit(run_trial, *args): key for key, args in pending}
+            for fut in as_completed(futures):
+                key = futures[fut]
+                try:
+                    results[key] = fut.result()
+                except Exception as e:                       # um trial quebrado não derruba a varredura
+                    results[key] = {"params": plan[key][0], "status": "failed", "error": repr(e)}
+                    print(f"[sweep] {key} falhou: {e!r}", flush=True)
+                    continue
+                report(key)
+
+    rows = []
+    for key in plan:
+        r = results[key]
+        rows.append({"trial": key, "status": r["status"], **r["params"],
+                     **{k: v for k, v in r.items() if k not in ("params", "status")}})
+    trials = pd.DataFrame(rows).set_index("trial")
+    if "val_Sharpe" in trials:
+        trials = trials.sort_values("val_Sharpe", ascending=False, na_position="last", kind="stable")
+    overlay = overlay_table(trials, dirs, {k: plan[k][1] for k in plan}, {"val": val, "test": test},
+                            overlay_space or {}, w_mpt)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    trials.to_csv(out_dir / "trials.csv")
+    if not overlay.empty:
+        overlay.to_csv(out_dir / "overlay.csv", index=False)
+    return trials, overlay
+
+@stage("sweep")
+def main(argv=None):
+    ensure_dirs()
+    cfg = load_config()
+    scfg = cfg.get("sweep", {})
+    ap = argparse.ArgumentParser(description="Varredura de hiperparâmetros do PPO e de risco")
+    ap.add_argument("--trials", type=int, default=scfg.get("n_trials"))
+    ap.add_argument("-j", "--workers", type=int, default=int(scfg.get("n_workers", 1)))
+    ap.add_argument("--threads", type=int, default=int(scfg.get("threads_per_trial", 1)))
+    ap.add_argument("--no-prune", action="store_true")
+    args = ap.parse_args(argv)
+    from .env import load_prior
+    from .train_rl import load_split
+    train, test = load_split(cfg, "train"), load_split(cfg, "test")
+    trials, overlay = run_sweep(cfg, train, test, scfg.get("space", {}), scfg.get("overlay_space"),
+                                n_trials=args.trials, n_workers=args.workers, threads_per_trial=args.threads,
+                                prune=None if args.no_prune else scfg.get("prune", {}),
+                                eval_freq=scfg.get("eval_freq"), seed=int(cfg["seed"]),
+                                val_frac=float(scfg.get("val_frac", 0.2)), w_mpt=load_prior(cfg))
+    cols = [c for c in ("status", *scfg.get("space", {}), "best_eval_reward", "val_Sharpe", "test_Sharpe",
+                        "test_CAGR", "test_MaxDrawdown") if c in trials]
+    print(trials[cols].head(10).to_string(float_format=lambda x: f"{x:.4g}"))
+    if not overlay.empty:
+        print(f"[sweep] Melhores overlays (replay):\n"
+              f"{overlay.head(5).to_string(index=False, float_format=lambda x: f'{x:.4g}')}")
+    print(f"[sweep] Salvos em {SWEEP_DIR}")
+
+if __name__ == "__main__":
+    main()
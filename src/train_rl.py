@@ -1,39 +1,72 @@
 from __future__ import annotations
-import pandas as pd, numpy as np, pathlib, os
-from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv
-from stable_baselines3.common.evaluation import evaluate_policy
-from stable_baselines3.common.callbacks import EvalCallback
-from .utils import ROOT, DATA_DIR, OUT_DIR, MODELS_DIR, load_config, ensure_dirs
+import pandas as pd, numpy as np, pathlib, os, functools
+from .utils import OUT_DIR, MODELS_DIR, load_config, ensure_dirs, load_prices, load_features
 from .env import PortfolioEnv
+from .perf import stage, ppo_perf_callback
 
-def build_env(cfg, split="train"):
-    close = pd.read_csv(DATA_DIR / "prices.csv", index_col=0, parse_dates=True)
-    feats = pd.read_csv(OUT_DIR / "features.csv", index_col=0, parse_dates=True)
-    # recorte temporal
+def load_split(cfg, split="train"):
+    # recorte temporal (lido direto do store, só o trecho/ativos necessários)
     if split == "train":
         start, end = cfg["walk_forward"]["train_start"], cfg["walk_forward"]["train_end"]
     else:
         start, end = cfg["walk_forward"]["test_start"], cfg["walk_forward"]["test_end"]
-    close = close.loc[start:end].dropna(how="all").dropna(axis=1, how="any")
+    close = load_prices(start=start, end=end).dropna(how="all").dropna(axis=1, how="any")
+    feats = load_features(assets=close.columns, start=start, end=end)
+    close = close.loc[close.index.intersection(feats.index)]
     feats = feats.loc[close.index]
+    return close, feats
+
+def build_env(cfg, split="train"):
+    close, feats = load_split(cfg, split)
     env = PortfolioEnv(prices=close, features=feats, cfg=cfg, train=(split=="train"))
     return env
 
-def main():
-    ensure_dirs()
-    cfg = load_config()
+def build_vec_env(cfg, n_envs, split="train"):
+    from .vec_env import BatchedPortfolioEnv
+    close, feats = load_split(cfg, split)
+    return BatchedPortfolioEnv(close, feats, cfg, num_envs=n_envs, seed=cfg["seed"], train=(split=="train"))
 
-    def make_train(): return build_env(cfg, split="train")
-    def make_test():  return build_env(cfg, split="test")
+def build_subproc_env(cfg, n_envs, split="train", market_dir=None, start_method=None):
+    """
+    ``n_envs`` PortfolioEnv em processos separados (SubprocVecEnv). Os arrays de mercado
+    são gravados uma vez em ``market_dir`` e cada worker os abre por memmap (sem cópias).
+    """
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+    from .market import MarketData, make_market_env
+    close, feats = load_split(cfg, split)
+    path = MarketData.from_frames(close, feats).save(market_dir or OUT_DIR / "market" / split)
+    make = functools.partial(make_market_env, path, cfg, split == "train")
+    return SubprocVecEnv([make] * int(n_envs), start_method=start_method)
 
-    vec_env = DummyVecEnv([make_train])
-    eval_env = DummyVecEnv([make_test])
+def make_train_vec_env(cfg):
+    """VecEnv de treino conforme ``ppo.vec_env``: dummy | batched | subproc (auto: batched se n_envs > 1)."""
+    from stable_baselines3.common.vec_env import DummyVecEnv
+    n_envs = int(cfg["ppo"].get("n_envs", 1))
+    kind = cfg["ppo"].get("vec_env", "auto")
+    if kind == "auto":
+        kind = "batched" if n_envs > 1 else "dummy"
+    if kind == "batched":
+        return build_vec_env(cfg, n_envs)
+    if kind == "subproc":
+        return build_subproc_env(cfg, n_envs, start_method=cfg["ppo"].get("start_method"))
+    if kind != "dummy":
+        raise ValueError(f"ppo.vec_env inválido: {kind}")
+    return DummyVecEnv([functools.partial(build_env, cfg, "train")] * n_envs)
 
+def train_model(cfg, vec_env, eval_env=None, tensorboard: bool = True, best_model_dir=MODELS_DIR / "best",
+                eval_log_dir=OUT_DIR / "eval", verbose: int = 1, perf_key: str = "train_rl", eval_freq: int | None = None,
+                callback_after_eval=None, perf_path=None):
+    """
+    Cria e treina o PPO com os hiperparâmetros de ``cfg["ppo"]`` (EvalCallback se ``eval_env`` for dado,
+    a cada ``eval_freq`` passos — default ``ppo.n_steps`` — chamando ``callback_after_eval`` depois de cada avaliação).
+    Throughput do PPO vai para ``perf_path`` (default ``outputs/perf.json``) sob ``perf_key``.
+    """
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.callbacks import EvalCallback
     model = PPO(
         "MlpPolicy",
         vec_env,
-        verbose=1,
+        verbose=verbose,
         learning_rate=cfg["ppo"]["learning_rate"],
         n_steps=cfg["ppo"]["n_steps"],
         batch_size=cfg["ppo"]["batch_size"],
@@ -43,45 +76,58 @@ def main():
         ent_coef=cfg["ppo"]["ent_coef"],
         vf_coef=cfg["ppo"]["vf_coef"],
         seed=cfg["seed"],
-        tensorboard_log=str(OUT_DIR / "tb"),
+        tensorboard_log=str(OUT_DIR / "tb") if tensorboard else None,
     )
 
-    eval_callback = EvalCallback(
-        eval_env,
-        best_model_save_path=str(MODELS_DIR / "best"),
-        log_path=str(OUT_DIR / "eval"),
-        eval_freq=max(1, cfg["ppo"]["n_steps"]),
-        deterministic=True,
-        render=False,
-        n_eval_episodes=1,
-    )
+    callback = [ppo_perf_callback(perf_key, perf_path)] if cfg.get("perf", {}).get("enabled", True) else []
+    if eval_env is not None:
+        callback.append(EvalCallback(
+            eval_env,
+            best_model_save_path=str(best_model_dir) if best_model_dir else None,
+            log_path=str(eval_log_dir) if eval_log_dir else None,
+            eval_freq=max(1, int(eval_freq or cfg["ppo"]["n_steps"])),
+            deterministic=True,
+            render=False,
+            n_eval_episodes=1,
+            callback_after_eval=callback_after_eval,
+            verbose=verbose,
+        ))
+
+    model.learn(total_timesteps=int(cfg["ppo"]["total_timesteps"]), callback=callback)
+    return model
 
-    model.learn(total_timesteps=int(cfg["ppo"]["total_timesteps"]), callback=eval_callback)
+def run_episode(model, env):
+    """Roda um episódio determinístico; devolve (curva NAV/ret/turnover, pesos) indexados por data."""
+    from .rollout import evaluate_policy_batch, rollout_frames
+    res = evaluate_policy_batch(model, env)
+    return rollout_frames(res, env.idx, env.assets)
+
+@stage("train_rl")
+def main():
+    from stable_baselines3.common.vec_env import DummyVecEnv
+    from stable_baselines3.common.evaluation import evaluate_policy
+    from .policy_export import export_policy
+    ensure_dirs()
+    cfg = load_config()
+
+    def make_test():  return build_env(cfg, split="test")
+
+    vec_env = make_train_vec_env(cfg)
+    eval_env = DummyVecEnv([make_test])
+
+    model = train_model(cfg, vec_env, eval_env)
     model.save(MODELS_DIR / "ppo_synapse.zip")
+    print(f"[train_rl] Política exportada: {export_policy(model)}")
+    vec_env.close()
 
     # Avaliação rápida
     mean_reward, std_reward = evaluate_policy(model, eval_env, n_eval_episodes=1, deterministic=True)
     print(f"[train_rl] Avaliação – recompensa média: {mean_reward:.6f} ± {std_reward:.6f}")
 
     # Trajetória no conjunto de teste
-    env = make_test()
-    obs, info = env.reset()
-    navs, dates, rets, turns, weights = [], [], [], [], []
-    done = False
-    while not done:
-        action, _ = model.predict(obs, deterministic=True)
-        obs, reward, terminated, truncated, info = env.step(action)
-        done = terminated or truncated
-        dates.append(env.idx[env.t-1])
-        navs.append(info["nav"])
-        rets.append(info["return"])
-        turns.append(info["turnover"])
-        weights.append(info["weights"])
-
+    df, wdf = run_episode(model, make_test())
     OUT_DIR.mkdir(parents=True, exist_ok=True)
-    df = pd.DataFrame({"date": dates, "nav": navs, "ret": rets, "turnover": turns}).set_index("date")
     df.to_csv(OUT_DIR / "test_equity_curve.csv")
-    wdf = pd.DataFrame(weights, index=df.index, columns=env.assets)
     wdf.to_csv(OUT_DIR / "test_weights.csv")
     print(f"[train_rl] Salvos: {OUT_DIR / 'test_equity_curve.csv'}, {OUT_DIR / 'test_weights.csv'}")
 
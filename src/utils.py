@@ -29,3 +29,228 @@ def set_seed(seed: int):
     import random, numpy as np
     random.seed(seed)
     np.random.seed(seed)
+
+# ---- Armazenamento colunar (.npy + schema JSON) -----------------------------
+# Cada tabela vira um diretório com ``values.npy`` (T, C), ``index.npy`` (datas
+# em int64) e ``schema.json`` (colunas/níveis). Leituras usam memory-map e
+# aplicam filtro de colunas e de datas antes de materializar o DataFrame.
+PRICES_STORE = DATA_DIR / "prices"
+FEATURES_STORE = OUT_DIR / "features"
+MPT_PRIOR_STORE = OUT_DIR / "mpt_prior"
+
+def replace_npy(path, arr: np.ndarray):
+    """
+    ``np.save`` num temporário do mesmo diretório + ``os.replace``: quem lê (ou já
+    mapeou o arquivo antigo) nunca vê um ``.npy`` pela metade.
+    """
+    path = pathlib.Path(path)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+def replace_json(path, obj):
+    """Como ``replace_npy``, para JSON."""
+    import json
+    path = pathlib.Path(path)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+def save_frame(df: pd.DataFrame, path, csv: bool = False, dtype=np.float64) -> pathlib.Path:
+    path = pathlib.Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    multi = isinstance(df.columns, pd.MultiIndex)
+    values = np.ascontiguousarray(df.to_numpy(dtype=dtype))
+    index = pd.DatetimeIndex(df.index)
+    # dados primeiro, schema por último: o schema publicado sempre descreve arrays completos
+    replace_npy(path / "values.npy", values)
+    replace_npy(path / "index.npy", index.asi8)
+    schema = {
+        "version": 1,
+        "shape": list(values.shape),
+        "dtype": str(values.dtype),
+        "index_name": df.index.name,
+        "index_unit": index.unit,
+        "multiindex": multi,
+        "column_names": list(df.columns.names),
+        "columns": [list(c) for c in df.columns] if multi else [str(c) for c in df.columns],
+    }
+    replace_json(path / "schema.json", schema)
+    if _SHARED is not None:
+        _shared_put(path, schema, index.asi8.copy(), values.copy())
+    if csv:
+        df.to_csv(path.with_suffix(".csv"))
+    return path
+
+def load_frame(path, columns=None, start=None, end=None, mmap: bool = True) -> pd.DataFrame:
+    """
+    Lê uma tabela salva por ``save_frame``.
+
+    Args:
+        columns: colunas a carregar; em tabelas MultiIndex filtra pelo 1º nível (ativo)
+        start, end: recorte de datas inclusivo (como ``df.loc[start:end]``)
+        mmap: abre ``values.npy`` via memory-map (só as linhas/colunas pedidas são lidas)
+    """
+    path = pathlib.Path(path)
+    shared = _shared_get(path)
+    if shared is not None:
+        schema, idx, values = shared
+    else:
+        schema, idx, values = _read_store(path, mmap and _SHARED is None)
+        if _SHARED is not None:
+            _shared_put(path, schema, idx, values)
+    unit = schema.get("index_unit", "ns")
+    to_int = lambda d: pd.Timestamp(d).to_datetime64().astype(f"datetime64[{unit}]").astype(np.int64)
+    r0 = 0 if start is None else int(np.searchsorted(idx, to_int(start), side="left"))
+    r1 = len(idx) if end is None else int(np.searchsorted(idx, to_int(end), side="right"))
+    values = values[r0:r1]
+
+    cols = _schema_columns(schema)
+    if schema["multiindex"]:
+        keep = None if columns is None else np.flatnonzero(cols.get_level_values(0).isin(list(columns)))
+    else:
+        keep = None if columns is None else cols.get_indexer(list(columns))
+        if keep is not None and (keep < 0).any():
+            missing = [c for c, k in zip(columns, keep) if k < 0]
+            raise KeyError(f"Colunas ausentes em {path}: {missing}")
+    if keep is not None:
+        values, cols = values[:, keep], cols[keep]
+    if shared is not None and not mmap:
+        values = np.array(values)            # leitura "em memória" devolve cópia gravável, como sem cache
+    index = pd.DatetimeIndex(idx[r0:r1].astype(f"datetime64[{unit}]"), name=schema["index_name"])
+    return pd.DataFrame(np.asarray(values), index=index, columns=cols)
+
+def _schema_columns(schema: dict) -> pd.Index:
+    if schema["multiindex"]:
+        return pd.MultiIndex.from_tuples([tuple(c) for c in schema["columns"]], names=schema["column_names"])
+    return pd.Index(schema["columns"], name=schema["column_names"][0])
+
+def _read_store(path: pathlib.Path, mmap: bool):
+    import json
+    with open(path / "schema.json") as f:
+        schema = json.load(f)
+    return schema, np.load(path / "index.npy"), np.load(path / "values.npy", mmap_mode="r" if mmap else None)
+
+# ---- Tabelas compartilhadas em memória ----------------------------------------
+# Com ``share_frames(True)`` (CLI ``python -m src``, vários estágios num processo),
+# ``save_frame``/``load_frame`` mantêm os arrays de cada tabela na memória,
+# validados por (mtime_ns, tamanho) de ``values.npy``: o estágio seguinte lê da
+# memória, e uma tabela regravada por outro processo é relida do disco. Os arrays
+# guardados são somente leitura, como os memory-maps do caminho padrão.
+_SHARED: dict | None = None
+
+def share_frames(enabled: bool = True):
+    """Liga/desliga (e esvazia) o compartilhamento em memória das tabelas colunares."""
+    global _SHARED
+    _SHARED = {} if enabled else None
+
+def _store_sig(path: pathlib.Path):
+    try:
+        st = (path / "values.npy").stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _shared_get(path: pathlib.Path):
+    if _SHARED is None:
+        return None
+    hit = _SHARED.get(str(path.resolve()))
+    if hit is None or hit[0] != _store_sig(path):
+        return None
+    return hit[1]
+
+def _shared_put(path: pathlib.Path, schema: dict, idx: np.ndarray, values: np.ndarray):
+    idx.flags.writeable = values.flags.writeable = False
+    _SHARED[str(path.resolve())] = (_store_sig(path), (schema, idx, values))
+
+def _npy_append_header(file: pathlib.Path, rows: np.ndarray) -> bytes | None:
+    """
+    Cabeçalho de ``file`` (.npy) com ``len(rows)`` linhas a mais, do mesmo tamanho do
+    atual (o numpy reserva espaço para o eixo 0 crescer); None se não der para anexar.
+    """
+    import io
+    fmt = np.lib.format
+    with open(file, "rb") as f:
+        if fmt.read_magic(f) != (1, 0):
+            return None
+        shape, fortran, dtype = fmt.read_array_header_1_0(f)
+        header_len = f.tell()
+    if fortran or dtype != rows.dtype or tuple(shape[1:]) != rows.shape[1:]:
+        return None
+    header = io.BytesIO()
+    fmt.write_array_header_1_0(header, {"descr": fmt.dtype_to_descr(dtype), "fortran_order": False,
+                                        "shape": (shape[0] + len(rows),) + tuple(shape[1:])})
+    return header.getvalue() if len(header.getvalue()) == header_len else None
+
+def _npy_append(file: pathlib.Path, rows: np.ndarray, header: bytes):
+    # bytes no fim primeiro, cabeçalho depois: quem lê o cabeçalho antigo vê a tabela anterior inteira
+    with open(file, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        f.write(np.ascontiguousarray(rows).tobytes())
+        f.flush()
+        f.seek(0)
+        f.write(header)
+
+def append_frame(df: pd.DataFrame, path, csv: bool = False) -> pathlib.Path:
+    """
+    Anexa linhas (datas posteriores, mesmas colunas) a uma tabela salva por ``save_frame``.
+
+    I/O proporcional às linhas novas: ``values.npy``/``index.npy`` crescem no fim e
+    ``schema.json`` é regravado por último; o CSV exportado (se houver) recebe só as
+    linhas novas. Se o ``.npy`` não permitir anexar, a tabela é regravada inteira.
+    """
+    import json
+    path = pathlib.Path(path)
+    with open(path / "schema.json") as f:
+        schema = json.load(f)
+    if not df.columns.equals(_schema_columns(schema)):
+        raise ValueError(f"Colunas de {path} não coincidem com as linhas a anexar")
+    unit = schema.get("index_unit", "ns")
+    old_idx = np.load(path / "index.npy", mmap_mode="r")
+    new_idx = pd.DatetimeIndex(df.index).as_unit(unit).asi8
+    if len(old_idx) and len(df) and new_idx[0] <= old_idx[-1]:
+        last = pd.Timestamp(np.datetime64(int(old_idx[-1]), unit))
+        raise ValueError(f"Datas a anexar em {path} devem ser posteriores a {last}")
+    del old_idx
+    csv_path = path.with_suffix(".csv")
+    existed = csv_path.exists()
+    values = np.ascontiguousarray(df.to_numpy(dtype=schema["dtype"]))
+    headers = (_npy_append_header(path / "values.npy", values), _npy_append_header(path / "index.npy", new_idx))
+    if None in headers:
+        save_frame(pd.concat([load_frame(path, mmap=False), df]), path, dtype=schema["dtype"])
+    else:
+        _npy_append(path / "values.npy", values, headers[0])
+        _npy_append(path / "index.npy", new_idx, headers[1])
+        schema["shape"] = [schema["shape"][0] + len(df)] + schema["shape"][1:]
+        replace_json(path / "schema.json", schema)
+    if csv and existed:
+        df.to_csv(csv_path, mode="a", header=False)
+    elif csv:
+        load_frame(path, mmap=False).to_csv(csv_path)
+    return path
+
+def _load_store_or_csv(store, csv_path, header, columns, start, end) -> pd.DataFrame:
+    if (pathlib.Path(store) / "schema.json").exists():
+        return load_frame(store, columns=columns, start=start, end=end)
+    # compatibilidade com pipelines antigos que só geraram CSV
+    df = pd.read_csv(csv_path, index_col=0, header=header, parse_dates=True).loc[start:end]
+    if columns is not None:
+        if isinstance(df.columns, pd.MultiIndex):
+            df = df.loc[:, df.columns.get_level_values(0).isin(list(columns))]
+        else:
+            df = df[list(columns)]
+    return df
+
+def save_prices(close: pd.DataFrame, csv: bool = False):
+    return save_frame(close, PRICES_STORE, csv=csv)
+
+def save_features(feats: pd.DataFrame, csv: bool = False):
+    return save_frame(feats, FEATURES_STORE, csv=csv)
+
+def load_prices(columns=None, start=None, end=None) -> pd.DataFrame:
+    return _load_store_or_csv(PRICES_STORE, DATA_DIR / "prices.csv", 0, columns, start, end)
+
+def load_features(assets=None, start=None, end=None) -> pd.DataFrame:
+    return _load_store_or_csv(FEATURES_STORE, OUT_DIR / "features.csv", [0, 1], assets, start, end)
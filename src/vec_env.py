@@ -0,0 +1,97 @@
+from __future__ import annotations
+import numpy as np
+from time import perf_counter_ns
+from stable_baselines3.common.vec_env import VecEnv
+from .batch import BatchedPortfolio
+
+class BatchedPortfolioEnv(BatchedPortfolio, VecEnv):
+    """
+    ``BatchedPortfolio`` como VecEnv do SB3 para treino: cada episódio começa num
+    offset aleatório da janela de treino e é resetado automaticamente ao terminar
+    (``terminal_observation`` no info). Argumentos iguais aos de ``BatchedPortfolio``.
+    """
+
+    render_mode = None
+    _ROW_STATE = BatchedPortfolio._PER_ENV + ("max_steps",)
+
+    def __init__(self, *args, **kwargs):
+        BatchedPortfolio.__init__(self, *args, **kwargs)
+        self._actions = None
+        VecEnv.__init__(self, self.num_envs, self.observation_space, self.action_space)
+
+    # ---- API VecEnv ---------------------------------------------------------
+    def reset(self):
+        seeds = [s for s in self._seeds if s is not None]
+        if seeds:
+            self._rng = np.random.default_rng(seeds[0])
+        self._reset_rows(self._rows)
+        self._reset_seeds()
+        self._reset_options()
+        return self._get_obs()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions, dtype=float).reshape(self.num_envs, self.n)
+
+    def step_wait(self):
+        reward, turnover, r_t, cost = self.advance(self._actions)
+        dones = ~self.live()
+        c0 = perf_counter_ns()
+        obs = self._get_obs()
+        self.timings["obs"] += perf_counter_ns() - c0
+        infos = [{"nav": float(self.nav[i]), "turnover": float(turnover[i]), "return": float(r_t[i]),
+                  "cost": float(cost[i])} for i in range(self.num_envs)]
+        if self.autoreset and dones.any():
+            for i in np.flatnonzero(dones):
+                infos[i]["terminal_observation"] = obs[i].copy()
+                infos[i]["TimeLimit.truncated"] = bool(self.bootstrap or self.t[i] < self.T)
+                infos[i]["weights"] = self.w[i].copy()
+            self._reset_rows(dones)
+            obs[dones] = self._get_obs()[dones]
+        return obs, reward.astype(np.float32), dones, infos
+
+    def close(self) -> None:
+        pass
+
+    def _indices(self, indices):
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
+
+    def get_attr(self, attr_name: str, indices=None) -> list:
+        if attr_name in self._PER_ENV:
+            arr = getattr(self, attr_name)
+            return [arr[i] for i in self._indices(indices)]
+        return [getattr(self, attr_name) for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value, indices=None) -> None:
+        if attr_name in self._PER_ENV:
+            getattr(self, attr_name)[list(self._indices(indices))] = value
+        else:
+            setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list:
+        """
+        Chama ``method_name`` no env base com o estado da linha carregado (t, NAV, pesos, cenário);
+        o que o método alterar volta para a linha. O estado próprio do env base é restaurado no fim.
+        """
+        base, out = self.base, []
+        saved = {k: getattr(base, k) for k in self._ROW_STATE + ("done", "_ret_arr", "_feat_arr")}
+        try:
+            for i in self._indices(indices):
+                for k in self._ROW_STATE:
+                    v = getattr(self, k)[i]
+                    setattr(base, k, v.copy() if k == "w" else v.item())
+                base.done = not self.live()[i]
+                base._ret_arr, base._feat_arr = self._ret_arr[i], self._feat_arr[i]
+                out.append(getattr(base, method_name)(*method_args, **method_kwargs))
+                for k in self._ROW_STATE:
+                    getattr(self, k)[i] = getattr(base, k)
+        finally:
+            for k, v in saved.items():
+                setattr(base, k, v)
+        return out
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list:
+        return [False for _ in self._indices(indices)]
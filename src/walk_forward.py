@@ -0,0 +1,201 @@
+from __future__ import annotations
+import os, sys, json, hashlib, pathlib, multiprocessing
+import numpy as np, pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from .utils import OUT_DIR, ensure_dirs, load_config, load_prices, load_features, save_frame, load_frame
+from .perf import stage
+
+WF_DIR = OUT_DIR / "walk_forward"
+# seções do config que mudam o resultado de um fold (entram no hash do cache)
+_CFG_KEYS = ("seed", "risk", "risk_overlay", "env", "mpt", "ppo")
+
+def make_folds(index: pd.DatetimeIndex, mode: str = "expanding", train_months: int = 36,
+               test_months: int = 6, step_months: int | None = None) -> list[dict]:
+    """
+    Folds walk-forward sobre ``index``.
+
+    ``expanding``: treino sempre começa no início dos dados; ``rolling``: treino
+    com janela fixa de ``train_months``. O teste cobre os ``test_months`` seguintes
+    e cada fold avança ``step_months`` (default = ``test_months``).
+    """
+    if mode not in ("expanding", "rolling"):
+        raise ValueError(f"walk_forward.folds.mode inválido: {mode}")
+    step = pd.DateOffset(months=int(step_months or test_months))
+    first, last = index[0], index[-1]
+    test_start = first + pd.DateOffset(months=int(train_months))
+    folds = []
+    while test_start <= last:
+        test_end = min(test_start + pd.DateOffset(months=int(test_months)) - pd.Timedelta(days=1), last)
+        train_start = first if mode == "expanding" else test_start - pd.DateOffset(months=int(train_months))
+        folds.append({
+            "fold": len(folds),
+            "train_start": str(train_start.date()),
+            "train_end": str((test_start - pd.Timedelta(days=1)).date()),
+            "test_start": str(test_start.date()),
+            "test_end": str(test_end.date()),
+        })
+        test_start = test_start + step
+    return folds
+
+def _slice(close, feats, start, end, warmup: int = 0, assets=None):
+    """Recorte [start, end] com ``warmup`` linhas anteriores (janela de observação do env)."""
+    i0 = max(0, int(close.index.searchsorted(pd.Timestamp(start))) - warmup)
+    i1 = int(close.index.searchsorted(pd.Timestamp(end), side="right"))
+    c = close.iloc[i0:i1]
+    if assets is None:
+        c = c.dropna(how="all").dropna(axis=1, how="any")
+    else:
+        c = c[list(assets)].ffill().dropna()
+    f = feats.loc[:, feats.columns.get_level_values(0).isin(c.columns)]
+    idx = c.index.intersection(f.index)
+    return c.loc[idx], f.loc[idx]
+
+def fold_key(cfg: dict, fold: dict, *frames) -> str:
+    """Hash do config relevante + datas do fold + conteúdo das fatias de dados."""
+    h = hashlib.sha256()
+    h.update(json.dumps({k: cfg.get(k) for k in _CFG_KEYS}, sort_keys=True, default=str).encode())
+    h.update(json.dumps({k: v for k, v in fold.items() if k != "fold"}, sort_keys=True).encode())
+    for df in frames:
+        h.update(pd.DatetimeIndex(df.index).asi8.tobytes())
+        h.update(json.dumps([list(map(str, c)) if isinstance(c, tuple) else str(c) for c in df.columns]).encode())
+        h.update(np.ascontiguousarray(df.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+def _limit_threads(threads: int):
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+def fold_priors(cfg: dict, trains: list[pd.DataFrame]) -> list[pd.Series]:
+    """
+    Prior MPT (perfil do config) de cada janela de treino, numa chamada de
+    ``frontier_weights`` por grupo de janelas com o mesmo início e ativos (no modo
+    expanding, todos os folds): a covariância é atualizada incrementalmente e o
+    solver é montado uma vez por número de ativos.
+    """
+    from .frontier import FrontierSolver, frontier_weights
+    cash_sym = cfg["universe"].get("cash_symbol", "CASH")
+    rcfg, profile = cfg["risk"], cfg["mpt"]["profile"]
+    groups, solvers = {}, {}
+    for k, close in enumerate(trains):
+        cols = tuple(c for c in close.columns if c != cash_sym)
+        groups.setdefault((close.index[0], cols), []).append(k)
+    out = [None] * len(trains)
+    for (_, cols), ks in groups.items():
+        longest = max((trains[k] for k in ks), key=len)
+        if len(cols) not in solvers:
+            solvers[len(cols)] = FrontierSolver(len(cols), float(rcfg["min_weight"]), float(rcfg["max_weight"]),
+                                                float(cfg["mpt"].get("l2_reg", 0.001)), float(rcfg["risk_free_rate"]))
+        dates = [trains[k].index[-1] for k in ks]
+        W = frontier_weights(longest[list(cols)], cfg, dates, profiles=[profile], solver=solvers[len(cols)])
+        for d, k in enumerate(ks):
+            out[k] = pd.Series(W[d, 0], index=list(cols)).reindex(trains[k].columns).fillna(0.0)
+    return out
+
+def run_fold(fold: dict, cfg: dict, train: tuple, test: tuple, out_dir, threads: int = 1,
+             w0: pd.Series | None = None) -> str:
+    """
+    Treina prior MPT + PPO no treino do fold e roda o teste fora da amostra; salva em ``out_dir``.
+    ``w0`` é o prior já calculado (ver ``fold_priors``); sem ele, ``mpt_prior`` no treino.
+    """
+    _limit_threads(threads)
+    import torch
+    torch.set_num_threads(threads)
+    from stable_baselines3.common.vec_env import DummyVecEnv
+    from .env import PortfolioEnv
+    from .mpt import mpt_prior
+    from .train_rl import train_model, run_episode
+
+    (close_tr, feats_tr), (close_te, feats_te) = train, test
+    if w0 is None:
+        w0 = mpt_prior(close_tr, cfg)
+    n_envs = int(cfg["ppo"].get("n_envs", 1))
+    if n_envs > 1:
+        from .vec_env import BatchedPortfolioEnv
+        vec = BatchedPortfolioEnv(close_tr, feats_tr, cfg, num_envs=n_envs, seed=cfg["seed"], w_mpt=w0)
+    else:
+        vec = DummyVecEnv([lambda: PortfolioEnv(prices=close_tr, features=feats_tr, cfg=cfg, w_mpt=w0)])
+    out_dir = pathlib.Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    model = train_model(cfg, vec, tensorboard=False, verbose=0, perf_key=f"walk_forward/fold_{fold['fold']}",
+                        perf_path=out_dir / "perf.json")
+    eq, wdf = run_episode(model, PortfolioEnv(prices=close_te, features=feats_te, cfg=cfg, train=False, w_mpt=w0))
+
+    save_frame(eq, out_dir / "equity")
+    save_frame(wdf, out_dir / "weights")
+    w0.to_csv(out_dir / "mpt_weights.csv", header=["weight"])
+    model.save(out_dir / "model.zip")
+    with open(out_dir / "fold.json", "w") as f:
+        json.dump(fold, f, indent=2)
+    return str(out_dir)
+
+def stitch(results: list[tuple[dict, pd.DataFrame]]) -> pd.DataFrame:
+    """Encadeia as curvas fora da amostra numa NAV contínua (sobreposições ficam com o fold seguinte)."""
+    results = sorted(results, key=lambda r: r[0]["test_start"])
+    parts = []
+    for k, (fold, eq) in enumerate(results):
+        if k + 1 < len(results):
+            eq = eq.loc[eq.index < pd.Timestamp(results[k + 1][0]["test_start"])]
+        if eq.empty:
+            continue
+        net = eq["nav"].pct_change()
+        net.iloc[0] = eq["nav"].iloc[0] - 1.0
+        parts.append(pd.DataFrame({"ret_net": net, "ret": eq["ret"], "turnover": eq["turnover"], "fold": fold["fold"]}))
+    out = pd.concat(parts)
+    out.insert(0, "nav", (1.0 + out["ret_net"]).cumprod())
+    out.index.name = "date"
+    return out
+
+def run_walk_forward(cfg: dict, close: pd.DataFrame, feats: pd.DataFrame, folds: list[dict], out_dir=WF_DIR,
+                     n_workers: int = 1, threads_per_fold: int = 1) -> pd.DataFrame:
+    """Roda os folds (em paralelo num process pool), pulando os que já estão no cache, e costura o OOS."""
+    out_dir = pathlib.Path(out_dir)
+    warmup = int(cfg["env"]["window_size"])
+    pending, done = [], {}
+    for fold in folds:
+        train = _slice(close, feats, fold["train_start"], fold["train_end"])
+        test = _slice(close, feats, fold["test_start"], fold["test_end"], warmup=warmup, assets=train[0].columns)
+        key = fold_key(cfg, fold, *train, *test)
+        fold_dir = out_dir / "cache" / key[:16]
+        if (fold_dir / "fold.json").exists():
+            done[fold["fold"]] = fold_dir
+        else:
+            pending.append((fold, cfg, train, test, fold_dir, threads_per_fold))
+    print(f"[walk_forward] {len(folds)} folds: {len(done)} em cache, {len(pending)} a treinar")
+    if pending:
+        priors = fold_priors(cfg, [args[2][0] for args in pending])
+        pending = [args + (w0,) for args, w0 in zip(pending, priors)]
+
+    if n_workers <= 1:
+        for args in pending:
+            done[args[0]["fold"]] = pathlib.Path(run_fold(*args))
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx,
+                                 initializer=_limit_threads, initargs=(threads_per_fold,)) as pool:
+            futures = {pool.submit(run_fold, *args): args[0] for args in pending}
+            for fut, fold in futures.items():
+                done[fold["fold"]] = pathlib.Path(fut.result())
+                print(f"[walk_forward] fold {fold['fold']} concluído ({fold['test_start']} → {fold['test_end']})")
+
+    results = [(fold, load_frame(done[fold["fold"]] / "equity", mmap=False)) for fold in folds]
+    return stitch(results)
+
+@stage("walk_forward")
+def main():
+    ensure_dirs()
+    cfg = load_config()
+    fcfg = cfg["walk_forward"].get("folds", {})
+    close, feats = load_prices(), load_features()
+    folds = make_folds(feats.index, mode=fcfg.get("mode", "expanding"), train_months=fcfg.get("train_months", 36),
+                       test_months=fcfg.get("test_months", 6), step_months=fcfg.get("step_months"))
+    curve = run_walk_forward(cfg, close, feats, folds, n_workers=int(fcfg.get("n_workers", 1)),
+                             threads_per_fold=int(fcfg.get("threads_per_fold", 1)))
+    curve.to_csv(OUT_DIR / "walk_forward_equity.csv")
+    with open(OUT_DIR / "walk_forward_folds.json", "w") as f:
+        json.dump(folds, f, indent=2)
+    print(f"[walk_forward] Salvos: {OUT_DIR / 'walk_forward_equity.csv'}, {OUT_DIR / 'walk_forward_folds.json'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import numpy as np, pandas as pd, pytest
+from src.features import make_features
+from src.utils import load_config
+
+@pytest.fixture
+def toy_market():
+    """Preços sintéticos (4 ativos + CASH), features e config para testes offline (sem gravar perf.json)."""
+    rng = np.random.default_rng(0)
+    T, n = 200, 4
+    idx = pd.bdate_range("2020-01-01", periods=T)
+    close = pd.DataFrame(100 * np.cumprod(1 + rng.normal(0, 0.01, (T, n)), axis=0),
+                         index=idx, columns=[f"A{i}" for i in range(n)])
+    close["CASH"] = 1.0
+    feats = make_features(close)
+    close = close.loc[feats.index]
+    cfg = load_config()
+    cfg["perf"]["enabled"] = False
+    return close, feats, cfg
+
+@pytest.fixture
+def toy_prior(toy_market):
+    """Prior MPT explícito (pesos iguais fora do CASH): envs de teste não leem outputs/."""
+    close = toy_market[0]
+    w = pd.Series(1.0, index=close.columns)
+    w["CASH"] = 0.0
+    return w / w.sum()
@@ -0,0 +1,13 @@
+from benchmarks.suite import run_suite, compare, case_key
+
+def test_suite_runs_and_flags_regressions():
+    res = run_suite(["env_reset", "projection", "evaluate_metrics"], sizes=(5,), days=(300,), repeat=1, verbose=False)
+    assert set(res) == {case_key(c, 5, 300) for c in ("env_reset", "projection", "evaluate_metrics")}
+    assert all(r["sec_per_op"] > 0 for r in res.values())
+
+    key = case_key("projection", 5, 300)
+    slow = {key: {**res[key], "sec_per_op": res[key]["sec_per_op"] * 3}}
+    cmp = compare(slow, res, tolerance=0.5)
+    assert list(cmp.index) == [key] and bool(cmp.loc[key, "regression"])
+    assert not compare(res, res, tolerance=0.5)["regression"].any()
+    assert compare(res, {}, tolerance=0.5).empty
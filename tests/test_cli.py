@@ -0,0 +1,38 @@
+import os, numpy as np, pandas as pd, pytest
+from src import utils
+from src.__main__ import resolve, run_stages
+from benchmarks.bench_import import probe
+
+def test_resolve_orders_by_dag_and_accepts_aliases():
+    assert resolve(["evaluate", "benchmark", "data", "train_rl", "benchmark"]) == ["data", "train", "benchmark", "report"]
+    with pytest.raises(SystemExit):
+        resolve(["nope"])
+
+def test_shared_frames_follow_file_changes(tmp_path):
+    df = pd.DataFrame(np.arange(12.0).reshape(6, 2), index=pd.bdate_range("2021-01-01", periods=6), columns=["a", "b"])
+    utils.share_frames(True)
+    try:
+        utils.save_frame(df, tmp_path / "t")
+        got = utils.load_frame(tmp_path / "t", columns=["b"], start="2021-01-04")
+        pd.testing.assert_frame_equal(got, df.loc["2021-01-04":, ["b"]], check_freq=False)
+        own = utils.load_frame(tmp_path / "t", mmap=False)
+        own.iloc[0, 0] = -1.0                                   # cópia própria; a compartilhada não muda
+        assert utils.load_frame(tmp_path / "t")["a"].iloc[0] == 0.0
+        # regravado por fora (outro processo): a assinatura muda e a tabela é relida
+        np.save(tmp_path / "t" / "values.npy", df.to_numpy() * 10 + 0.5)
+        os.utime(tmp_path / "t" / "values.npy", ns=(1, 1))
+        assert utils.load_frame(tmp_path / "t")["a"].iloc[0] == 0.5
+    finally:
+        utils.share_frames(False)
+    assert utils._SHARED is None
+
+def test_run_stages_shares_frames_in_process(monkeypatch):
+    import src.benchmark
+    seen = []
+    monkeypatch.setattr(src.benchmark, "main", lambda: seen.append(utils._SHARED is not None))
+    assert list(run_stages(["benchmark"])) == ["benchmark"] and seen == [True]
+    assert utils._SHARED is None
+
+@pytest.mark.parametrize("module", ["src.benchmark", "src.evaluate", "src.mpt", "src.backtest"])
+def test_quick_stage_imports_stay_light(module):
+    assert probe(module)["heavy"] == []
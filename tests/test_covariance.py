@@ -0,0 +1,58 @@
+import numpy as np, pandas as pd, pytest
+from pypfopt import risk_models, expected_returns
+from src.covariance import SampleCov, LedoitWolfCov, EWMACov, FactorCov, CovEstimator, estimate, price_anchor
+
+@pytest.fixture
+def close():
+    rng = np.random.default_rng(0)
+    idx = pd.bdate_range("2020-01-01", periods=260)
+    rets = rng.normal(0.0004, 0.01, (260, 6)) + rng.normal(0, 0.008, (260, 1))
+    return pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=idx, columns=list("ABCDEF"))
+
+def test_estimators_match_references(close):
+    S = SampleCov(close.columns).update_prices(close)
+    np.testing.assert_allclose(S.cov(), risk_models.sample_cov(close), rtol=1e-8)
+    np.testing.assert_allclose(S.mean(), expected_returns.mean_historical_return(close), rtol=1e-8)
+    lw = LedoitWolfCov(close.columns).update_prices(close)
+    ref = risk_models.CovarianceShrinkage(close).ledoit_wolf()
+    np.testing.assert_allclose(lw.cov(), ref, rtol=1e-6)
+    ew = EWMACov(close.columns, halflife=20).update_prices(close)
+    rets = close.pct_change().iloc[1:]
+    ref = rets.ewm(halflife=20).cov(bias=True).loc[rets.index[-1]] * 252
+    np.testing.assert_allclose(ew.cov(), ref, rtol=1e-8)
+    f = FactorCov(close.columns, n_factors=2).update_prices(close).cov().to_numpy()
+    assert np.linalg.eigvalsh(f).min() > 0
+
+@pytest.mark.parametrize("cls", [SampleCov, LedoitWolfCov, EWMACov])
+def test_incremental_update_and_cache(close, cls, tmp_path):
+    full = cls(close.columns).update_prices(close)
+    est = cls(close.columns).update_prices(close.iloc[:150])
+    est.save(tmp_path / "cov.npz")
+    with np.load(tmp_path / "cov.npz") as st:
+        est = CovEstimator.from_state(st, **est.params)
+    est.update_prices(close)
+    np.testing.assert_allclose(est.cov(), full.cov(), rtol=1e-8)
+    assert est.n == full.n and est.last_date == close.index[-1]
+
+def test_estimate_resumes_from_cache(close, tmp_path):
+    cfg = {"mpt": {"covariance": {"method": "ledoit_wolf"}}}
+    path = tmp_path / "cov.npz"
+    estimate(close.iloc[:200], cfg, path=path)
+    est = estimate(close, cfg, path=path)
+    np.testing.assert_allclose(est.cov(), LedoitWolfCov(close.columns).update_prices(close).cov(), rtol=1e-8)
+    # histórico com outro início: o cache é descartado
+    est = estimate(close.iloc[10:], cfg, path=path)
+    assert est.first_date == close.index[10]
+
+def test_estimate_recomputes_when_history_is_readjusted(close, tmp_path):
+    cfg = {"mpt": {"covariance": {"method": "sample"}}}
+    path = tmp_path / "cov.npz"
+    estimate(close.iloc[:200], cfg, path=path)
+    # provento: preços anteriores a uma data reajustados (download novo do histórico inteiro)
+    adj = close.copy()
+    adj.loc[: close.index[120], "A"] *= 0.95
+    est = estimate(adj, cfg, path=path)
+    ref = SampleCov(adj.columns).update_prices(adj)
+    np.testing.assert_allclose(est.cov(), ref.cov(), rtol=1e-8)
+    with np.load(path) as st:
+        assert str(st["anchor"]) == price_anchor(adj, adj.index[-1])
@@ -0,0 +1,48 @@
+import json, os, numpy as np, pandas as pd
+from src import dashboard_data as dd
+from src.utils import save_frame
+
+def _equity(n, seed=0):
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range("1995-01-02", periods=n, name="date")
+    ret = rng.normal(0.0003, 0.01, n)
+    return pd.DataFrame({"nav": np.cumprod(1 + ret), "ret": ret, "turnover": rng.uniform(0, 0.1, n)}, index=idx)
+
+def test_lttb_keeps_endpoints_and_extremes():
+    eq = _equity(10_000)
+    idx = dd.lttb(np.arange(10_000), eq["nav"].to_numpy(), 500)
+    assert len(idx) == 500 and idx[0] == 0 and idx[-1] == 9_999 and np.all(np.diff(idx) > 0)
+    dd_series = (eq["nav"] / eq["nav"].cummax() - 1).to_frame("RL")
+    small = dd.downsample(dd_series, 500)
+    assert len(small) <= 502 and small["RL"].min() == dd_series["RL"].min()
+
+def test_runs_cached_by_mtime(tmp_path):
+    eq = _equity(3_000)
+    eq.to_csv(tmp_path / "test_equity_curve.csv")
+    eq[["nav"]].rename(columns={"nav": "EW"}).to_csv(tmp_path / "benchmarks.csv")
+    (tmp_path / "runs" / "old").mkdir(parents=True)
+    _equity(500, seed=1).to_csv(tmp_path / "runs" / "old" / "test_equity_curve.csv")
+    fold_dir = tmp_path / "walk_forward" / "cache" / "abcdef0123456789"
+    save_frame(_equity(300, seed=2), fold_dir / "equity")
+    with open(fold_dir / "fold.json", "w") as f:
+        json.dump({"fold": 0, "test_start": "1995-01-02", "test_end": "1996-03-01"}, f)
+
+    runs = dd.discover_runs(tmp_path)
+    assert [r["kind"] for r in runs] == ["run", "run", "fold"]
+    cur = runs[0]
+    assert cur["weights"] is None and cur["benchmarks"] is not None
+
+    nav = dd.chart_data(cur, "nav", 400)
+    assert list(nav.columns) == ["RL", "EW"] and len(nav) <= 404
+    assert dd.chart_data(cur, "nav", 400) is nav                 # cache
+    win = dd.chart_data(cur, "drawdown", 400, "1996-01-01", "1996-12-31")
+    assert win.index.min() >= pd.Timestamp("1996-01-01") and win.index.max() <= pd.Timestamp("1996-12-31")
+
+    eq2 = eq.assign(nav=eq["nav"] * 2)
+    eq2.to_csv(tmp_path / "test_equity_curve.csv")
+    os.utime(tmp_path / "test_equity_curve.csv", ns=(1, 1))      # mtime diferente → relê
+    assert np.isclose(dd.nav_panel(cur)["RL"].iloc[-1], eq2["nav"].iloc[-1])
+
+    both = dd.compare_runs(runs[:2], 300)
+    assert list(both.columns) == [runs[0]["name"], runs[1]["name"]]
+    assert dd.series_chart(runs[2], "turnover", 100).shape[1] == 1
@@ -0,0 +1,120 @@
+import numpy as np, pandas as pd
+from src.data import LocalFileProvider, download_prices, fetch_prices, _read_cache
+
+class CountingProvider(LocalFileProvider):
+    def __init__(self, root):
+        super().__init__(root)
+        self.calls = []
+
+    def fetch(self, tickers, start, end, interval):
+        self.calls.append((tuple(tickers), start, end))
+        return super().fetch(tickers, start, end, interval)
+
+def _write_local(root, tickers, days=300):
+    idx = pd.bdate_range("2020-01-01", periods=days)
+    rng = np.random.default_rng(0)
+    for t in tickers:
+        s = pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.01, days)), index=idx, name="close")
+        s.index.name = "date"
+        s.to_csv(root / f"{t}.csv")
+    return idx
+
+def test_cache_fetches_only_missing_ranges(tmp_path):
+    src, cache = tmp_path / "src", tmp_path / "cache"
+    src.mkdir()
+    tickers = ["AAA", "BBB", "CCC"]
+    idx = _write_local(src, tickers)
+    prov = CountingProvider(src)
+    first = download_prices(tickers, "2020-01-01", "2020-06-01", "1d", prov, cache_dir=cache, chunk_size=2, backoff=0)
+    assert len(prov.calls) == 2  # 3 tickers em lotes de 2
+    prov.calls.clear()
+    again = download_prices(tickers, "2020-01-01", "2020-06-01", "1d", prov, cache_dir=cache)
+    assert prov.calls == []
+    pd.testing.assert_frame_equal(first, again, check_freq=False)
+    ext = download_prices(tickers, "2020-01-01", "2020-09-01", "1d", prov, cache_dir=cache)
+    assert prov.calls == [(tuple(tickers), "2020-05-29", "2020-09-01")]  # inclui o último bar do cache (âncora)
+    expected = pd.read_csv(src / "BBB.csv", index_col=0, parse_dates=True)["close"].loc[:"2020-08-31"]
+    np.testing.assert_allclose(ext["BBB"].to_numpy(), expected.to_numpy())
+
+def test_fetch_prices_offline(tmp_path):
+    _write_local(tmp_path, ["AAA", "BBB"])
+    cfg = {"universe": {"tickers": ["AAA", "BBB", "ZZZ", "CASH"], "start_date": "2020-01-01",
+                        "end_date": "2020-12-31", "frequency": "1d", "cash_symbol": "CASH"},
+           "data": {"provider": "local", "local_path": str(tmp_path), "backoff": 0}}
+    close = fetch_prices(cfg, cache_dir=tmp_path / "cache")
+    assert list(close.columns) == ["AAA", "BBB", "CASH"]
+    assert not close.isna().any().any()
+
+def test_adjustment_change_refetches_full_history(tmp_path):
+    src, cache = tmp_path / "src", tmp_path / "cache"
+    src.mkdir()
+    _write_local(src, ["AAA", "BBB"])
+    prov = CountingProvider(src)
+    download_prices(["AAA", "BBB"], "2020-01-01", "2020-06-01", "1d", prov, cache_dir=cache)
+    # provento em AAA: o provedor passa a devolver todo o histórico reajustado
+    raw = pd.read_csv(src / "AAA.csv", index_col=0, parse_dates=True)
+    (raw * 0.9).to_csv(src / "AAA.csv")
+    prov.calls.clear()
+    ext = download_prices(["AAA", "BBB"], "2020-01-01", "2020-09-01", "1d", prov, cache_dir=cache)
+    assert prov.calls == [(("AAA", "BBB"), "2020-05-29", "2020-09-01"), (("AAA",), "2020-01-01", "2020-09-01")]
+    np.testing.assert_allclose(ext["AAA"].to_numpy(), raw["close"].loc[:"2020-08-31"].to_numpy() * 0.9)
+    s, cov = _read_cache(cache, "AAA")
+    np.testing.assert_allclose(s.to_numpy(), raw["close"].loc[:"2020-08-31"].to_numpy() * 0.9)
+
+def test_empty_download_retries_and_skips_coverage(tmp_path):
+    src, cache = tmp_path / "src", tmp_path / "cache"
+    src.mkdir()
+    _write_local(src, ["AAA"])
+
+    class Flaky(CountingProvider):
+        def fetch(self, tickers, start, end, interval):
+            df = super().fetch(tickers, start, end, interval)
+            if len(self.calls) == 1:
+                df["AAA"] = np.nan          # yfinance devolve NaN em vez de levantar erro
+            df["ZZZ"] = np.nan
+            return df
+
+    prov = Flaky(src)
+    out = download_prices(["AAA", "ZZZ"], "2020-01-01", "2020-06-01", "1d", prov, cache_dir=cache,
+                          retries=2, backoff=0)
+    assert [c[0] for c in prov.calls] == [("AAA", "ZZZ"), ("AAA", "ZZZ"), ("ZZZ",)]   # retry só do que faltou
+    assert out["AAA"].notna().all() and out["ZZZ"].isna().all()
+    assert _read_cache(cache, "AAA")[1] is not None and _read_cache(cache, "ZZZ") == (None, None)
+
+def test_coverage_stops_at_last_bar_when_end_is_in_the_future(tmp_path):
+    src, cache = tmp_path / "src", tmp_path / "cache"
+    src.mkdir()
+    idx = _write_local(src, ["AAA"], days=300)
+    end = str((pd.Timestamp.today() + pd.Timedelta(days=30)).date())
+    prov = CountingProvider(src)
+    download_prices(["AAA"], "2020-01-01", end, "1d", prov, cache_dir=cache)
+    assert _read_cache(cache, "AAA")[1][1] == idx[-1] + pd.Timedelta(days=1)     # não até ``end``
+    # o provedor publica barras novas: a próxima rodada busca a partir do último bar em cache
+    _write_local(src, ["AAA"], days=320)
+    prov.calls.clear()
+    out = download_prices(["AAA"], "2020-01-01", end, "1d", prov, cache_dir=cache)
+    assert prov.calls == [(("AAA",), str(idx[-1].date()), end)] and len(out) == 320
+
+def test_non_thread_safe_provider_runs_one_batch_at_a_time(tmp_path):
+    import threading, time
+    src = tmp_path / "src"
+    src.mkdir()
+    _write_local(src, ["AAA", "BBB", "CCC"])
+
+    class Serial(LocalFileProvider):
+        thread_safe = False
+        active = peak = 0
+        lock = threading.Lock()
+
+        def fetch(self, tickers, start, end, interval):
+            with self.lock:
+                Serial.active += 1
+                Serial.peak = max(Serial.peak, Serial.active)
+            time.sleep(0.02)
+            with self.lock:
+                Serial.active -= 1
+            return super().fetch(tickers, start, end, interval)
+
+    out = download_prices(["AAA", "BBB", "CCC"], "2020-01-01", "2020-06-01", "1d", Serial(src),
+                          cache_dir=tmp_path / "cache", chunk_size=1, max_workers=3)
+    assert Serial.peak == 1 and out.notna().all().all()
@@ -0,0 +1,47 @@
+import numpy as np, pandas as pd
+from src.engine import run_backtest, rebalance_mask, env_cost_bps, schedule_weights
+from src.env import PortfolioEnv
+
+def test_matches_portfolio_env(toy_market, toy_prior):
+    close, feats, cfg = toy_market
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=toy_prior)
+    env.reset()
+    rng = np.random.default_rng(0)
+    navs, weights, done = [], [], False
+    while not done:
+        _, _, done, _, info = env.step(rng.uniform(-1, 1, env.n))
+        navs.append(info["nav"]); weights.append(info["weights"])
+    R = env.returns.iloc[env.window:]
+    res = run_backtest(R, np.array(weights), w0=env.w_mpt, cost_bps=env_cost_bps(cfg), drift=False)
+    np.testing.assert_allclose(res["nav"].to_numpy(), navs, rtol=1e-10)
+
+def test_buy_and_hold_drift(toy_market):
+    close, _, _ = toy_market
+    R = close.pct_change().fillna(0.0)
+    w = np.full(close.shape[1], 1.0 / close.shape[1])
+    res = run_backtest(R, np.tile(w, (len(R), 1)), rebalance=np.arange(len(R)) == 0, cost_bps=10)
+    expected = (close / close.iloc[0]).to_numpy() @ w
+    np.testing.assert_allclose(res["nav"].to_numpy(), expected, rtol=1e-10)
+    assert res["turnover"].iloc[1:].eq(0).all()
+
+def test_batched_variants_match_single(toy_market):
+    close, _, _ = toy_market
+    R = close.pct_change().fillna(0.0).to_numpy()
+    rng = np.random.default_rng(1)
+    W = rng.dirichlet(np.ones(R.shape[1]), size=(3, len(R)))
+    reb = np.stack([rebalance_mask(close.index, f) for f in ("D", "W", "M")])
+    batch = run_backtest(R, W, rebalance=reb, cost_bps=7)
+    for k in range(3):
+        one = run_backtest(R, W[k], rebalance=reb[k], cost_bps=7)
+        np.testing.assert_allclose(batch["nav"][k], one["nav"])
+        np.testing.assert_allclose(batch["turnover"][k], one["turnover"])
+
+def test_schedule_weights_moves_off_calendar_dates_to_next_session():
+    idx = pd.bdate_range("2021-01-01", periods=10)                 # sex 01/01 ... qui 14/01
+    W = pd.DataFrame([[1.0, 0.0], [0.0, 1.0], [0.5, 0.5], [0.2, 0.8]], columns=["a", "b"],
+                     index=pd.to_datetime(["2021-01-01", "2021-01-09", "2021-01-10", "2021-01-30"]))
+    w, mask = schedule_weights(idx, W)
+    # sáb 09 e dom 10 caem na seg 11 (vale a última); 30/01 fica depois do índice
+    assert idx[mask].tolist() == [idx[0], pd.Timestamp("2021-01-11")]
+    np.testing.assert_allclose(w[:6], np.tile([1.0, 0.0], (6, 1)))
+    np.testing.assert_allclose(w[6:], np.tile([0.5, 0.5], (4, 1)))
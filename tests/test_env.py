@@ -12,3 +12,108 @@ def test_projection_edge():
     w = project_capped_simplex(v, l=0.0, u=0.7, s=1.0)
     assert abs(w.sum() - 1.0) < 1e-6
     assert (w >= -1e-9).all() and (w <= 0.7 + 1e-9).all()
+
+def test_dense_obs_matches_pandas_row(toy_market, toy_prior):
+    from src.env import PortfolioEnv
+    close, feats, cfg = toy_market
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=toy_prior)
+    obs, _ = env.reset()
+    row = env.features.loc[env.idx[env.t-1]]
+    expected = np.concatenate([row.loc[a].values for a in env.assets]).astype(np.float32)
+    np.testing.assert_allclose(obs[:env.n * env.fdim], expected)
+    _, _, _, _, info = env.step(np.zeros(env.n))
+    assert abs(info["return"] - float(env.returns.iloc[env.t-1].values @ info["weights"])) < 1e-12
+
+def test_projection_matches_bisection():
+    from benchmarks._synth import project_capped_simplex_bisect
+    from src.env import project_capped_simplex_batch
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        n = int(rng.integers(1, 40))
+        v = rng.normal(0, rng.choice([0.01, 0.3, 5.0]), n)
+        if rng.random() < 0.5:
+            l, u = 0.0, max(1.0 / n, rng.uniform(0.05, 1.0))
+        else:  # limites por ativo
+            l = rng.uniform(0, 0.5 / n, n)
+            u = l + rng.uniform(0.5 / n, 0.5 / n + 0.5, n)
+        w = project_capped_simplex(v, l, u, s=1.0)
+        np.testing.assert_allclose(w, project_capped_simplex_bisect(v, l, u, s=1.0), atol=1e-9)
+        assert abs(w.sum() - 1.0) < 1e-9
+    V = rng.normal(0, 0.3, (64, 25))
+    W = project_capped_simplex_batch(V, 0.0, 0.15)
+    np.testing.assert_allclose(W, np.stack([project_capped_simplex(v, 0.0, 0.15) for v in V]))
+
+def test_time_varying_prior(toy_market):
+    from src.env import PortfolioEnv
+    close, feats, cfg = toy_market
+    n = close.shape[1]
+    dates = close.index[[30, 90]]
+    prior = pd.DataFrame([np.eye(n)[0], np.eye(n)[1]], index=dates, columns=close.columns)
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=prior)
+    # cada estimativa só vale a partir da barra seguinte à sua data; antes da 1ª, pesos iguais fora do CASH
+    ew = np.r_[np.ones(n - 1) / (n - 1), 0.0]
+    np.testing.assert_allclose(env._prior_arr[:31], np.broadcast_to(ew, (31, n)))
+    np.testing.assert_allclose(env._prior_arr[31], np.eye(n)[0])
+    np.testing.assert_allclose(env._prior_arr[91:], np.broadcast_to(np.eye(n)[1], (len(close) - 91, n)))
+    env.reset()
+    np.testing.assert_allclose(env.w, env._prior_arr[env.window])
+    static = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=prior.iloc[1])
+    assert static._prior_arr.strides[0] == 0
+    # deviation_penalty usa o prior do passo
+    env.t = 95
+    _, reward, _, _, info = env.step(np.zeros(n, dtype=np.float32))
+    net = np.log((1 + info["return"]) * (1 - info["cost"]))
+    expected = net - env.turnover_pen * info["turnover"] - env.dev_pen * np.linalg.norm(env.w - np.eye(n)[1])
+    assert np.isclose(reward, expected, atol=1e-9)
+
+def test_episode_sampling(toy_market, toy_prior):
+    import copy
+    from src.env import PortfolioEnv
+    close, feats, cfg = toy_market
+    cfg = copy.deepcopy(cfg)
+    cfg["env"]["sampling"] = {"random_start": True, "episode_len": 30}
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=toy_prior)
+    starts = set()
+    for seed in range(8):
+        env.reset(seed=seed)
+        starts.add(env.t0)
+        steps, done = 0, False
+        while not done:
+            _, _, terminated, truncated, _ = env.step(np.zeros(env.n))
+            done, steps = terminated or truncated, steps + 1
+        assert steps == 30 and truncated and not terminated
+    assert len(starts) > 1 and min(starts) >= env.window
+    assert PortfolioEnv(prices=close, features=feats, cfg=cfg, train=False, w_mpt=toy_prior).reset()[0] is not None
+
+    cfg["env"]["sampling"] = {"bootstrap": True, "episode_len": 50, "block_size": 5}
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=toy_prior)
+    obs, _ = env.reset(seed=0)
+    rows = []
+    for _ in range(50):
+        # cada passo é um par real (features de t-1, retorno de t)
+        np.testing.assert_array_equal(obs[: env.n * env.fdim], env._feat_arr[env.t - 1])
+        rows.append(env.t)
+        obs, _, terminated, truncated, info = env.step(np.zeros(env.n))
+        assert np.isclose(info["return"], env._ret_arr[rows[-1]] @ info["weights"])
+    assert truncated and not terminated
+    assert (np.diff(rows) != 1).any() and min(rows) >= env.window
+
+def test_prior_never_uses_later_estimate(toy_market):
+    from src.env import PortfolioEnv
+    from src.benchmark import _prior_nav
+    from src.engine import run_backtest
+    close, feats, cfg = toy_market
+    rng = np.random.default_rng(0)
+    dates = close.index[[40, 70, 120]]
+    prior = pd.DataFrame(rng.dirichlet(np.ones(close.shape[1]), 3), index=dates, columns=close.columns)
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=prior)
+    for t, day in enumerate(close.index):
+        used = [k for k in range(3) if np.allclose(env._prior_arr[t], prior.iloc[k])]
+        assert all(dates[k] < day for k in used)                    # só estimativas datadas antes da barra
+        if day <= dates[0]:
+            assert not used and env._prior_arr[t][close.columns.get_loc("CASH")] == 0.0
+    # benchmark do prior dinâmico segue os mesmos pesos por barra
+    R = close.pct_change().fillna(0.0)
+    mask = np.r_[True, (env._prior_arr[1:] != env._prior_arr[:-1]).any(axis=1)]
+    ref = run_backtest(R, env._prior_arr, rebalance=mask)["nav"]
+    np.testing.assert_allclose(_prior_nav(close, prior).to_numpy(), np.asarray(ref), rtol=1e-12)
@@ -0,0 +1,72 @@
+import numpy as np, pandas as pd
+from src.features import make_features, feature_state, update_features
+
+def test_incremental_matches_full_recompute(toy_market):
+    close, _, _ = toy_market
+    full = make_features(close)
+    head = close.iloc[:-7]
+    state = feature_state(head)
+    rows = []
+    for cut in (-5, -1, None):  # atualizações em lotes de 2, 4 e 1 barra
+        new, state = update_features(close.iloc[:cut], state)
+        rows.append(new)
+    inc = pd.concat([make_features(head)] + rows)
+    pd.testing.assert_index_equal(inc.columns, full.columns)
+    pd.testing.assert_index_equal(inc.index, full.index)
+    np.testing.assert_allclose(inc.to_numpy(), full.to_numpy(), rtol=1e-9, atol=1e-12)
+
+def test_incremental_no_new_bars(toy_market):
+    close, _, _ = toy_market
+    state = feature_state(close)
+    new, state2 = update_features(close, state)
+    assert new.empty and state2 is state
+
+def _legacy_make_features(close):
+    from src.features import rsi
+    feats = {}
+    for col in close.columns:
+        px = close[col].ffill().dropna()
+        ret = px.pct_change()
+        feats[(col, "ret_1")] = ret
+        feats[(col, "ret_5")] = px.pct_change(5)
+        feats[(col, "ret_20")] = px.pct_change(20)
+        feats[(col, "mom_20")] = px.pct_change(20)
+        feats[(col, "vol_20")] = ret.rolling(20).std()
+        feats[(col, "vol_60")] = ret.rolling(60).std()
+        feats[(col, "rsi_14")] = rsi(px, 14)
+    return pd.concat(feats, axis=1).dropna().astype(float)
+
+def test_vectorized_matches_per_column(toy_market):
+    close, _, _ = toy_market
+    close = close.copy()
+    close.iloc[:30, 1] = np.nan  # ativo com histórico mais curto
+    close.iloc[100:103, 2] = np.nan  # buraco preenchido por ffill
+    new, old = make_features(close), _legacy_make_features(close)
+    pd.testing.assert_index_equal(new.columns, old.columns)
+    pd.testing.assert_index_equal(new.index, old.index)
+    np.testing.assert_allclose(new.to_numpy(), old.to_numpy(), rtol=1e-9, atol=1e-12)
+
+def test_incremental_update_detects_rewritten_history(toy_market, tmp_path, monkeypatch):
+    import src.features as F
+    from src.utils import save_frame, load_frame
+    close, _, _ = toy_market
+    prices = {"df": close.iloc[:-5]}
+    def fake_load_prices(columns=None, start=None, end=None):
+        df = prices["df"].loc[start:end]
+        return df if columns is None else df[list(columns)]
+    monkeypatch.setattr(F, "load_prices", fake_load_prices)
+    monkeypatch.setattr(F, "STATE_PATH", tmp_path / "state.npz")
+    monkeypatch.setattr(F, "FEATURES_STORE", tmp_path / "features")
+    save_frame(make_features(prices["df"]), F.FEATURES_STORE)
+    F.save_feature_state(feature_state(prices["df"]), F.STATE_PATH)
+
+    prices["df"] = close                                        # 5 barras novas, histórico intacto
+    assert F._incremental_update(csv=False)
+    np.testing.assert_allclose(load_frame(F.FEATURES_STORE).to_numpy(), make_features(close).to_numpy(),
+                               rtol=1e-9, atol=1e-12)
+    adjusted = close.copy()
+    adjusted.iloc[:, 0] *= 0.5                                  # novo ajuste de proventos reescreve o passado
+    prices["df"] = adjusted
+    assert not F._incremental_update(csv=False)
+    prices["df"] = close.iloc[1:]                               # histórico começando em outra data
+    assert not F._incremental_update(csv=False)
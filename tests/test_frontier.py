@@ -0,0 +1,36 @@
+import copy, numpy as np, pandas as pd
+from src.mpt import mpt_initial_weights
+from src.frontier import frontier_weights
+
+def test_frontier_matches_single_solves(toy_market):
+    _, _, cfg = toy_market
+    cfg = copy.deepcopy(cfg)
+    cfg["risk"]["max_weight"] = 0.4
+    rng = np.random.default_rng(3)
+    idx = pd.bdate_range("2019-01-01", periods=400)
+    rets = rng.normal(0.0003, 0.012, (400, 6)) + rng.normal(0, 0.006, (400, 1))
+    close = pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=idx, columns=list("ABCDEF"))
+    # perfil com vol-alvo abaixo da mínima exercita o fallback max_sharpe
+    cfg["mpt"]["target_vol"] = {"baixa": 0.01, **cfg["mpt"]["target_vol"]}
+    dates = idx[[199, 299, 399]]
+    W = frontier_weights(close, cfg, dates)
+    assert W.shape == (3, len(cfg["mpt"]["target_vol"]), 6)
+    np.testing.assert_allclose(W.sum(axis=-1), 1.0)
+    for d, date in enumerate(dates):
+        for p, profile in enumerate(cfg["mpt"]["target_vol"]):
+            cfg["mpt"]["profile"] = profile
+            ref = mpt_initial_weights(close.loc[:date], cfg)
+            np.testing.assert_allclose(W[d, p], ref.to_numpy(), atol=2e-3)
+    W_roll = frontier_weights(close, cfg, dates[1:], lookback=199)
+    np.testing.assert_allclose(W_roll[1], frontier_weights(close.iloc[200:], cfg, dates[2:])[0], atol=1e-6)
+
+def test_fold_priors_match_mpt_prior(toy_market):
+    from src.mpt import mpt_prior
+    from src.walk_forward import fold_priors
+    close, _, cfg = toy_market
+    cfg = copy.deepcopy(cfg)
+    cfg["risk"]["max_weight"] = 0.4
+    trains = [close.iloc[:80], close.iloc[:110], close.iloc[30:140]]
+    for w, c in zip(fold_priors(cfg, trains), trains):
+        np.testing.assert_allclose(w.to_numpy(), mpt_prior(c, cfg).to_numpy(), atol=2e-3)
+        assert list(w.index) == list(c.columns)
@@ -0,0 +1,39 @@
+import numpy as np, pytest
+pytest.importorskip("stable_baselines3")
+from src.env import PortfolioEnv
+from src.market import MarketData, make_market_env
+
+def test_memmap_env_matches_frames(toy_market, toy_prior, tmp_path):
+    close, feats, cfg = toy_market
+    ref = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=toy_prior)
+    path = MarketData.from_frames(close, feats).save(tmp_path / "market")
+    env = make_market_env(path, cfg, w_mpt=toy_prior)
+    assert isinstance(env._feat_arr, np.memmap) and not env._feat_arr.flags.writeable
+    assert list(env.idx) == list(ref.idx) and env.assets == ref.assets
+    o1, _ = ref.reset(); o2, _ = env.reset()
+    np.testing.assert_array_equal(o1, o2)
+    a = np.random.default_rng(0).uniform(-1, 1, env.n)
+    assert ref.step(a)[1] == env.step(a)[1]
+
+def test_subproc_workers_share_market(toy_market, toy_prior, tmp_path):
+    from stable_baselines3.common.vec_env import SubprocVecEnv, DummyVecEnv
+    close, feats, cfg = toy_market
+    path = MarketData.from_frames(close, feats).save(tmp_path / "market")
+    make = lambda: make_market_env(path, cfg, w_mpt=toy_prior)
+    sub = SubprocVecEnv([make] * 2, start_method="fork")
+    dummy = DummyVecEnv([make] * 2)
+    try:
+        np.testing.assert_array_equal(sub.reset(), dummy.reset())
+        a = np.random.default_rng(1).uniform(-1, 1, (2, close.shape[1]))
+        np.testing.assert_allclose(sub.step(a)[1], dummy.step(a)[1])
+    finally:
+        sub.close()
+
+def test_resave_keeps_open_maps_intact(toy_market, tmp_path):
+    close, feats, _ = toy_market
+    path = MarketData.from_frames(close, feats).save(tmp_path / "market")
+    old = MarketData.open(path)
+    ref = np.array(old.returns)
+    MarketData.from_frames(close * 1.5 + 1.0, feats).save(path)     # worker ainda com o mapa antigo aberto
+    np.testing.assert_array_equal(old.returns, ref)
+    assert not np.array_equal(MarketData.open(path).returns, ref)
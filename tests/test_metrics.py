@@ -8,3 +8,23 @@ def test_metrics():
     assert isinstance(sharpe_ratio(r), float)
     assert isinstance(sortino_ratio(r), float)
     assert max_drawdown(eq) <= 0
+
+def test_bootstrap_matches_point_metrics():
+    from src.bootstrap import stationary_indices, path_metrics, bootstrap_metrics
+    from src.evaluate import alpha_beta
+    rng = np.random.default_rng(1)
+    b = pd.Series(rng.normal(0.0003, 0.01, 500))
+    r = 0.0002 + 0.8 * b + pd.Series(rng.normal(0, 0.005, 500))
+    m = path_metrics(r.to_numpy(), bench=b.to_numpy(), rf=0.01)
+    assert np.isclose(m["Sharpe"][0], sharpe_ratio(r, 0.01))
+    assert np.isclose(m["Sortino"][0], sortino_ratio(r, 0.01))
+    assert np.isclose(m["MaxDrawdown"][0], max_drawdown((1 + r).cumprod()))
+    assert np.allclose([m["Alpha"][0], m["Beta"][0]], alpha_beta(r, b, 0.01))
+
+    idx = stationary_indices(500, 64, mean_block=10, rng=0)
+    assert idx.shape == (64, 500) and idx.min() >= 0 and idx.max() < 500
+    full = bootstrap_metrics(r, bench=b, n_resamples=300, seed=3)
+    chunked = bootstrap_metrics(r, bench=b, n_resamples=300, chunk_size=64, seed=3)
+    assert full["Sharpe"].shape == chunked["Sharpe"].shape == (300,)
+    assert abs(np.median(chunked["Beta"]) - np.median(full["Beta"])) < 0.05
+    assert abs(np.median(full["Beta"]) - 0.8) < 0.1
@@ -0,0 +1,30 @@
+import json, numpy as np, pytest
+import src.perf as perf
+
+def test_stage_records_and_profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(perf, "PERF_PATH", tmp_path / "perf.json")
+    monkeypatch.setattr(perf, "PROFILE_DIR", tmp_path / "profiles")
+    monkeypatch.setenv("SYNAPSE_PROFILE", "toy")
+
+    @perf.stage("toy")
+    def main():
+        return sum(np.arange(10_000))
+
+    assert main() == sum(range(10_000))
+    rec = json.load(open(tmp_path / "perf.json"))["stages"]["toy"]
+    assert rec["wall_s"] >= 0 and rec["process_peak_rss_mb"] > 0 and rec["peak_rss_delta_mb"] >= 0
+    assert (tmp_path / "profiles" / "toy.prof").exists()
+
+def test_env_timings_and_ppo_callback(toy_market, toy_prior, tmp_path, monkeypatch):
+    pytest.importorskip("stable_baselines3")
+    from stable_baselines3 import PPO
+    from src.vec_env import BatchedPortfolioEnv
+    monkeypatch.setattr(perf, "PERF_PATH", tmp_path / "perf.json")
+    close, feats, cfg = toy_market
+    vec = BatchedPortfolioEnv(close, feats, cfg, num_envs=4, seed=0, w_mpt=toy_prior)
+    model = PPO("MlpPolicy", vec, n_steps=32, batch_size=64, n_epochs=2, seed=0)
+    model.learn(128, callback=perf.ppo_perf_callback("toy"))
+    rec = json.load(open(tmp_path / "perf.json"))["ppo"]["toy"]
+    assert rec["timesteps"] == 128 and rec["grad_updates"] > 0
+    assert rec["env_steps_per_s"] > 0 and rec["grad_updates_per_s"] > 0
+    assert rec["env"]["env_steps"] == 128 and all(rec["env"][f"{k}_us"] > 0 for k in perf.ENV_COMPONENTS)
@@ -0,0 +1,58 @@
+import copy
+import src.pipeline as pl
+
+def test_stage_cache_dag(tmp_path, monkeypatch):
+    monkeypatch.setattr(pl, "ROOT", tmp_path)
+    monkeypatch.setattr(pl, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(pl, "OBJECTS_DIR", tmp_path / "cache" / "objects")
+    monkeypatch.setattr(pl, "module_sources", lambda module: [])
+    monkeypatch.setattr(pl, "STAGES", {
+        "a": {"module": "a", "deps": [], "config": ("sa",), "outputs": ("a.txt",)},
+        "b": {"module": "b", "deps": ["a"], "config": ("sb",), "outputs": ("b",)},
+        "c": {"module": "c", "deps": ["a"], "config": ("sc",), "outputs": ("c.txt",)},
+        "d": {"module": "d", "deps": ["b", "c"], "config": (), "outputs": ("d.txt",)},
+    })
+    cfg = {"sa": 1, "sb": 1, "sc": 1}
+    monkeypatch.setattr(pl, "load_config", lambda: copy.deepcopy(cfg))
+    calls = []
+
+    def runner(name):
+        calls.append(name)
+        if name == "b":
+            (tmp_path / "b").mkdir(exist_ok=True)
+            (tmp_path / "b" / "x.txt").write_text(f"b{cfg['sb']}")
+        elif name == "d":
+            (tmp_path / "d.txt").write_text((tmp_path / "c.txt").read_text() + (tmp_path / "b" / "x.txt").read_text())
+        else:
+            (tmp_path / f"{name}.txt").write_text(f"{name}{cfg['s' + name]}")
+        return 0
+
+    assert set(pl.run_pipeline(["d"], runner=runner).values()) == {"ran"}
+    assert calls[0] == "a" and calls[-1] == "d" and sorted(calls) == list("abcd")
+
+    calls.clear()
+    assert set(pl.run_pipeline(["d"], runner=runner).values()) == {"cached"} and calls == []
+
+    # config de ``c`` muda: só c e o que consome a saída dele rodam
+    cfg["sc"] = 2
+    st = pl.run_pipeline(["d"], runner=runner)
+    assert calls == ["c", "d"] and st["b"] == "cached"
+
+    # volta ao config antigo: artefatos restaurados do object store, sem rodar
+    calls.clear()
+    cfg["sc"] = 1
+    st = pl.run_pipeline(["d"], runner=runner)
+    assert calls == [] and st["c"] == "restored" and st["d"] == "restored"
+    assert (tmp_path / "c.txt").read_text() == "c1"
+
+    # upstream roda de novo mas produz o mesmo conteúdo: o downstream continua em cache
+    st = pl.run_pipeline(["d"], force=["a"], runner=runner)
+    assert calls == ["a"] and st["d"] == "cached"
+
+    # falha interrompe os dependentes
+    calls.clear()
+    cfg["sb"] = 3
+    st = pl.run_pipeline(["d"], runner=lambda name: 1 if name == "b" else runner(name))
+    assert st["b"] == "failed" and st["d"] == "skipped" and st["c"] == "cached"
+
+    assert pl.run_pipeline(["d"], dry_run=True, runner=runner)["b"] == "stale"
@@ -0,0 +1,30 @@
+import os, subprocess, sys, pathlib, numpy as np, pytest
+pytest.importorskip("stable_baselines3")
+from src.env import PortfolioEnv
+from src.policy_export import NumpyPolicy, export_policy, load_policy
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+def test_numpy_policy_matches_predict(toy_market, toy_prior, tmp_path):
+    from stable_baselines3 import PPO
+    close, feats, cfg = toy_market
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=toy_prior)
+    model = PPO("MlpPolicy", env, n_steps=64, batch_size=32, n_epochs=1, seed=0, device="cpu")
+    model.learn(128)
+    model.save(tmp_path / "m.zip")
+    policy = NumpyPolicy.load(export_policy(model, tmp_path / "m.npz"))
+    obs = np.stack([env.reset(seed=s)[0] for s in range(16)])
+    ref, _ = model.predict(obs, deterministic=True)
+    np.testing.assert_allclose(policy(obs), ref, atol=1e-5)
+    np.testing.assert_allclose(policy.predict(obs[0])[0], ref[0], atol=1e-5)
+    # auto: export mais novo que o .zip -> NumPy; sb3 explícito continua disponível
+    assert isinstance(load_policy(cfg, tmp_path / "m.zip", tmp_path / "m.npz"), NumpyPolicy)
+    sb3 = load_policy(cfg, tmp_path / "m.zip", tmp_path / "m.npz", runtime="sb3")
+    np.testing.assert_allclose(sb3(obs), ref, atol=1e-6)
+    os.utime(tmp_path / "m.npz", ns=(0, 0))
+    assert not isinstance(load_policy(cfg, tmp_path / "m.zip", tmp_path / "m.npz"), NumpyPolicy)
+
+def test_backtest_import_is_sb3_free():
+    code = "import sys, src.backtest, src.serve; print(sorted({'torch', 'stable_baselines3'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
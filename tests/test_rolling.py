@@ -0,0 +1,57 @@
+import numpy as np, pandas as pd, pytest
+from src.evaluate import sharpe_ratio, sortino_ratio, max_drawdown, alpha_beta
+from src.rolling import rolling_metrics, rolling_max_drawdown, save_rolling, load_rolling, navs_to_returns
+
+def test_rolling_matches_per_window(tmp_path):
+    rng = np.random.default_rng(0)
+    idx = pd.bdate_range("2021-01-01", periods=300)
+    spy = pd.Series(rng.normal(0.0004, 0.01, 300), index=idx)
+    rets = pd.DataFrame({"RL": 0.5 * spy + rng.normal(0, 0.008, 300), "EW": rng.normal(0.0002, 0.012, 300)}, index=idx)
+    w, rf = 63, 0.02
+    roll = rolling_metrics(rets, spy, windows=[21, w], rf=rf)
+    assert roll[("RL", str(w), "sharpe")].iloc[: w - 1].isna().all()
+    for t in (w - 1, 100, 299):
+        r = rets["RL"].iloc[t - w + 1 : t + 1]
+        s = spy.iloc[t - w + 1 : t + 1]
+        assert np.isclose(roll[("RL", str(w), "sharpe")].iloc[t], sharpe_ratio(r, rf))
+        assert np.isclose(roll[("RL", str(w), "sortino")].iloc[t], sortino_ratio(r, rf))
+        assert np.isclose(roll[("RL", str(w), "beta")].iloc[t], alpha_beta(r, s, rf)[1])
+
+    nav = (1 + rets).cumprod().to_numpy()
+    for w in (1, 5, 21, 64):
+        mdd = rolling_max_drawdown(nav, w)
+        for t in range(w - 1, 300, 7):
+            assert np.isclose(mdd[t, 1], max_drawdown(pd.Series(nav[t - w + 1 : t + 1, 1])))
+
+    save_rolling(roll, tmp_path / "rolling")
+    back = load_rolling(["EW"], tmp_path / "rolling")
+    assert back.shape == (300, roll["EW"].shape[1]) and back.to_numpy().dtype == np.float32
+
+def test_navs_to_returns_first_bar_against_base():
+    navs = pd.DataFrame({"RL": [1.02, 1.122, 1.0098], "late": [np.nan, 1.0, 1.1]})
+    r = navs_to_returns(navs)
+    np.testing.assert_allclose(r["RL"], [0.02, 0.1, -0.1])           # 1º dia do RL (retorno e custo) conta
+    assert np.isnan(r["late"].iloc[0]) and r["late"].iloc[1:].tolist() == [0.0, pytest.approx(0.1)]
+
+def test_rolling_late_start_column_matches_per_window():
+    rng = np.random.default_rng(1)
+    T, lag, w, rf = 300, 10, 63, 0.02
+    idx = pd.bdate_range("2021-01-01", periods=T)
+    spy = pd.Series(rng.normal(0.0004, 0.01, T), index=idx)
+    late = pd.Series(0.5 * spy + rng.normal(0, 0.008, T), index=idx)
+    late.iloc[:lag] = np.nan
+    rets = pd.DataFrame({"RL": rng.normal(0.0003, 0.01, T), "late": late}, index=idx)
+    roll = rolling_metrics(rets, spy, windows=[w], rf=rf)
+    for metric in ("sharpe", "sortino", "vol", "beta", "max_drawdown"):
+        col = roll[("late", str(w), metric)]
+        assert col.iloc[: lag + w - 1].isna().all() and col.iloc[lag + w - 1:].notna().all()
+    nav = (1 + late.fillna(0.0)).cumprod()
+    for t in (lag + w - 1, 150, T - 1):
+        r, s = late.iloc[t - w + 1 : t + 1], spy.iloc[t - w + 1 : t + 1]
+        assert np.isclose(roll[("late", str(w), "sharpe")].iloc[t], sharpe_ratio(r, rf))
+        assert np.isclose(roll[("late", str(w), "sortino")].iloc[t], sortino_ratio(r, rf))
+        assert np.isclose(roll[("late", str(w), "beta")].iloc[t], alpha_beta(r, s, rf)[1])
+        assert np.isclose(roll[("late", str(w), "max_drawdown")].iloc[t], max_drawdown(nav.iloc[t - w + 1 : t + 1]))
+    # a coluna que começa cedo não é afetada
+    ref = rolling_metrics(rets[["RL"]], spy, windows=[w], rf=rf)
+    np.testing.assert_allclose(roll["RL"].to_numpy(), ref["RL"].to_numpy(), rtol=1e-9, equal_nan=True)
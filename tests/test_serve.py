@@ -0,0 +1,120 @@
+import asyncio, numpy as np
+from src.env import PortfolioEnv, project_capped_simplex
+from src.features import feature_state, make_features
+from src.serve import PolicyService, PolicyServer, http_json
+
+def _service(close, feats, cfg, state=None):
+    rng = np.random.default_rng(0)
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, train=False, w_mpt=np.ones(close.shape[1]))
+    P = rng.normal(0, 0.1, (env.observation_space.shape[0], env.n))
+    return PolicyService(lambda obs: np.clip(np.asarray(obs, dtype=float) @ P, -1, 1), env, state)
+
+def test_target_weights_match_env_step(toy_market):
+    close, feats, cfg = toy_market
+    svc = _service(close, feats, cfg)
+    rng = np.random.default_rng(1)
+    H = rng.dirichlet(np.ones(svc.n), size=6)
+    nav = np.array([1.0, 0.95, 0.85, 0.80, 0.70, 1.2])
+    max_nav = np.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.2])
+    W = svc.target_weights(H, nav, max_nav)
+    env = svc.env
+    for i in range(len(H)):
+        env.w, env.nav, env.max_nav = H[i], nav[i], max_nav[i]
+        obs = np.concatenate([svc.features, H[i].astype(np.float32)])
+        prop = H[i] + env.step_scale * np.tanh(svc.act_fn(obs[None])[0])
+        ref = env._apply_overlay(project_capped_simplex(prop, env.min_w, env.max_w, s=1.0))
+        assert np.allclose(W[i], ref, atol=1e-9)
+    assert np.allclose(W.sum(axis=1), 1.0)
+
+def test_http_batching_and_price_updates(toy_market):
+    close, feats, cfg = toy_market
+    svc = _service(close.iloc[:-1], feats.iloc[:-1], cfg, feature_state(close.iloc[:-1]))
+    server = PolicyServer(svc, window_ms=2.0)
+
+    async def run():
+        await server.start("127.0.0.1", 0)
+        conns = [await asyncio.open_connection("127.0.0.1", server.port) for _ in range(8)]
+        accounts = [{"holdings": {"CASH": 1.0}, "nav": 0.8, "max_nav": 1.0}, {"nav": 1.0}]
+        res = await asyncio.gather(*(http_json(r, w, "POST", "/weights", {"accounts": accounts}) for r, w in conns))
+        r, w = conns[0]
+        bad = await http_json(r, w, "POST", "/weights", {"accounts": [{"holdings": [1.0]}]})
+        upd = await http_json(r, w, "POST", "/prices", {"date": str(close.index[-1].date()),
+                                                        "close": close.iloc[-1].to_dict()})
+        health = await http_json(r, w, "GET", "/health")
+        for _, wr in conns:
+            wr.close()
+        await server.stop()
+        return res, bad, upd, health
+
+    res, bad, upd, health = asyncio.run(run())
+    assert all(s == 200 for s, _ in res)
+    ref = svc.target_weights(*svc.parse_accounts([{"holdings": {"CASH": 1.0}, "nav": 0.8, "max_nav": 1.0},
+                                                  {"nav": 1.0}]))
+    assert np.allclose(res[0][1]["weights"], ref, atol=1e-6)
+    assert server.batcher.batches < server.batcher.requests == 8
+    assert bad[0] == 400
+    assert upd == (200, {"date": str(close.index[-1].date())})
+    full = make_features(close)[svc._feat_cols].to_numpy(dtype=np.float32)[-1]
+    assert np.allclose(svc.features, full, atol=1e-5) and health[1]["date"] == upd[1]["date"]
+
+def test_invalid_requests_are_rejected_and_handler_errors_return_500(toy_market):
+    close, feats, cfg = toy_market
+    svc = _service(close.iloc[:-1], feats.iloc[:-1], cfg, feature_state(close.iloc[:-1]))
+    server = PolicyServer(svc)
+    day, last = str(close.index[-1].date()), close.iloc[-1].to_dict()
+
+    async def run():
+        await server.start("127.0.0.1", 0)
+        r, w = await asyncio.open_connection("127.0.0.1", server.port)
+        call = lambda *a: http_json(r, w, *a)
+        out = [await call("POST", "/weights", [1, 2]),
+               await call("POST", "/weights", {"accounts": [3]}),
+               await call("POST", "/weights", {"accounts": [{"holdings": "CASH"}]}),
+               await call("POST", "/prices", ["x"]),
+               await call("POST", "/prices", {"date": day, "close": {k: v for k, v in last.items() if k != "A0"}}),
+               await call("POST", "/prices", {"date": day, "close": {**last, "A1": None}})]
+        svc.act_fn = lambda obs: obs.no_such_attr                      # bug no lote -> 500, conexão segue viva
+        out.append(await call("POST", "/weights", {"accounts": [{"nav": 1.0}]}))
+        out.append(await call("GET", "/health"))
+        w.close()
+        await server.stop()
+        return out
+
+    out = asyncio.run(run())
+    assert [s for s, _ in out[:6]] == [400] * 6
+    assert "A0" in out[4][1]["error"] and "A1" in out[5][1]["error"]
+    assert out[6][0] == 500 and "AttributeError" in out[6][1]["error"]
+    assert out[7][0] == 200 and out[7][1]["date"] == str(close.index[-2].date())   # estado não avançou
+
+def test_malformed_framing_gets_400_and_oversized_body_413(toy_market):
+    close, feats, cfg = toy_market
+    server = PolicyServer(_service(close, feats, cfg), max_body=64)
+
+    async def raw(data: bytes, eof: bool = False) -> bytes:
+        r, w = await asyncio.open_connection("127.0.0.1", server.port)
+        w.write(data)
+        if eof:                                                     # cliente desiste no meio do corpo
+            w.write_eof()
+        await w.drain()
+        resp = await asyncio.wait_for(r.read(), 5.0)                # servidor responde e fecha
+        w.close()
+        return resp
+
+    async def run():
+        await server.start("127.0.0.1", 0)
+        out = [await raw(b"GET\r\n\r\n"),
+               await raw(b"POST /weights HTTP/1.1\r\nContent-Length: abc\r\n\r\n{}"),
+               await raw(b"POST /weights HTTP/1.1\r\nContent-Length: 50\r\n\r\n{\"accounts\"", eof=True),
+               await raw(b"POST /weights HTTP/1.1\r\nContent-Length: 65\r\n\r\n" + b" " * 65)]
+        r, w = await asyncio.open_connection("127.0.0.1", server.port)
+        out.append(await http_json(r, w, "GET", "/health"))
+        w.close()
+        await server.stop()
+        return out
+
+    out = asyncio.run(run())
+    heads = [o.split(b"\r\n", 1)[0] for o in out[:4]]
+    assert heads == [b"HTTP/1.1 400 Bad Request"] * 3 + [b"HTTP/1.1 413 Payload Too Large"]
+    assert all(b"Connection: close" in o for o in out[:4])
+    assert b"Content-Length inv" in out[1] and b"incompleto" in out[2] and b"limite de 64" in out[3]
+    assert out[4][0] == 200                                         # servidor segue atendendo
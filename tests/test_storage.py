@@ -0,0 +1,39 @@
+import numpy as np, pandas as pd
+from src.utils import save_frame, load_frame
+
+def test_frame_roundtrip_with_pushdown(tmp_path, toy_market):
+    close, feats, _ = toy_market
+    save_frame(close, tmp_path / "prices", csv=True)
+    save_frame(feats, tmp_path / "features")
+    assert (tmp_path / "prices.csv").exists()
+    pd.testing.assert_frame_equal(load_frame(tmp_path / "prices"), close, check_freq=False)
+    pd.testing.assert_frame_equal(load_frame(tmp_path / "features"), feats, check_freq=False)
+
+    start, end = close.index[10], close.index[50]
+    sub = load_frame(tmp_path / "prices", columns=["A2", "CASH"], start=start, end=end)
+    pd.testing.assert_frame_equal(sub, close.loc[start:end, ["A2", "CASH"]], check_freq=False)
+    fsub = load_frame(tmp_path / "features", columns=["A1"], start=start, end=end)
+    pd.testing.assert_frame_equal(fsub, feats.loc[start:end, ["A1"]], check_freq=False)
+
+def test_append_frame_grows_in_place_and_exports_csv_once(tmp_path, toy_market):
+    import os
+    from src.utils import append_frame
+    close, feats, _ = toy_market
+    path = save_frame(feats.iloc[:100], tmp_path / "features")
+    size0 = os.path.getsize(path / "values.npy")
+    append_frame(feats.iloc[100:150], path, csv=True)          # CSV ainda não existe: exporta a tabela inteira
+    append_frame(feats.iloc[150:], path, csv=True)             # CSV existente: só as linhas novas
+    pd.testing.assert_frame_equal(load_frame(path), feats, check_freq=False)
+    assert os.path.getsize(path / "values.npy") == size0 + feats.iloc[100:].to_numpy().nbytes
+    csv = pd.read_csv(tmp_path / "features.csv", index_col=0, header=[0, 1], parse_dates=True)
+    assert csv.index.is_unique and len(csv) == len(feats)
+    np.testing.assert_allclose(csv.to_numpy(), feats.to_numpy())
+
+def test_save_frame_replaces_files_without_touching_open_maps(tmp_path, toy_market):
+    close, _, _ = toy_market
+    path = save_frame(close, tmp_path / "prices")
+    old = load_frame(path)                                      # memory-map do values.npy atual
+    save_frame(close * 2, path)
+    pd.testing.assert_frame_equal(old, close, check_freq=False) # o mapa antigo segue íntegro (arquivo substituído, não truncado)
+    pd.testing.assert_frame_equal(load_frame(path), close * 2, check_freq=False)
+    assert sorted(p.name for p in path.iterdir()) == ["index.npy", "schema.json", "values.npy"]
@@ -0,0 +1,81 @@
+import copy, numpy as np, pandas as pd, pytest
+from src.env import PortfolioEnv
+from src.rollout import evaluate_policy_batch
+from src.sweep import expand_space, apply_params, should_prune, replay_overlays, run_sweep, validation_split
+
+def test_space_params_and_median_pruning(toy_market):
+    cfg = toy_market[2]
+    space = {"ppo.learning_rate": [1e-4, 3e-4], "risk.turnover_penalty": [0.0, 0.1, 0.2]}
+    assert len(expand_space(space)) == 6
+    sample = expand_space(space, n_trials=3, seed=1)
+    assert len(sample) == 3 and all(s in expand_space(space) for s in sample)
+    out = apply_params(cfg, {"ppo.learning_rate": 1e-4})
+    assert out["ppo"]["learning_rate"] == 1e-4 and cfg["ppo"]["learning_rate"] != 1e-4
+    with pytest.raises(KeyError):
+        apply_params(cfg, {"ppo.lr": 1.0})
+
+    peers = [[1.0, 2.0, 3.0], [0.5, 1.5], [0.0]]
+    assert not should_prune([0.1], peers, warmup_evals=2)                 # ainda no aquecimento
+    assert should_prune([0.1, 0.2], peers, warmup_evals=2)                # mediana de [2.0, 1.5] = 1.75
+    assert not should_prune([0.1, 1.8], peers, warmup_evals=2)
+    assert not should_prune([0.1, 0.2, 0.3], peers, warmup_evals=2)        # só 1 trial chegou à 3ª avaliação
+
+def test_overlay_replay_matches_closed_loop(toy_market, toy_prior):
+    close, feats, cfg = toy_market
+    rng = np.random.default_rng(0)
+    env = PortfolioEnv(prices=close, features=feats, cfg=cfg, train=False, w_mpt=toy_prior)
+    P = rng.normal(0, 0.3, (env.observation_space.shape[0], env.n))
+    actions = []
+    def act(obs):
+        a = np.tanh(obs @ P)
+        actions.append(a[0])
+        return a
+    res = evaluate_policy_batch(None, env, act_fn=act)
+    base = {k: getattr(env, k) for k in ("dd_trigger", "dd_hard", "max_cash", "smoothing")}
+    tight = {**base, "dd_trigger": -0.01, "dd_hard": -0.03, "max_cash": 0.9}
+    m = replay_overlays(env, np.array(actions), [base, tight])
+    assert m.loc[0, "final_nav"] == pytest.approx(res["nav"][0, -1], rel=1e-12)
+    # overlay por linha = overlay escalar num env com o mesmo config
+    cfg2 = copy.deepcopy(cfg)
+    cfg2["risk_overlay"].update(tight)
+    env2 = PortfolioEnv(prices=close, features=feats, cfg=cfg2, train=False, w_mpt=toy_prior)
+    m2 = replay_overlays(env2, np.array(actions), [tight])
+    assert m.loc[1, "final_nav"] == pytest.approx(m2.loc[0, "final_nav"], rel=1e-12)
+
+def test_validation_split_holds_out_train_tail(toy_market):
+    close, feats, _ = toy_market
+    (c_fit, f_fit), (c_val, f_val) = validation_split((close.iloc[:100], feats.iloc[:100]), 0.2, window=10)
+    assert len(c_fit) == 80 and c_val.index[10] == close.index[80] and c_val.index[-1] == close.index[99]
+    assert f_fit.index.equals(c_fit.index) and f_val.index.equals(c_val.index)
+    with pytest.raises(ValueError):
+        validation_split((close.iloc[:20], feats.iloc[:20]), 0.5, window=10)
+
+def test_run_sweep_trains_prunes_and_replays(toy_market, toy_prior, tmp_path):
+    pytest.importorskip("stable_baselines3")
+    close, feats, cfg = toy_market
+    cfg = apply_params(cfg, {"ppo.total_timesteps": 256, "ppo.n_steps": 64, "ppo.batch_size": 32, "ppo.n_envs": 1,
+                             "perf.enabled": False, "env.window_size": 10})
+    train = (close.iloc[:120], feats.iloc[:120])
+    test = (close.iloc[120:], feats.iloc[120:])
+    space = {"ppo.learning_rate": [1e-4, 1e-3], "ppo.ent_coef": [0.0, 0.01]}
+    overlay_space = {"dd_trigger": [-0.02, -0.05], "max_cash": [0.5]}
+    kw = dict(prune={"warmup_evals": 1, "min_trials": 1}, eval_freq=64, out_dir=tmp_path, val_frac=0.25, w_mpt=toy_prior)
+    trials, overlay = run_sweep(cfg, train, test, space, overlay_space, **kw)
+    assert len(trials) == 4 and set(trials["status"]) <= {"complete", "pruned"}
+    assert (trials["status"] == "complete").any() and (trials["n_evals"] >= 1).all()
+    assert trials["val_Sharpe"].is_monotonic_decreasing and "test_Sharpe" in trials and "Sharpe" not in trials
+    done = trials.index[trials["status"] == "complete"]
+    assert len(overlay) == len(done) * 3 and set(overlay["trial"]) == set(done)
+    for key in done:
+        row = overlay[(overlay["trial"] == key) & (overlay["overlay"] == "trial")].iloc[0]
+        for split in ("val", "test"):
+            assert row[f"{split}_final_nav"] == pytest.approx(trials.loc[key, f"{split}_final_nav"], rel=1e-9)
+    assert (tmp_path / "trials.csv").exists() and (tmp_path / "overlay.csv").exists()
+    # segunda rodada: tudo em cache
+    again, _ = run_sweep(cfg, train, test, space, overlay_space, **kw)
+    pd.testing.assert_frame_equal(again.drop(columns="wall_s"), trials.drop(columns="wall_s"))
+    # prior diferente -> trials diferentes (chave inclui o prior)
+    other = toy_prior.copy()
+    other[:] = [0.4, 0.3, 0.2, 0.1, 0.0]
+    moved, _ = run_sweep(cfg, train, test, space, {}, n_trials=1, **{**kw, "w_mpt": other})
+    assert not set(moved.index) & set(trials.index)
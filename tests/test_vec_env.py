@@ -0,0 +1,69 @@
+import copy, numpy as np, pandas as pd, pytest
+pytest.importorskip("stable_baselines3")
+from src.env import PortfolioEnv
+from src.vec_env import BatchedPortfolioEnv
+
+def test_batched_matches_single_env(toy_market):
+    close, feats, cfg = toy_market
+    cfg = copy.deepcopy(cfg)
+    cfg["risk_overlay"]["dd_trigger"] = -0.001  # força o overlay de drawdown
+    # prior variável no tempo (âncora da deviation_penalty muda a cada 20 barras)
+    rng = np.random.default_rng(0)
+    prior = pd.DataFrame(rng.dirichlet(np.ones(close.shape[1]), 6), index=close.index[::20][:6], columns=close.columns)
+    single = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=prior)
+    vec = BatchedPortfolioEnv(close, feats, cfg, num_envs=3, random_start=False, w_mpt=prior)
+    obs1, _ = single.reset()
+    obs = vec.reset()
+    np.testing.assert_allclose(obs[0], obs1)
+    rng = np.random.default_rng(1)
+    done = False
+    while not done:
+        a = rng.uniform(-1, 1, single.n)
+        obs1, r1, done, _, info1 = single.step(a)
+        obs, r, dones, infos = vec.step(np.tile(a, (3, 1)))
+        assert np.allclose(r, r1, atol=1e-5)
+        assert abs(infos[1]["nav"] - info1["nav"]) < 1e-9
+        assert (dones == done).all()
+    np.testing.assert_allclose(infos[0]["terminal_observation"], obs1)
+    assert (vec.t == vec.window).all() and (vec.nav == 1.0).all()
+
+def test_batched_random_starts(toy_market, toy_prior):
+    close, feats, cfg = toy_market
+    vec = BatchedPortfolioEnv(close, feats, cfg, num_envs=16, seed=0, w_mpt=toy_prior)
+    vec.reset()
+    assert len(set(vec.t0.tolist())) > 1
+    assert (vec.t0 >= vec.window).all() and (vec.t0 < len(vec.idx)).all()
+
+def test_batched_episode_len(toy_market, toy_prior):
+    close, feats, cfg = toy_market
+    cfg = copy.deepcopy(cfg)
+    cfg["env"]["sampling"] = {"episode_len": 25}
+    vec = BatchedPortfolioEnv(close, feats, cfg, num_envs=4, seed=0, w_mpt=toy_prior)
+    vec.reset()
+    assert (vec.t_end - vec.t0 == 25).all()
+    for k in range(25):
+        _, _, dones, infos = vec.step(np.zeros((4, vec.n)))
+    assert dones.all() and all(i["TimeLimit.truncated"] for i in infos)
+    assert (vec.steps == 0).all()
+
+def test_env_method_uses_each_rows_state(toy_market, toy_prior):
+    close, feats, cfg = toy_market
+    vec = BatchedPortfolioEnv(close, feats, cfg, num_envs=2, random_start=False, w_mpt=toy_prior)
+    vec.reset()
+    vec.reset_at([vec.window, vec.window + 30])
+    vec.step(np.zeros((2, vec.n)))
+    base_t = vec.base.t
+    obs = vec.env_method("_get_obs")
+    np.testing.assert_allclose(np.stack(obs), vec._get_obs())
+    assert not np.allclose(obs[0], obs[1])
+    # o método muda o estado da linha (step) -> volta para a própria linha, não para a outra
+    a = np.ones(vec.n)
+    single = PortfolioEnv(prices=close, features=feats, cfg=cfg, w_mpt=toy_prior)
+    single.reset()
+    single.t0 = single.t = vec.window + 30
+    single.w = vec._prior_arr[single.t0].copy()
+    single.step(np.zeros(vec.n))
+    _, r1, *_ = single.step(a)
+    (_, r, *_), = vec.env_method("step", a, indices=1)
+    assert abs(r - r1) < 1e-12 and vec.t[1] == single.t and vec.t[0] == vec.window + 1
+    assert abs(vec.nav[1] - single.nav) < 1e-12 and vec.base.t == base_t
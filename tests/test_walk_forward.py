@@ -0,0 +1,36 @@
+import copy, numpy as np, pandas as pd, pytest
+from src.walk_forward import make_folds, stitch
+
+def test_make_folds_expanding_and_rolling():
+    idx = pd.bdate_range("2018-01-01", "2020-12-31")
+    exp = make_folds(idx, "expanding", train_months=12, test_months=6)
+    assert [f["test_start"] for f in exp] == ["2019-01-01", "2019-07-01", "2020-01-01", "2020-07-01"]
+    assert all(f["train_start"] == "2018-01-01" for f in exp)
+    roll = make_folds(idx, "rolling", train_months=12, test_months=6)
+    assert roll[-1]["train_start"] == "2019-07-01" and roll[-1]["train_end"] == "2020-06-30"
+
+def test_stitch_chains_oos_navs():
+    a = pd.DataFrame({"nav": [1.1, 1.21], "ret": [0.1, 0.1], "turnover": 0.0}, index=pd.to_datetime(["2020-01-01", "2020-01-02"]))
+    b = pd.DataFrame({"nav": [0.5], "ret": [-0.5], "turnover": 0.0}, index=pd.to_datetime(["2020-01-03"]))
+    out = stitch([({"fold": 1, "test_start": "2020-01-03"}, b), ({"fold": 0, "test_start": "2020-01-01"}, a)])
+    np.testing.assert_allclose(out["nav"].to_numpy(), [1.1, 1.21, 0.605])
+    assert out["fold"].tolist() == [0, 0, 1]
+
+def test_walk_forward_runs_and_caches(tmp_path, toy_market):
+    pytest.importorskip("stable_baselines3")
+    pytest.importorskip("pypfopt")
+    from src.walk_forward import run_walk_forward
+    close, feats, cfg = toy_market
+    cfg = copy.deepcopy(cfg)
+    cfg["env"]["window_size"] = 10
+    cfg["risk"]["max_weight"] = 0.4  # 4 ativos: limite de 15% seria inviável
+    cfg["ppo"].update(n_steps=16, batch_size=16, total_timesteps=16)
+    cfg["perf"]["enabled"] = True  # throughput do PPO vai para o diretório do fold, não para outputs/
+    folds = make_folds(feats.index, "expanding", train_months=3, test_months=1)[:2]
+    curve = run_walk_forward(cfg, close, feats, folds, out_dir=tmp_path)
+    assert curve.index.is_monotonic_increasing and set(curve["fold"]) == {0, 1}
+    assert str(curve.index[0].date()) >= folds[0]["test_start"]
+    again = run_walk_forward(cfg, close, feats, folds, out_dir=tmp_path)
+    pd.testing.assert_frame_equal(curve, again)
+    fold_dirs = list((tmp_path / "cache").iterdir())
+    assert len(fold_dirs) == 2 and all((d / "perf.json").exists() for d in fold_dirs)